@@ -0,0 +1,172 @@
+"""
+Module contains the ActorPool class, that runs tasks
+in serial per-key mailboxes on a shared pool of threads.
+
+Bot uses it to process updates of one game strictly in order
+(so game state transitions never race), while different games
+are processed in parallel.
+"""
+
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from queue import Queue
+
+
+class ActorPool:
+    """
+    Pool of threads, that executes tasks of actors
+
+    Actor is identified by a hashable key. Tasks of one actor
+    are executed one by one in the order they were submitted,
+    tasks of different actors may be executed concurrently.
+    Actor exists only while it has tasks, so there are no limits
+    on the number of keys.
+
+    :attr pending:
+        int, number of submitted tasks that are not finished yet
+    """
+
+    def __init__(self, workers=4):
+        """
+        Creates a pool and starts worker threads
+
+        :param workers:
+            int, number of threads
+        """
+        self.pending = 0
+
+        self._condition = threading.Condition()
+        self._mailboxes = {}
+        self._ready = Queue()
+        self._workers = [
+            threading.Thread(target=self._work, name='Actor{}'.format(num), daemon=True)
+            for num in range(workers)
+        ]
+
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, key, func, *args):
+        """
+        Adds task to the actor's mailbox
+
+        :param key:
+            hashable, actor's key
+        :param func:
+            function to be called
+        :param args:
+            arguments of the function
+        """
+        with self._condition:
+            mailbox = self._mailboxes.get(key)
+
+            # key is put to the ready queue only when its mailbox is created
+            # or after its previous task is finished, so actor never runs twice at once
+            if mailbox is None:
+                mailbox = self._mailboxes[key] = deque()
+                self._ready.put(key)
+
+            mailbox.append((func, args))
+            self.pending += 1
+
+    def join(self, timeout=None):
+        """
+        Waits until all tasks are finished
+
+        :param timeout:
+            float, maximal time to wait in seconds
+        :return:
+            bool, True if there is no pending tasks
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self.pending, timeout)
+
+    def stop(self):
+        """
+        Finishes pending tasks and stops worker threads
+        """
+        self.join()
+
+        for _ in self._workers:
+            self._ready.put(None)
+
+        for worker in self._workers:
+            worker.join()
+
+    def _work(self):
+        while True:
+            key = self._ready.get()
+
+            if key is None:
+                return
+
+            with self._condition:
+                func, args = self._mailboxes[key].popleft()
+
+            try:
+                func(*args)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception('Task of actor %r failed', key)
+
+            with self._condition:
+                # one task per turn, so busy actors do not starve others
+                if self._mailboxes[key]:
+                    self._ready.put(key)
+                else:
+                    del self._mailboxes[key]
+
+                self.pending -= 1
+                self._condition.notify_all()
+
+
+class SharedLock:
+    """
+    Readers-writer lock, many threads may hold it shared
+    or only one thread may hold it exclusively.
+    Waiting writer blocks new readers, so it is never starved
+
+    Bot handlers hold it shared, while snapshot of all games
+    is taken under the exclusive lock
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def shared(self):
+        """
+        Context manager, that holds the lock shared
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Context manager, that holds the lock exclusively
+        """
+        with self._condition:
+            self._waiting_writers += 1
+            self._condition.wait_for(lambda: not self._writer and not self._readers)
+            self._waiting_writers -= 1
+            self._writer = True
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
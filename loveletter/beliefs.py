@@ -0,0 +1,271 @@
+# pylint: disable=unused-argument
+
+"""
+Module contains the BeliefTracker class, that counts cards
+and follows what players know about hands of each other.
+
+Tracker is fed with events of the engine (see loveletter.events),
+each event is applied in constant time, so the knowledge is always
+up to date and it is never recomputed from the history of the game.
+It keeps three things:
+
+ - numbers of cards of each type, which nobody has seen dropped
+ - exact cards, which players have seen in hands of others
+   (Priest and Baron show them, King swaps them)
+ - cards, which players surely do not hold (failed Guard guesses)
+
+Probability of a card in a hand is proportional to the number
+of such cards, which are unseen by the observer.
+"""
+
+from loveletter.cards import Princess, Countess, King, Prince, Maid, Baron, Priest, Guard
+from loveletter.events import (
+    GameStarted,
+    CardDealt,
+    TurnStarted,
+    PrincessDropped,
+    CountessDropped,
+    CardWasted,
+    CardsSwapped,
+    CardDiscarded,
+    ProtectionGained,
+    CardsCompared,
+    CardRevealed,
+    CardGuessed,
+    TurnTimedOut,
+    PlayerKilled,
+)
+
+CARD_TYPES = (Princess, Countess, King, Prince, Maid, Baron, Priest, Guard)
+VALUES = {card.name: card.value for card in CARD_TYPES}
+NAMES = {card.value: card.name for card in CARD_TYPES}
+
+
+class BeliefTracker:
+    """
+    Knowledge of players about hidden cards of one game
+
+    :attr unseen:
+        list of int, numbers of not dropped cards indexed by card value
+        (cards in hands, in the deck and the one set aside)
+    :attr known:
+        dict of {user_id: {observer_id: card value}}, cards that observers
+        have seen in the player's hand
+    :attr excluded:
+        dict of {user_id: int}, bit mask of card values,
+        which the player surely does not hold
+    :attr dealer_id:
+        int, id of the player, whose turn is going now
+        (events of a card do not always tell who played it)
+    """
+
+    def __init__(self, state):
+        """
+        Creates tracker of the game
+
+        :param state:
+            GameState, the game which events are tracked
+        """
+        self.state = state
+        self.unseen = [0] * (len(CARD_TYPES) + 1)
+        self.known = {}
+        self.excluded = {}
+        self.dealer_id = None
+
+    def update(self, events):
+        """
+        Applies events of the game to the tracker
+
+        :param events:
+            list of events (see loveletter.events)
+        """
+        handlers = self._handlers
+
+        for event in events:
+            handler = handlers.get(type(event))
+
+            if handler is not None:
+                handler(self, event)
+
+    def known_cards(self, observer):
+        """
+        Returns cards of other players, which the observer has seen
+
+        :param observer:
+            User
+        :return:
+            dict of {user_id: card value}
+        """
+        observer_id = observer.user_id
+
+        return {user_id: seen[observer_id] for user_id, seen in self.known.items()
+                if observer_id in seen and user_id != observer_id}
+
+    def distribution(self, user, observer=None):
+        """
+        Returns probabilities of cards in the player's hand
+
+        :param user:
+            User, whose hand is estimated
+        :param observer:
+            User, who estimates it (his own cards and what he has seen
+            are taken into account), None for a spectator
+        :return:
+            dict of {card name: probability}, only possible cards are listed
+        """
+        if observer is not None:
+            if observer is user:
+                return {user.card.name: 1.0}
+
+            value = self.known.get(user.user_id, {}).get(observer.user_id)
+
+            if value is not None:
+                return {NAMES[value]: 1.0}
+
+        counts = self.unseen[:]
+
+        if observer is not None:
+            for card in (observer.card, observer.new_card):
+                if card is not None:
+                    counts[card.value] -= 1
+
+            for value in self.known_cards(observer).values():
+                counts[value] -= 1
+
+        excluded = self.excluded.get(user.user_id, 0)
+        counts = {value: count for value, count in enumerate(counts)
+                  if count > 0 and not excluded >> value & 1}
+        total = sum(counts.values())
+
+        if not total:
+            return {}
+
+        return {NAMES[value]: count / total for value, count in counts.items()}
+
+    def dump(self):
+        """
+        Returns the tracker as plain python data, see load()
+        """
+        return {
+            'unseen': list(self.unseen),
+            'known': [[user_id, list(seen.items())] for user_id, seen in self.known.items()],
+            'excluded': list(self.excluded.items()),
+            'dealer_id': self.dealer_id,
+        }
+
+    def load(self, data):
+        """
+        Restores the tracker dumped by dump()
+        """
+        self.unseen = list(data['unseen'])
+        self.known = {user_id: dict(seen) for user_id, seen in data['known']}
+        self.excluded = dict(data['excluded'])
+        self.dealer_id = data['dealer_id']
+
+    def _played(self, value):
+        """
+        Dealer dropped the card from his two cards, observers who knew
+        the same card in his hand can not say which of them is left
+        """
+        self.unseen[value] -= 1
+        self.excluded.pop(self.dealer_id, None)
+
+        seen = self.known.get(self.dealer_id)
+
+        if seen:
+            for observer_id in [key for key, card in seen.items() if card == value]:
+                del seen[observer_id]
+
+    def _forget(self, user):
+        self.known.pop(user.user_id, None)
+        self.excluded.pop(user.user_id, None)
+
+    def _show(self, observer_id, user_id, card):
+        self.known.setdefault(user_id, {})[observer_id] = card.value
+
+    def _game_started(self, event):
+        num_decks = 2 if self.state.double_deck else 1
+
+        self.unseen = [0] * (len(CARD_TYPES) + 1)
+        for card in CARD_TYPES:
+            self.unseen[card.value] = card.num_in_deck * num_decks
+
+        self.known = {}
+        self.excluded = {}
+
+    def _card_dealt(self, event):
+        self._forget(event.user)
+
+    def _turn_started(self, event):
+        self.dealer_id = event.dealer.user_id
+
+    def _princess_dropped(self, event):
+        self._played(Princess.value)
+
+    def _countess_dropped(self, event):
+        self._played(Countess.value)
+
+    def _card_wasted(self, event):
+        self._played(event.card.value)
+
+    def _cards_swapped(self, event):
+        dealer, victim = self.dealer_id, event.victim.user_id
+        self._played(King.value)
+
+        known, excluded = self.known, self.excluded
+        known[dealer], known[victim] = known.pop(victim, {}), known.pop(dealer, {})
+        excluded[dealer], excluded[victim] = excluded.pop(victim, 0), excluded.pop(dealer, 0)
+
+        self._show(dealer, victim, event.victim_card)
+        self._show(victim, dealer, event.dealer_card)
+
+    def _card_discarded(self, event):
+        self._played(Prince.value)
+        self._forget(event.victim)
+
+        # discarded Princess is counted when her owner is killed
+        if event.card.value != Princess.value:
+            self.unseen[event.card.value] -= 1
+
+    def _protection_gained(self, event):
+        self._played(Maid.value)
+
+    def _cards_compared(self, event):
+        self._played(Baron.value)
+        self._show(self.dealer_id, event.victim.user_id, event.victim_card)
+        self._show(event.victim.user_id, self.dealer_id, event.dealer_card)
+
+    def _card_revealed(self, event):
+        self._played(Priest.value)
+        self._show(self.dealer_id, event.victim.user_id, event.card)
+
+    def _card_guessed(self, event):
+        self._played(Guard.value)
+
+        if not event.hit and event.guess in VALUES:
+            user_id = event.victim.user_id
+            self.excluded[user_id] = self.excluded.get(user_id, 0) | 1 << VALUES[event.guess]
+
+    def _turn_timed_out(self, event):
+        self._played(event.card.value)
+
+    def _player_killed(self, event):
+        self.unseen[event.user.card.value] -= 1
+        self._forget(event.user)
+
+    _handlers = {
+        GameStarted: _game_started,
+        CardDealt: _card_dealt,
+        TurnStarted: _turn_started,
+        PrincessDropped: _princess_dropped,
+        CountessDropped: _countess_dropped,
+        CardWasted: _card_wasted,
+        CardsSwapped: _cards_swapped,
+        CardDiscarded: _card_discarded,
+        ProtectionGained: _protection_gained,
+        CardsCompared: _cards_compared,
+        CardRevealed: _card_revealed,
+        CardGuessed: _card_guessed,
+        TurnTimedOut: _turn_timed_out,
+        PlayerKilled: _player_killed,
+    }
@@ -0,0 +1,328 @@
+"""
+Benchmark suite, that measures the speed of the engine and the bot
+without telegram: random games per second through the Game,
+latency of GameBot.process_new_messages by update type, cost of the deck
+generation and the start of a game, and memory per live game.
+
+Results are saved as json, so runs on different commits can be compared:
+
+    loveletter benchmark --output base.json
+    loveletter benchmark --compare base.json
+"""
+
+import gc
+import json
+import logging
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from timeit import Timer
+
+import numpy as np
+
+from loveletter.engine import GameState
+from loveletter.game import Game
+from loveletter.i18n import translator
+from loveletter.policies import RandomPolicy
+from loveletter.transport import FakeTransport, text_message
+from loveletter.users import User
+
+
+class NullBot:
+    """
+    Bot, that drops all messages of the game
+    """
+
+    def send_message(self, chat_id, text, **kwargs):
+        """
+        Does nothing
+        """
+
+
+def new_game(rng, num_players, bot=None):
+    """
+    Creates a game with players, but does not start it
+
+    :param rng:
+        random.Random, source of randomness of the game
+    :param num_players:
+        int, number of players
+    :param bot:
+        bot, which receives messages of the game (NullBot if None)
+    :return:
+        Game
+    """
+    game = Game(bot or NullBot())
+    game.rng = rng
+
+    for user_id in range(num_players):
+        game.users.add(User('player{}'.format(user_id), user_id, game))
+
+    return game
+
+
+def bench_games(num_games=2000, num_players=4, seed=0):
+    """
+    Plays random games through the Game, all messages are rendered
+    and dropped by NullBot
+
+    :return:
+        dict, games and actions per second
+    """
+    rng = random.Random(seed)
+    policy = RandomPolicy()
+    actions = 0
+
+    start = time.perf_counter()
+
+    for _ in range(num_games):
+        game = new_game(rng, num_players)
+        game.start()
+
+        while game.state != 'game_over':
+            game.act(policy.act(game, rng))
+            actions += 1
+
+    elapsed = time.perf_counter() - start
+
+    return {
+        'games': num_games,
+        'games_per_second': num_games / elapsed,
+        'actions_per_second': actions / elapsed,
+    }
+
+
+def bench_deck(number=2000, num_players=4, seed=0):
+    """
+    Measures generation of the deck and the start of a game
+    (shuffle of the deck and players, the first turn)
+
+    :return:
+        dict, microseconds per call
+    """
+    rng = random.Random(seed)
+
+    def start():
+        new_game(rng, num_players).start()
+
+    result = {}
+    for name, func in (('generate_deck', GameState.generate_deck), ('start', start)):
+        result[name + '_us'] = min(Timer(func).repeat(3, number)) / number * 1e6
+
+    return result
+
+
+def bench_updates(num_games=200, seed=0):
+    """
+    Plays 2-players games through GameBot.process_new_messages,
+    every update is handled alone, so its latency includes
+    the hop to the game's actor
+
+    :return:
+        dict of {update type: {'count', 'p50_us', 'p99_us', 'mean_us'}}
+    """
+    rng = random.Random(seed)
+    bot = offline_bot()
+    latencies = {}
+
+    def send(kind, user_id, name, text):
+        message = text_message(user_id, name, text)
+        start = time.perf_counter()
+
+        bot.transport.deliver([message])
+
+        latencies.setdefault(kind, []).append(time.perf_counter() - start)
+
+    for num in range(num_games):
+        alice, bob = (2 * num + 1, 'alice{}'.format(num)), (2 * num + 2, 'bob{}'.format(num))
+
+        send('create', *alice, '/create')
+        send('join', *bob, '/join @' + alice[1])
+        send('start', *alice, '/start')
+        send('players', *bob, '/players')
+        send('cards', *bob, '/cards')
+
+        game = bot.users[alice[0]].game
+
+        while game.state != 'game_over':
+            dealer = game.dealer
+            _ = translator.gettext(dealer.locale)
+
+            if game.state == 'select_card':
+                kind, text = 'card', _(rng.choice(game.list_playable_cards()))
+            elif game.state == 'select_victim':
+                kind, text = 'victim', rng.choice(game.list_possible_victims())
+            else:
+                kind, text = 'guess', _(rng.choice(game.card_types[:-1]).name)
+
+            send(kind, dealer.user_id, dealer.name, text)
+
+        send('leave', *alice, '/leave')
+        send('leave', *bob, '/leave')
+
+    bot.actors.stop()
+
+    return {kind: summary(values) for kind, values in latencies.items()}
+
+
+def bench_memory(num_games=1000, num_players=4, seed=0):
+    """
+    Measures memory of started games (python allocations only)
+
+    :return:
+        dict, bytes per game
+    """
+    rng = random.Random(seed)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    games = []
+    for _ in range(num_games):
+        game = new_game(rng, num_players)
+        game.start()
+        games.append(game)
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+    return {'games': len(games), 'bytes_per_game': allocated / num_games}
+
+
+def summary(values):
+    """
+    Returns percentiles of latencies in microseconds
+
+    :param values:
+        list of float, latencies in seconds
+    :return:
+        dict
+    """
+    values = np.array(values) * 1e6
+
+    return {
+        'count': len(values),
+        'p50_us': float(np.percentile(values, 50)),
+        'p99_us': float(np.percentile(values, 99)),
+        'mean_us': float(values.mean()),
+    }
+
+
+def offline_bot(**kwargs):
+    """
+    Creates GameBot, which never connects to telegram
+    and only counts sent messages (see loveletter.transport.FakeTransport)
+    """
+    # bot registers this module as a command, so it is imported only when needed
+    from loveletter.bot import GameBot  # pylint: disable=import-outside-toplevel
+
+    return GameBot('123:benchmark', transport=FakeTransport(keep=False), **kwargs)
+
+
+def run_benchmarks(scale=1.0, seed=0):
+    """
+    Runs all benchmarks
+
+    :param scale:
+        float, multiplier of the number of iterations
+    :param seed:
+        int, seed of the games
+    :return:
+        dict, results and the environment they were measured in
+    """
+    def scaled(number):
+        return max(1, int(number * scale))
+
+    results = {}
+    for name, bench, number in (('games', bench_games, 2000), ('deck', bench_deck, 2000),
+                                ('updates', bench_updates, 200), ('memory', bench_memory, 1000)):
+        logging.info('Running %s benchmark', name)
+        results[name] = bench(scaled(number), seed=seed)
+
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def git_commit():
+    """
+    Returns hash of the current git commit or None
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """
+    Finds relative changes of all numbers in the results
+
+    :param report:
+        dict, result of run_benchmarks()
+    :param baseline:
+        dict, previous result of run_benchmarks()
+    :return:
+        list of tuples (path, baseline value, new value, relative change)
+    """
+    changes = []
+
+    def walk(path, new, old):
+        if isinstance(new, dict) and isinstance(old, dict):
+            for key in new:
+                if key in old:
+                    walk(path + [key], new[key], old[key])
+        elif isinstance(new, (int, float)) and isinstance(old, (int, float)) and old:
+            changes.append(('.'.join(path), old, new, new / old - 1))
+
+    walk([], report['results'], baseline['results'])
+
+    return changes
+
+
+def add_parser(subparsers):
+    """
+    Adds 'benchmark' command to the command line parser
+
+    :param subparsers:
+        argparse subparsers action
+    """
+    parser = subparsers.add_parser('benchmark', help='measure speed of the engine and the bot')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplier of the number of iterations')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help='json file for the results')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='json file with the baseline results')
+
+
+def main(args):
+    """
+    Runs benchmarks with parsed command line arguments
+
+    :param args:
+        argparse.Namespace, see add_parser
+    """
+    report = run_benchmarks(args.scale, args.seed)
+
+    print(json.dumps(report, indent=2))
+
+    if args.compare is not None:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+
+        for path, old, new, change in compare(report, baseline):
+            print('{:40s} {:14.2f} -> {:14.2f} {:+8.1%}'.format(path, old, new, change))
+
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
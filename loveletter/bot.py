@@ -4,20 +4,42 @@
 """
 module docstring
 """
-import gettext
 import logging
 import argparse
 import os
+import random
 import sys
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from itertools import chain
 
 import telebot
+from telebot import types
 
 import numpy as np
 
+from loveletter import benchmark, loadgen, shards, tournament, tracing
+from loveletter.actors import ActorPool, SharedLock
+from loveletter.cards import CARDS
+from loveletter.endgame import Solver
+from loveletter.engine import Start, Restart, SelectCard, SelectVictim, GuessCard, KickDealer
 from loveletter.game import Game
+from loveletter.i18n import translator
+from loveletter.journal import Journal
+from loveletter.markups import CARD, GUESS, VICTIM, decode_move
+from loveletter.matchmaking import MAX_TABLE_SIZE, MIN_TABLE_SIZE, Matchmaker
+from loveletter.metrics import BotMetrics, Counter, Gauge, MetricsServer
+from loveletter.policies import CautiousPolicy, ISMCTSPolicy, load_policy
+from loveletter.sender import SendQueue
+from loveletter.sessions import SessionRegistry
+from loveletter.tableview import ViewUpdater
+from loveletter.timers import TimerWheel
+from loveletter.tracing import Tracer
+from loveletter.transport import TelegramTransport
 from loveletter.users import User
-
-gettext.install('loveletter', localedir='./loveletter/locale', codeset='UTF-8')
+from loveletter.webhook import WebhookServer
 
 
 class GameBot(telebot.TeleBot):
@@ -26,9 +48,52 @@ class GameBot(telebot.TeleBot):
     that handles all games and players interactions
 
     :attribute games: dict of {chat_id: game}
+    :attribute sender: SendQueue, that delivers messages in background
+    :attribute answers: SendQueue, that answers taps of inline buttons in background
+    :attribute handlers: dict of {command: handler}, see register_handlers
+    :attribute matchmaker: Matchmaker, that seats players of /queue at tables
+    :attribute timers: TimerWheel of the players turns, or None if turns are not limited
+    :attribute actors: ActorPool, that handles updates of each game one by one
+    :attribute journal: Journal of players actions, or None if state is not saved
+    :attribute sessions: SessionRegistry, that evicts idle games from memory
     """
 
-    def __init__(self, token):
+    # journal records of the players moves
+    _actions = {
+        'card': SelectCard,
+        'victim': SelectVictim,
+        'guess': GuessCard,
+    }
+
+    # commands of the players: command -> name of the handling method
+    _commands = {
+        'help': 'show_help',
+        'hint': 'show_hint',
+        'create': 'create_game',
+        'doubledeck': 'double_deck',
+        'join': 'join_user',
+        'addbot': 'add_bot',
+        'leave': 'leave_game',
+        'start': 'start_game',
+        'restart': 'restart_game',
+        'cards': 'show_cards',
+        'analyze': 'analyze',
+        'players': 'show_users',
+        'language': 'set_language',
+        'queue': 'queue_user',
+    }
+
+    # inline buttons of the moves: code -> (state of the game, journal record)
+    _moves = {
+        CARD: ('select_card', 'card'),
+        VICTIM: ('select_victim', 'victim'),
+        GUESS: ('guess_card', 'guess'),
+    }
+
+    def __init__(self, token, send_workers=4, workers=2, journal=None, sessions=None,
+                 transport=None, tracer=None, index=None, ingress=None, view_delay=None,
+                 queue_timeout=60.0, table_size=4, turn_timeouts=None, afk='auto',
+                 ai_budget=None, matchmaker=None, timers=None, on_handled=None, clock=time.monotonic):
         """
         Creates a bot
 
@@ -37,80 +102,795 @@ class GameBot(telebot.TeleBot):
             you should go to @BotFather in telegram and
             create a new bot (just send him a '/newbot'
             message and follow instructions, it's pretty easy)
+        :param send_workers:
+            int, number of threads that send messages to telegram
+        :param workers:
+            int, number of threads that handle incoming messages
+        :param journal:
+            Journal, where players actions are saved, games from it
+            are restored right away (None to keep games only in memory)
+        :param sessions:
+            SessionRegistry, that decides when idle games are evicted
+            (registry with default limits if None)
+        :param transport:
+            transport of outgoing calls (see loveletter.transport),
+            TelegramTransport if None
+        :param tracer:
+            Tracer, that records spans of sampled updates (see loveletter.tracing),
+            None to disable tracing
+        :param index:
+            ShardIndex, routes shared with other processes of the sharded mode
+            (see loveletter.shards), None to keep routes in memory
+        :param ingress:
+            function(messages), passes messages of players, whose games are kept
+            by other processes, back to the ingress of the sharded mode,
+            None in the single process mode
+        :param view_delay:
+            float, debounce window of the table view in seconds
+            (see loveletter.tableview), None to send every public message
+        :param queue_timeout:
+            float, seconds after which the table of /queue is filled by AI players
+        :param table_size:
+            int, number of players at the table of /queue, if player has not chosen it
+        :param turn_timeouts:
+            dict of {state: seconds}, time for the dealer's move in select_card,
+            select_victim and guess_card states, None or 0 to wait forever
+        :param afk:
+            str, what happens when the time is over: 'auto' makes
+            a cautious move for the player, 'kick' throws him out of the round
+        :param ai_budget:
+            float, time to think over a move for AI players in seconds
+            (ISMCTSPolicy.budget if None)
+        :param matchmaker:
+            Matchmaker of /queue, its on_table is set by the bot
+            (matchmaker with queue_timeout and the bot's clock if None)
+        :param timers:
+            TimerWheel of the turn timeouts (wheel with the bot's clock if None)
+        :param on_handled:
+            function(message, seconds), called by the actor after the message
+            is handled, with seconds from its receiving to the end of its handler
+        :param clock:
+            function, that returns current time in seconds,
+            for the table view, the queue and the turn timeouts
         """
-        super().__init__(token)
+        # handlers are called by actors, so telebot itself runs them synchronously
+        super().__init__(token, threaded=False)
+        self.actors = ActorPool(workers)
+        self.routes = index.routes if index is not None else {}
+        self.name_routes = index.name_routes if index is not None else {}
+        self.ingress = ingress
+        self.routes_lock = threading.Lock()
+        self.transport = transport if transport is not None else TelegramTransport()
+        self.transport.attach(self)
+        self.sender = None
+        self.answers = None
+        if self.transport.queued:
+            self.sender = SendQueue(self.transport.send_message, workers=send_workers)
+            # every tap has its own query id, so only the global limit matters
+            self.answers = SendQueue(self.transport.answer_callback_query, workers=1,
+                                     global_rate=100.0, global_burst=100)
+        self.views = None
+        if view_delay is not None:
+            self.views = ViewUpdater(self.transport, view_delay, clock=clock)
+        self.matchmaker = matchmaker if matchmaker is not None else Matchmaker(
+            timeout=queue_timeout, clock=clock)
+        self.matchmaker.on_table = self._on_table
+        # zero timeouts are turned off, without any timeouts there is no wheel
+        self.turn_timeouts = {state: timeout for state, timeout in (turn_timeouts or {}).items()
+                              if timeout}
+        self.afk = afk
+        self.ai_budget = ai_budget
+        self.timers = None
+        if self.turn_timeouts:
+            self.timers = timers if timers is not None else TimerWheel(clock=clock)
+        # game_id -> (game, (turn, state), Timer)
+        self._deadlines = {}
+        self._afk_policy = CautiousPolicy()
+        self.table_size = table_size
         self.games = {}
         self.users = {}
         self.name2user = {}
+        self.journal = journal
+        self.sessions = sessions if sessions is not None else SessionRegistry()
+        self.state_lock = SharedLock()
+        self.tracer = tracer
+        self.on_handled = on_handled
+        if tracer is not None:
+            tracing.instrument()
+        self.metrics = BotMetrics()
+        self.register_metrics()
         self.register_handlers()
 
+        if journal is not None:
+            self.restore()
+
+    def register_metrics(self):
+        """
+        Adds metrics, which are computed from the bot's state, when they are scraped
+        """
+        def sender_stats(name):
+            def collect():
+                if self.sender is not None:
+                    return {(): getattr(self.sender, name)}
+
+                return {(): self.metrics.messages.get() if name == 'sent' else 0}
+
+            return collect
+
+        self.metrics.register(Counter('loveletter_messages_sent_total',
+                                      'Messages delivered to telegram',
+                                      collect=sender_stats('sent')))
+        self.metrics.register(Counter('loveletter_messages_failed_total',
+                                      'Messages dropped after retries',
+                                      collect=sender_stats('failed')))
+        self.metrics.register(Counter(
+            'loveletter_view_calls_total', 'Sent and edited status messages of the table view',
+            ['call'], collect=lambda: {} if self.views is None else {
+                ('send',): self.views.sent, ('edit',): self.views.edited,
+                ('failed',): self.views.failed,
+            }))
+        self.metrics.register(Gauge('loveletter_games', 'Live games by state', ['state'],
+                                    collect=self._count_games))
+        self.metrics.register(Gauge('loveletter_players', 'Players of live games',
+                                    collect=lambda: {(): len(self.users)}))
+        self.turn_timeouts_total = self.metrics.register(Counter(
+            'loveletter_turn_timeouts_total', 'Turns of players, who were out of time', ['afk']))
+        self.metrics.register(Gauge('loveletter_queued_players', 'Players waiting for a table',
+                                    collect=lambda: {(): len(self.matchmaker)}))
+        self.metrics.register(Gauge('loveletter_spilled_games', 'Games spilled to disk',
+                                    collect=lambda: {(): len(self.sessions.spilled)}))
+
+    def _count_games(self):
+        counts = {}
+
+        # list() copies values at once, while handlers may change the dict
+        for game in {user.game for user in list(self.users.values())}:
+            counts[(game.state,)] = counts.get((game.state,), 0) + 1
+
+        return counts
+
     def register_handlers(self):
         """
-        Registers handlers for bot.
-        Handler is a function with '@bot.message_handler' descriptor,
-        once created, bot will continuously accept special commands from players
-        and handle it.
+        Builds the table of handlers: a message is parsed once and
+        its command is looked up in the table, texts without a command
+        (moves and chat) go straight to the text handler, taps of
+        inline buttons go to the callback handler.
+        Every handler is counted and timed by the bot's metrics
+        and recorded in traces, if tracing is enabled
+        """
+        self.handlers = {command: self._instrument(getattr(self, name))
+                         for command, name in self._commands.items()}
+        self.handle_text = self._instrument(self.text_handler)
+        self.handle_callback = self._instrument(self.callback_handler)
+
+    def _instrument(self, handler):
+        handler = self.metrics.timed(handler)
+
+        if self.tracer is not None:
+            handler = tracing.traced(handler, handler.__name__)
+
+        return handler
+
+    def dispatch(self, message):
+        """
+        Calls the handler of the message
+
+        :param message:
+            telebot.types.Message or telebot.types.CallbackQuery
+        """
+        if isinstance(message, types.CallbackQuery):
+            self.handle_callback(message)
+            return
+
+        if message.content_type != 'text':
+            return
+
+        words = command_words(message)
+
+        if words and words[0].startswith('/'):
+            handler = self.handlers.get(words[0][1:])
+
+            if handler is not None:
+                handler(message)
+                return
+
+        self.handle_text(message)
+
+    def process_new_messages(self, new_messages):
+        """
+        Passes messages to the actors of the games they belong to,
+        so messages of one game are handled strictly in order
+        and messages of different games are handled in parallel
+
+        :param new_messages:
+            list of telebot.types.Message
+        """
+        self.process_routed_messages([(message,) + self.predict(message)
+                                      for message in new_messages])
+
+    def process_routed_messages(self, routed):
+        """
+        Passes messages to the actors of the predicted games,
+        in the sharded mode routes are predicted by the ingress
+
+        :param routed:
+            list of tuples (message, key, previous), see predict
+        """
+        for message, key, previous in routed:
+            self.actors.submit(key, self._process_message, message, key, time.perf_counter(),
+                               previous)
+
+    def process_new_callback_query(self, new_callback_querys):
+        """
+        Passes taps of inline buttons to the actors of the players games,
+        they are handled in order with the players messages
+
+        :param new_callback_querys:
+            list of telebot.types.CallbackQuery
+        """
+        self.process_new_messages(new_callback_querys)
+
+    def route(self, message):
+        """
+        Predicts the game, which will be affected by the message (see predict)
+
+        :param message:
+            telebot.types.Message
+        :return:
+            int, id of the game (user_id of its creator),
+            or user_id if user has no game
+        """
+        return self.predict(message)[0]
+
+    def predict(self, message):
+        """
+        Predicts the game, which will be affected by the message,
+        when it is handled. Routes are updated right away by /create and /join,
+        so later messages go after them even if the game is not created yet.
+        If the player does not get into the game, his previous routes are restored
+
+        :param message:
+            telebot.types.Message
+        :return:
+            tuple (key, previous), key is id of the game (user_id of its creator)
+            or user_id if user has no game, previous is tuple of the player's route
+            and name route before /create or /join, None for other messages
+        """
+        user_id = message.from_user.id
+        username = message.from_user.username
+        words = command_words(message)
+        command = words[0] if words else None
+
+        with self.routes_lock:
+            if command == '/create':
+                key = user_id
+            elif command == '/join' and len(words) > 1 and words[1][1:] in self.name_routes:
+                key = self.name_routes[words[1][1:]]
+            elif command == '/join':
+                key = self.actor_key(message)
+            else:
+                return self.routes.get(user_id, user_id), None
+
+            previous = (self.routes.get(user_id),
+                        self.name_routes.get(username) if username else None)
+
+            self.routes[user_id] = key
+            if username:
+                self.name_routes[username] = key
+
+            return key, previous
+
+    def _restore_routes(self, from_user, key, previous):
+        """
+        Restores routes of the player, which were predicted for /create or /join,
+        unless they have been changed since then
+
+        :param from_user:
+            telebot.types.User, the player
+        :param key:
+            int, the predicted game
+        :param previous:
+            tuple of the player's route and name route (see predict)
+        """
+        route, name_route = previous
+
+        with self.routes_lock:
+            for routes, route_key, value in ((self.routes, from_user.id, route),
+                                             (self.name_routes, from_user.username, name_route)):
+                if route_key is None or routes.get(route_key) != key:
+                    continue
+
+                if value is None:
+                    del routes[route_key]
+                else:
+                    routes[route_key] = value
+
+    def actor_key(self, message):
+        """
+        Finds the game, which is affected by the message right now
+
+        :param message:
+            telebot.types.Message
+        :return:
+            int, id of the game (user_id of its creator),
+            or user_id if user has no game
+        """
+        user_id = message.from_user.id
+        words = command_words(message)
+
+        if words and words[0] == '/create':
+            return user_id
+
+        if words and words[0] == '/join' and len(words) > 1:
+            if words[1][1:] in self.name2user:
+                return self.name2user[words[1][1:]].game.game_id
+
+            key = self.sessions.find(name=words[1][1:])
+            if key is not None:
+                return self.sessions.game_id(key)
+
+        user = self.users.get(user_id)
+
+        if user is not None:
+            return user.game.game_id
+
+        key = self.sessions.find(user_id=user_id)
+        if key is not None:
+            return self.sessions.game_id(key)
+
+        return user_id
+
+    def _process_message(self, message, key, received=None, previous=None):
+        """
+        Handles message (or tap of inline button) within its actor, if the message's game
+        is not the predicted one (e.g. the game of /join is not found), it is forwarded
+        to the right actor
+
+        :param received:
+            float, time.perf_counter() when the message was received
+        :param previous:
+            tuple of the player's routes before /create or /join (see predict),
+            they are restored, if the player has not got into the game
+        """
+        current_key = self.actor_key(message)
+
+        if current_key != key:
+            self._forward(message, key, current_key, received, previous)
+            return
+
+        with self.trace(message, received), self.state_lock.shared():
+            self._wake(message)
+            self._rename(message.from_user)
+
+            self.dispatch(message)
+
+            user = self.users.get(message.from_user.id)
+            if user is not None:
+                self.sessions.touch(user.game)
+                self._arm(user.game)
+                self.play_ai(user.game)
+
+            if previous is not None and (user is None or user.game.game_id != key):
+                self._restore_routes(message.from_user, key, previous)
+
+        if self.on_handled is not None and received is not None:
+            self.on_handled(message, time.perf_counter() - received)
+
+        if self.sessions.sweep_due():
+            self.sweep()
+
+        if self.journal is not None and self.journal.snapshot_due():
+            self.snapshot()
+
+    def _forward(self, message, key, current_key, received, previous):
+        """
+        Passes message to the actor of the player's current game and corrects
+        his route. In the sharded mode, if the player has no game in this process,
+        the message is passed back to the ingress, which knows his game
+        """
+        user_id = message.from_user.id
+
+        if previous is not None:
+            # the predicted game is wrong, e.g. the name route of /join is outdated
+            self._restore_routes(message.from_user, key, previous)
+        elif (self.ingress is not None and user_id not in self.users
+              and self.sessions.find(user_id=user_id) is None):
+            with self.routes_lock:
+                if self.routes.get(user_id) == key:
+                    del self.routes[user_id]
+
+            self.ingress([message])
+            return
+        else:
+            with self.routes_lock:
+                self.routes[user_id] = current_key
+
+        self.actors.submit(current_key, self._process_message, message, current_key, received)
+
+    def trace(self, message, received=None):
+        """
+        Returns context manager, that traces handling of the message,
+        if tracing is enabled and the message is sampled
+
+        :param message:
+            telebot.types.Message
+        :param received:
+            float, time.perf_counter() when the message was received
+        """
+        if self.tracer is None:
+            return nullcontext()
+
+        if isinstance(message, types.CallbackQuery):
+            command = 'callback_query'
+        else:
+            words = command_words(message)
+            command = words[0] if words and words[0].startswith('/') else message.content_type
+
+        return self.tracer.trace('update', received, user_id=message.from_user.id,
+                                 command=command)
+
+    def _wake(self, message):
+        """
+        Loads spilled games of the message's author
+        and of the player, whom he is joining to
+        """
+        user_id = message.from_user.id
+        words = command_words(message)
+
+        keys = [self.sessions.find(user_id=user_id)]
+        if len(words) > 1 and words[0] == '/join':
+            keys.append(self.sessions.find(name=words[1][1:]))
+
+        for key in keys:
+            if key is not None and key in self.sessions.spilled:
+                self._wake_game(key)
+                self.record('wake', user_id, key)
+
+    def _wake_game(self, key):
+        data, users = self.sessions.wake(key, keep=self.journal is not None)
+
+        game = Game(self, data['game_id'], self.views)
+        game.load(data)
+
+        for user_id, _ in users:
+            self._bind(self._find_user(game, user_id))
+
+        self.sessions.touch(game)
+
+    def _rename(self, from_user):
+        """
+        Updates player's name, if he has changed his username
+        """
+        user = self.users.get(from_user.id)
+        name = from_user.username or from_user.first_name
+
+        if user is None or user.name == name:
+            return
+
+        self._set_name(user, name)
+        self.record('rename', user.user_id, name)
+
+    def _set_name(self, user, name):
+        if self.name2user.get(user.name) is user:
+            del self.name2user[user.name]
+
+        with self.routes_lock:
+            if self.name_routes.get(user.name) == user.game.game_id:
+                del self.name_routes[user.name]
+            self.name_routes[name] = user.game.game_id
+
+        user.name = name
+        self.name2user[name] = user
+
+    def sweep(self):
+        """
+        Evicts finished, abandoned and least recently used games
+        from memory, or spills them to disk (see loveletter.sessions)
         """
-        # This functions would be called only by base class methods,
-        # so linter thinks they are unused
-        # pylint: disable=unused-variable
+        with self.state_lock.exclusive():
+            bound = {}
+            for user in self.users.values():
+                bound.setdefault(user.game, []).append(user)
 
-        @self.message_handler(commands=['help'])
-        def show_help(message):
-            self.show_help(message)
+            for game, action in self.sessions.collect(bound):
+                users = bound[game]
+                user_ids = [user.user_id for user in users]
 
-        @self.message_handler(commands=['hint'])
-        def show_hint(message):
-            self.show_hint(message)
+                if action == 'spill':
+                    key = self.sessions.spill(game, users)
+                    self.record('spill', user_ids[0], key, user_ids)
+                else:
+                    self.record('evict', user_ids[0], user_ids)
 
-        @self.message_handler(commands=['create'])
-        def create_game(message):
-            self.create_game(message)
+                for user in users:
+                    self._unbind(user, keep_routes=action == 'spill')
 
-        @self.message_handler(commands=['doubledeck'])
-        def double_deck(message):
-            self.double_deck(message)
+        logging.info('Sessions: %s', self.session_stats())
 
-        @self.message_handler(commands=['join'])
-        def join_user(message):
-            self.join_user(message)
+    def session_stats(self):
+        """
+        Returns numbers of live, spilled and evicted games and live players
+
+        :return:
+            dict
+        """
+        return self.sessions.stats(players=len(self.users))
+
+    def record_actions(self, user_id, actions):
+        """
+        Saves moves made for the player (or for AI players of his game),
+        they are replayed as if the player made them
+
+        :param user_id:
+            int, id of the player
+        :param actions:
+            list of SelectCard, SelectVictim or GuessCard
+        """
+        kinds = {action: kind for kind, action in self._actions.items()}
+
+        for action in actions:
+            self.record(kinds[type(action)], user_id, action[0])
+
+    def record(self, *record):
+        """
+        Saves accepted action to the journal (if there is one),
+        record is replayed by replay() on restore
+
+        :param record:
+            kind of action, user_id of the player and action's arguments
+        """
+        if self.journal is not None:
+            self.journal.append(list(record))
+
+    def replay(self, record):
+        """
+        Applies journal record to the games without sending any messages
+
+        :param record:
+            list, kind of action, user_id of the player and action's arguments
+        """
+        kind, user_id, *args = record
+
+        if kind == 'wake':
+            self._wake_game(args[0])
+            return
+
+        if kind == 'evict':
+            for evicted_id in args[0]:
+                self._unbind(self.users[evicted_id])
+            return
+
+        if kind == 'spill':
+            key, user_ids = args
+            users = [self.users[spilled_id] for spilled_id in user_ids]
+            self.sessions.spill(users[0].game, users, key)
+
+            for user in users:
+                self._unbind(user, keep_routes=True)
+            return
+
+        if kind == 'create':
+            self._create(user_id, *args)
+            return
+
+        if kind == 'join':
+            name, friend_name, *locale = args
+            friend = self.name2user[friend_name]
+            self._join(self.users[friend.user_id].game, user_id, name, *locale)
+            return
 
-        @self.message_handler(commands=['leave'])
-        def leave_game(message):
-            self.leave_game(message)
+        user = self.users[user_id]
+        game = user.game
+
+        if kind == 'addbot':
+            self._add_ai(game, args[0])
+        elif kind == 'leave':
+            self._remove_user(user)
+        elif kind == 'rename':
+            self._set_name(user, args[0])
+        elif kind == 'language':
+            user.locale = args[0]
+        elif kind == 'kick':
+            game.apply(KickDealer())
+        elif kind == 'doubledeck':
+            game.double_deck = args[0]
+        elif kind in ('start', 'restart'):
+            game.rng = random.Random(args[0])
+            game.apply(Start() if kind == 'start' else Restart())
+        else:
+            game.apply(self._actions[kind](args[0]))
+
+    def restore(self):
+        """
+        Loads the last snapshot, replays the journal after it
+        and starts writing the journal. If something was replayed,
+        new snapshot is made, so the next restore is faster
+        """
+        snapshot, records = self.journal.load()
+
+        if snapshot is not None:
+            self.load_state(snapshot)
 
-        @self.message_handler(commands=['start'])
-        def start_game(message):
-            self.start_game(message)
+        for record in records:
+            self.replay(record)
 
-        @self.message_handler(commands=['restart'])
-        def restart_game(message):
-            self.restart_game(message)
+        self.journal.open()
 
-        @self.message_handler(commands=['cards'])
-        def show_cards(message):
-            self.show_cards(message)
+        for user in self.users.values():
+            self.sessions.touch(user.game)
+            self._arm(user.game)
+            self.play_ai(user.game)
 
-        @self.message_handler(commands=['players'])
-        def show_users(message):
-            self.show_users(message)
+        if records:
+            self.snapshot()
 
-        @self.message_handler(content_types=['text'])
-        def text_handler(message):
-            self.text_handler(message)
+        logging.info('Restored %d players, %d records replayed', len(self.users), len(records))
 
-    def get_game(self, user_id):
+    def snapshot(self):
+        """
+        Saves state of all games to the journal, handlers are paused
+        only while the state is dumped, file is written after that
+        """
+        with self.state_lock.exclusive():
+            segment = self.journal.rotate()
+            state = self.dump_state()
+            garbage = self.sessions.take_garbage()
+
+        self.journal.write_snapshot(segment, state)
+        self.sessions.delete_garbage(garbage)
+
+        logging.info('Snapshot of %d games is saved', len(state['games']))
+
+    def dump_state(self):
+        """
+        Returns state of all games as plain python data
+
+        :return:
+            dict, see load_state()
+        """
+        games = []
+        indices = {}
+        users = []
+
+        for user_id, user in self.users.items():
+            if id(user.game) not in indices:
+                indices[id(user.game)] = len(games)
+                games.append(dict(user.game.dump(), game_id=user.game.game_id))
+
+            users.append((user_id, indices[id(user.game)]))
+
+        return {'games': games, 'users': users, 'spilled': self.sessions.dump()}
+
+    def load_state(self, state):
+        """
+        Restores games dumped by dump_state()
+
+        :param state:
+            dict, result of dump_state()
+        """
+        games = []
+
+        for data in state['games']:
+            game = Game(self, data['game_id'], self.views)
+            game.load(data)
+            games.append(game)
+
+        for user_id, index in state['users']:
+            self._bind(self._find_user(games[index], user_id))
+
+        self.sessions.load(state['spilled'])
+
+    def make_policy(self, spec):
+        """
+        Creates policy of the AI player restored from the journal,
+        AI players think as long as the bot allows (see ai_budget)
+
+        :param spec:
+            str, name of the policy (see loveletter.policies.load_policy)
+        :return:
+            Policy
+        """
+        if spec == ISMCTSPolicy.name:
+            return ISMCTSPolicy(budget=self.ai_budget)
+
+        return load_policy(spec)
+
+    @staticmethod
+    def _find_user(game, user_id):
+        return next(user for user in chain(game.users, game.users.loosers)
+                    if user.user_id == user_id)
+
+    def _bind(self, user):
+        """
+        Makes user the current player of his game
+        """
+        self.users[user.user_id] = user
+        self.name2user[user.name] = user
+
+        with self.routes_lock:
+            self.routes[user.user_id] = user.game.game_id
+            self.name_routes[user.name] = user.game.game_id
+
+    def _unbind(self, user, keep_routes=False):
+        """
+        Forgets the player, routes are kept for spilled games,
+        so his next message goes to the actor of the spilled game
+        """
+        self.users.pop(user.user_id, None)
+
+        if self.views is not None:
+            self.views.forget(user.user_id)
+
+        if self.name2user.get(user.name) is user:
+            del self.name2user[user.name]
+
+        if keep_routes:
+            return
+
+        with self.routes_lock:
+            if self.routes.get(user.user_id) == user.game.game_id:
+                del self.routes[user.user_id]
+            if self.name_routes.get(user.name) == user.game.game_id:
+                del self.name_routes[user.name]
+
+    def send_message(self, chat_id, text, **kwargs):
+        """
+        Queues message to be sent in background, so handlers
+        never wait for telegram (see loveletter.sender).
+        Arguments are the same as in telebot.TeleBot.send_message
+
+        :param chat_id:
+            int, id of the recipient
+        :param text:
+            str, message to be sent
+        """
+        self.metrics.messages.inc()
+
+        if self.sender is None:
+            with tracing.span('send_message', chat_id=chat_id):
+                self.transport.send_message(chat_id, text, **kwargs)
+        else:
+            # the trace is finished, when the message is delivered
+            callback = tracing.defer('send_message', chat_id=chat_id)
+            self.sender.put(chat_id, text, callback=callback, **kwargs)
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        """
+        Answers tap of inline button in background, so the player's
+        client stops waiting. Arguments are the same as in
+        telebot.TeleBot.answer_callback_query
+
+        :param callback_query_id:
+            str, id of the tap
+        :param text:
+            str, notification shown to the player, or None
+        """
+        if self.answers is None:
+            self.transport.answer_callback_query(callback_query_id, text, **kwargs)
+        else:
+            self.answers.put(callback_query_id, text, **kwargs)
+
+    def get_me(self):
+        """
+        Returns the bot's own user (see telebot.TeleBot.get_me)
+        """
+        return self.transport.get_me()
+
+    def get_game(self, user_id, locale=None):
         """
         Helper function to get game by chat_id
         where it is playing, if game not found returns None
 
         :param user_id:
             int, is of one of the players
+        :param locale:
+            str, language of the player
         :return:
             Game, if game was created in chat with given id,
             else None
         """
         if user_id not in self.users.keys():
+            _ = translator.gettext(locale)
             self.send_message(
                 user_id,
                 _("You didn't join to any game yet, try send me a /create or /join <game_id>")
@@ -122,6 +902,23 @@ class GameBot(telebot.TeleBot):
 
         return game
 
+    def locale(self, from_user):
+        """
+        Returns language of the player, if he is not playing
+        yet, his telegram language is used
+
+        :param from_user:
+            telebot.types.User, author of the message
+        :return:
+            str, name of the locale
+        """
+        user = self.users.get(from_user.id)
+
+        if user is not None and user.locale is not None:
+            return user.locale
+
+        return translator.resolve(getattr(from_user, 'language_code', None))
+
     def show_help(self, message):
         """
         Shows help in chat
@@ -131,6 +928,7 @@ class GameBot(telebot.TeleBot):
             info about chat where it was written and user who wrote it
         """
 
+        _ = translator.gettext(self.locale(message.from_user))
         self.send_message(message.chat.id, _("help"))
 
     def show_hint(self, message):
@@ -141,6 +939,7 @@ class GameBot(telebot.TeleBot):
             telebot.types.Message, message that contains
             info about chat where it was written and user who wrote it
         """
+        _ = translator.gettext(self.locale(message.from_user))
         self.send_message(message.chat.id, _("hints"))
 
     def create_game(self, message):
@@ -152,23 +951,21 @@ class GameBot(telebot.TeleBot):
             info about chat where it was written and user who wrote it
         """
         user_id = message.from_user.id
-        user_name = message.from_user.username or message.from_user.username
+        user_name = message.from_user.username or message.from_user.first_name
+        locale = self.locale(message.from_user)
+        _ = translator.gettext(locale)
 
         if user_id in self.users.keys():
             self.send_message(user_id,
                               _("The game has been already created in this chat, restarting it"))
 
-        game = Game(self)
-        user = User(user_name, user_id, self, game)
-
-        game.users.add(user)
-        self.users[user_id] = user
-        self.name2user[user_name] = user
+        self.matchmaker.cancel(user_id)
+        self._create(user_id, user_name, locale)
+        self.record('create', user_id, user_name, locale)
 
         self.send_message(user_id, _("Game is created, resend next message to your "
                                      "freinds whith whom you would like to play").format(user_id))
 
-        print(self.get_me().username)
         self.send_message(user_id,
                           _("Player @{0} invites you to love letter game, "
                             "send message <code>/join @{0}</code> here @{1} "
@@ -177,6 +974,78 @@ class GameBot(telebot.TeleBot):
 
         logging.info('Chat #%d: game created', user_id)
 
+    def _create(self, user_id, user_name, locale=None):
+        """
+        Creates game and adds its creator to it
+
+        :return:
+            Game, created game
+        """
+        game = Game(self, user_id, self.views)
+        self._add_user(game, user_id, user_name, locale)
+
+        return game
+
+    def _add_user(self, game, user_id, user_name, locale=None):
+        user = User(user_name, user_id, game, locale)
+
+        game.users.add(user)
+        self._bind(user)
+
+        return user
+
+    def _join(self, game, user_id, user_name, locale=None):
+        """
+        Adds player to the game, the second deck
+        is added automatically when there are 6 players
+
+        :return:
+            bool, True if the second deck is added
+        """
+        self._add_user(game, user_id, user_name, locale)
+
+        return self._auto_double_deck(game)
+
+    def _add_ai(self, game, name):
+        """
+        Adds AI player to the game, AI players are not bound to the bot
+        and have negative ids, so they never receive messages
+
+        :return:
+            bool, True if the second deck is added
+        """
+        user_id = -1 - sum(1 for user in chain(game.users, game.users.loosers)
+                           if user.policy is not None)
+
+        game.users.add(User(name, user_id, game, policy=ISMCTSPolicy(budget=self.ai_budget)))
+
+        return self._auto_double_deck(game)
+
+    @staticmethod
+    def _ai_name(game):
+        names = {user.name for user in game.users}
+
+        return next('bot{}'.format(num) for num in range(1, len(names) + 2)
+                    if 'bot{}'.format(num) not in names)
+
+    @staticmethod
+    def _auto_double_deck(game):
+        if game.users.num_users() == 6 and not game.double_deck:
+            game.double_deck = True
+            return True
+
+        return False
+
+    def _remove_user(self, user):
+        users = user.game.users
+
+        if user in users:
+            users.queue.remove(user)
+        else:
+            users.loosers.remove(user)
+
+        self._unbind(user)
+
     def double_deck(self, message):
         """
         Toggles second set of cards,
@@ -187,10 +1056,12 @@ class GameBot(telebot.TeleBot):
             telebot.types.Message, message that contains
             info about chat where it was written and user who wrote it
         """
-        user_id = message.user.id
-        username = message.user.name or message.from_user.username
+        user_id = message.from_user.id
+        username = message.from_user.username or message.from_user.first_name
+        locale = self.locale(message.from_user)
+        _ = translator.gettext(locale)
 
-        game = self.get_game(user_id)
+        game = self.get_game(user_id, locale)
 
         if not game:
             return
@@ -199,13 +1070,17 @@ class GameBot(telebot.TeleBot):
             self.send_message(user_id, _("The game is already started"))
             return
 
-        if not game.double_deck:
-            game.double_deck = True
-            game.public_message(_("The second deck is added by @{}".format(username)))
-        else:
-            game.double_deck = False
-            game.public_message(_("The second deck is removed by @{}".format(username)))
-
+        with game.outbox:
+            if not game.double_deck:
+                game.double_deck = True
+                game.public_message(
+                    lambda _: _("The second deck is added by @{}").format(username))
+            else:
+                game.double_deck = False
+                game.public_message(
+                    lambda _: _("The second deck is removed by @{}").format(username))
+
+        self.record('doubledeck', user_id, game.double_deck)
         logging.info('Chat #%d: set doubledeck', user_id)
 
     def join_user(self, message):
@@ -219,6 +1094,8 @@ class GameBot(telebot.TeleBot):
         text = message.text.split()
         user_id = message.from_user.id
         username = message.from_user.username or message.from_user.first_name
+        locale = self.locale(message.from_user)
+        _ = translator.gettext(locale)
 
         logging.info(text)
 
@@ -248,49 +1125,78 @@ class GameBot(telebot.TeleBot):
             self.send_message(user_id, _("You already joined to game"))
             return
 
-        user = User(username, user_id, self, game)
-        self.users[user_id] = user
-        self.name2user[username] = user
+        self.matchmaker.cancel(user_id)
+        double_deck_added = self._join(game, user_id, username, locale)
+        self.record('join', user_id, username, friend_name, locale)
 
-        game.users.add(user)
-        game.public_message('Player @{} joined to game'.format(username))
+        with game.outbox:
+            game.public_message('Player @{} joined to game'.format(username))
 
-        if game.users.num_users() == 6 and not game.double_deck:
-            game.double_deck = True
-            game.public_message(
-                _("The number of players reached 6, the second deck is automatically added")
-            )
+            if double_deck_added:
+                game.public_message(lambda _: _(
+                    "The number of players reached 6, the second deck is automatically added"
+                ))
 
         logging.info('Chat #%d: user #%d added', friend.user_id, user_id)
 
-    def leave_game(self, message):
+    def add_bot(self, message):
+        """
+        Adds AI player to the game of the user who wrote this message
+
+        :param message:
+            telebot.types.Message, message that contains
+            info about chat where it was written and user who wrote it
+        """
         user_id = message.from_user.id
+        locale = self.locale(message.from_user)
+        _ = translator.gettext(locale)
 
-        game = self.get_game(user_id)
+        game = self.get_game(user_id, locale)
 
-        if game is None:
+        if not game:
             return
 
-        user = self.users[user_id]
+        if game.state != 'not_started':
+            self.send_message(user_id, _("Game has been already started"))
+            return
 
-        if user in game.users:
-            if game.state != 'not_started':
-                self.send_message(user_id, _("The game already started, you cannot leave!"))
-                return
+        name = self._ai_name(game)
+        double_deck_added = self._add_ai(game, name)
+        self.record('addbot', user_id, name)
 
-            game.users.queue.remove(user)
+        with game.outbox:
+            game.public_message('Player @{} joined to game'.format(name))
 
-            self.users.pop(user_id)
-            self.name2user.pop(user.name)
+            if double_deck_added:
+                game.public_message(lambda _: _(
+                    "The number of players reached 6, the second deck is automatically added"
+                ))
 
-            self.send_message(user_id, _("You left the game"))
+        logging.info('Chat #%d: AI player added', user_id)
+
+    def leave_game(self, message):
+        user_id = message.from_user.id
+        locale = self.locale(message.from_user)
+        _ = translator.gettext(locale)
+
+        if self.matchmaker.cancel(user_id):
+            self.send_message(user_id, _("You left the queue"))
             return
 
-        if user in game.users.loosers:
-            game.users.loosers.remove(user)
+        game = self.get_game(user_id, locale)
 
-            self.users.pop(user_id)
-            self.name2user.pop(user.name)
+        if game is None:
+            return
+
+        user = self.users[user_id]
+
+        if user in game.users and game.state != 'not_started':
+            self.send_message(user_id, _("The game already started, you cannot leave!"))
+            return
+
+        if user in game.users or user in game.users.loosers:
+            self._remove_user(user)
+            self.record('leave', user_id)
 
             self.send_message(user_id, _("You left the game"))
 
@@ -306,7 +1212,9 @@ class GameBot(telebot.TeleBot):
         """
         user_id = message.from_user.id
 
-        game = self.get_game(user_id)
+        locale = self.locale(message.from_user)
+        _ = translator.gettext(locale)
+        game = self.get_game(user_id, locale)
 
         if not game:
             return
@@ -316,11 +1224,237 @@ class GameBot(telebot.TeleBot):
                               _("Not enough players, to play, you need at least 2 of them"))
             return
 
-        game.start()
-        game.start_turn()
+        self._start_game(game, user_id)
 
         logging.info("Chat #%d: game started", user_id)
 
+    def _start_game(self, game, user_id):
+        # seed is saved, so the journal replays the same deck
+        seed = random.getrandbits(64)
+        game.rng = random.Random(seed)
+        game.start()
+        self.record('start', user_id, seed)
+
+    def queue_user(self, message):
+        """
+        Puts player to the queue of strangers, who wait for a table,
+        '/queue 3' sets the number of players at the table
+
+        :param message:
+            telebot.types.Message, message that contains
+            info about chat where it was written and user who wrote it
+        """
+        words = message.text.split()
+        user_id = message.from_user.id
+        username = message.from_user.username or message.from_user.first_name
+        locale = self.locale(message.from_user)
+        _ = translator.gettext(locale)
+
+        size = self.table_size
+        if len(words) > 1:
+            size = int(words[1]) if words[1].isdigit() else 0
+
+        if not MIN_TABLE_SIZE <= size <= MAX_TABLE_SIZE:
+            self.send_message(user_id, _("Table size must be from {} to {}").format(
+                MIN_TABLE_SIZE, MAX_TABLE_SIZE))
+            return
+
+        if not self._is_free(user_id):
+            self.send_message(user_id, _("You are already playing, /leave the game first"))
+            return
+
+        waiting = self.matchmaker.enqueue(user_id, username, locale, size)
+
+        if waiting:
+            self.send_message(user_id, _(
+                "You are in the queue for a table of {} players ({} waiting), "
+                "empty seats are taken by AI players in {:.0f} seconds"
+            ).format(size, waiting, self.matchmaker.timeout))
+
+        logging.info('Chat #%d: queued for %d players', user_id, size)
+
+    def _is_free(self, user_id):
+        """
+        Checks that player has no game, or his game is over
+        """
+        user = self.users.get(user_id)
+
+        return user is None or user.game.state == 'game_over'
+
+    def _on_table(self, tickets, ai):
+        """
+        Passes the table formed by the matchmaker to the actor of its game,
+        routes are updated right away, so messages of the players go after it
+        """
+        game_id = tickets[0].user_id
+
+        with self.routes_lock:
+            for ticket in tickets:
+                self.routes[ticket.user_id] = game_id
+                self.name_routes[ticket.name] = game_id
+
+        self.actors.submit(game_id, self._seat, tickets, ai)
+
+    def _seat(self, tickets, ai):
+        """
+        Creates the game of the players from the queue, fills empty seats
+        by AI players and starts it. Players, who found another game
+        while waiting, are replaced by AI players as well
+        """
+        with self.state_lock.shared():
+            free = [ticket for ticket in tickets if self._is_free(ticket.user_id)]
+
+            if not free:
+                return
+
+            creator = free[0]
+
+            # game's actor is the actor of its creator
+            if creator is not tickets[0]:
+                self._on_table(free, ai + len(tickets) - len(free))
+                return
+
+            game = self._create(creator.user_id, creator.name, creator.locale)
+            self.record('create', creator.user_id, creator.name, creator.locale)
+
+            for ticket in free[1:]:
+                self._join(game, ticket.user_id, ticket.name, ticket.locale)
+                self.record('join', ticket.user_id, ticket.name, creator.name, ticket.locale)
+
+            for _ in range(ai + len(tickets) - len(free)):
+                name = self._ai_name(game)
+                self._add_ai(game, name)
+                self.record('addbot', creator.user_id, name)
+
+            with game.outbox:
+                game.public_message(lambda _: _("The table is ready: {}").format(
+                    ', '.join('@' + user.name for user in game.users)))
+                self._start_game(game, creator.user_id)
+
+            self.sessions.touch(game)
+            self._arm(game)
+            self.play_ai(game)
+
+        logging.info('Chat #%d: game of the queue started', creator.user_id)
+
+    def play_ai(self, game):
+        """
+        Submits the move of the AI dealer to the game's actor. Every move
+        of AI players is a separate task, so other tasks of the actor
+        and the state lock are not held by the whole chain of AI moves
+        """
+        if game.state in ('select_card', 'select_victim', 'guess_card') and \
+                game.dealer.policy is not None:
+            self.actors.submit(game.game_id, self._ai_move, game, (game.turn, game.state))
+
+    def _ai_move(self, game, key):
+        """
+        Makes the move of the AI dealer. The move is searched without
+        the state lock: the game is changed only by its actor, and its move
+        is dropped, if the game is evicted meanwhile
+        """
+        with self.state_lock.shared():
+            if self._ai_witness(game, key) is None:
+                return
+
+        action = game.dealer.policy.act(game, game.rng)
+
+        with self.state_lock.shared():
+            witness = self._ai_witness(game, key)
+
+            if witness is None:
+                return
+
+            game.act(action)
+            self.record_actions(witness.user_id, [action])
+
+            self.sessions.touch(game)
+            self._arm(game)
+            self.play_ai(game)
+
+    def _ai_witness(self, game, key):
+        """
+        Returns the live human player of the game, on whose behalf
+        the moves of AI players are saved, None if the move of the turn
+        is already made or the game is evicted
+        """
+        if (game.turn, game.state) != key:
+            return None
+
+        return next((user for user in chain(game.users, game.users.loosers)
+                     if user.policy is None and self.users.get(user.user_id) is user), None)
+
+    def _arm(self, game):
+        """
+        Sets the deadline of the dealer's move, when the game has moved
+        to another turn or state. Deadlines of a game are changed only
+        by its actor
+        """
+        if self.timers is None:
+            return
+
+        key = (game.turn, game.state)
+        deadline = self._deadlines.get(game.game_id)
+
+        if deadline is not None:
+            if deadline[0] is game and deadline[1] == key:
+                return
+
+            self.timers.cancel(deadline[2])
+            del self._deadlines[game.game_id]
+
+        timeout = self.turn_timeouts.get(game.state)
+
+        if timeout:
+            timer = self.timers.schedule(timeout, self._on_deadline, game, key)
+            self._deadlines[game.game_id] = (game, key, timer)
+
+    def _on_deadline(self, game, key):
+        # called by the timer wheel, the move is made by the game's actor
+        self.actors.submit(game.game_id, self._turn_timeout, game, key)
+
+    def _turn_timeout(self, game, key):
+        """
+        Makes the move of the dealer, who is out of time,
+        or kicks him out of the round (see afk)
+        """
+        with self.state_lock.shared():
+            deadline = self._deadlines.get(game.game_id)
+
+            if deadline is not None and deadline[0] is game and deadline[1] == key:
+                del self._deadlines[game.game_id]
+
+            dealer = game.dealer
+
+            # the move is made, or the game is evicted
+            if (game.turn, game.state) != key or self.users.get(dealer.user_id) is not dealer:
+                return
+
+            _ = translator.gettext(dealer.locale)
+
+            with game.outbox:
+                if self.afk == 'kick':
+                    game.kick_dealer()
+                    self.record('kick', dealer.user_id)
+                else:
+                    game.private_message(dealer, _("Time is over, the move is made for you"))
+                    actions = []
+
+                    # the whole move is made at once: the card, the victim and the guess
+                    while game.turn == key[0] and \
+                            game.state in ('select_card', 'select_victim', 'guess_card'):
+                        action = self._afk_policy.act(game, random)
+                        actions.append(action)
+                        game.act(action)
+
+                    self.record_actions(dealer.user_id, actions)
+
+            self.turn_timeouts_total.inc(self.afk)
+            self._arm(game)
+            self.play_ai(game)
+
+        logging.info('Chat #%d: turn %d is timed out', game.game_id, key[0])
+
     def restart_game(self, message):
         """
         Restarts game
@@ -332,25 +1466,32 @@ class GameBot(telebot.TeleBot):
 
         user_id = message.from_user.id
 
-        game = self.get_game(user_id)
+        locale = self.locale(message.from_user)
+        game = self.get_game(user_id, locale)
 
         if not game:
             return
 
+        seed = random.getrandbits(64)
+        game.rng = random.Random(seed)
         game.restart()
+        self.record('restart', user_id, seed)
 
         logging.info("Chat #%d: game restarted", user_id)
 
     def show_cards(self, message):
         """
         Shows all cards that was already played
+        and chances of cards in hands of other players
 
         :param message:
             telebot.types.Message, message that contains
             info about chat where it was written and user who wrote it
         """
         user_id = message.from_user.id
-        game = self.get_game(user_id)
+        locale = self.locale(message.from_user)
+        _ = translator.gettext(locale)
+        game = self.get_game(user_id, locale)
 
         if game is None:
             return
@@ -358,11 +1499,69 @@ class GameBot(telebot.TeleBot):
         used_cards = _("Dropped cards list:\n")
         unique_used_cards = np.unique(sorted(game.used_cards), return_counts=True)
 
-        for num, card in enumerate(unique_used_cards[0]):
-            used_cards += ' - {:10s} [{}]\n'.format(card.name, unique_used_cards[1][num])
+        for num, value in enumerate(unique_used_cards[0]):
+            used_cards += ' - {:10s} [{}]\n'.format(_(CARDS[value].name),
+                                                    unique_used_cards[1][num])
+
+        user = self.users[user_id]
+
+        if game.state in ('select_card', 'select_victim', 'guess_card') and user in game.users:
+            used_cards += _("\nCards of other players:\n")
+
+            for other in game.users:
+                if other is user:
+                    continue
+
+                chances = sorted(game.beliefs.distribution(other, user).items(),
+                                 key=lambda item: -item[1])
+                used_cards += ' - @{}: {}\n'.format(other.name, ', '.join(
+                    '{} {:.0%}'.format(_(name), chance) for name, chance in chances
+                ))
 
         self.send_message(user_id, used_cards)
 
+    def analyze(self, message):
+        """
+        Shows chances to win of the dealer's moves,
+        when the end of the round can be solved exactly (see loveletter.endgame)
+
+        :param message:
+            telebot.types.Message, message that contains
+            info about chat where it was written and user who wrote it
+        """
+        user_id = message.from_user.id
+        locale = self.locale(message.from_user)
+        _ = translator.gettext(locale)
+        game = self.get_game(user_id, locale)
+
+        if game is None:
+            return
+
+        if game.state != 'select_card' or game.dealer is not self.users[user_id]:
+            self.send_message(user_id, _("You can analyze only your own turn"))
+            return
+
+        solver = Solver()
+
+        if not solver.applicable(game):
+            self.send_message(user_id, _("Too many cards are left, wait for the end of the round"))
+            return
+
+        moves = solver.solve(game, game.beliefs.known_cards(game.dealer), game.beliefs.excluded)
+        text = _("Chances to win:\n")
+
+        for chance, card_name, victim, guess in moves[:5]:
+            move = _(card_name)
+
+            if victim is not None:
+                move += ' -> @{}'.format(victim)
+            if guess is not None:
+                move += ' ({})'.format(_(guess))
+
+            text += ' - {} [{:.0%}]\n'.format(move, chance)
+
+        self.send_message(user_id, text)
+
     def show_users(self, message):
         """
         Shows all players, who is current dealer,
@@ -374,7 +1573,9 @@ class GameBot(telebot.TeleBot):
         :return:
         """
         user_id = message.from_user.id
-        game = self.get_game(user_id)
+        locale = self.locale(message.from_user)
+        _ = translator.gettext(locale)
+        game = self.get_game(user_id, locale)
 
         if not game:
             return
@@ -390,6 +1591,34 @@ class GameBot(telebot.TeleBot):
 
         self.send_message(user_id, users)
 
+    def set_language(self, message):
+        """
+        Changes language of the player's messages, e.g. '/language ru'
+
+        :param message:
+            telebot.types.Message, message that contains
+            info about chat where it was written and user who wrote it
+        """
+        user_id = message.from_user.id
+        words = message.text.split()
+
+        if self.get_game(user_id, self.locale(message.from_user)) is None:
+            return
+
+        if len(words) < 2 or translator.resolve(words[1], default='') == '':
+            _ = translator.gettext(self.locale(message.from_user))
+            self.send_message(user_id, _("Supported languages: {}").format(
+                ', '.join(sorted(translator.catalogs))))
+            return
+
+        locale = translator.resolve(words[1])
+        _ = translator.gettext(locale)
+
+        self.users[user_id].locale = locale
+        self.record('language', user_id, locale)
+
+        self.send_message(user_id, _("Language is set to {}").format(locale))
+
     def text_handler(self, message):
         """
         Handles all free-text messages, that are
@@ -401,28 +1630,228 @@ class GameBot(telebot.TeleBot):
         """
         user_id = message.from_user.id
         user_name = message.from_user.username
-        game = self.get_game(user_id)
+        locale = self.locale(message.from_user)
+        game = self.get_game(user_id, locale)
 
         if not game:
             return
 
+        # cards are chosen by their translated names
+        card_name = translator.parse(locale, message.text)
+
         if game.state != 'not_started' and user_id == game.dealer.user_id:
             if game.state == 'select_card' and \
-                    message.text in [game.dealer.card.name, game.dealer.new_card.name]:
-                game.select_card(message.text)
+                    card_name in [game.dealer.card.name, game.dealer.new_card.name]:
+                game.select_card(card_name)
+                self.record('card', user_id, card_name)
                 return
 
             if (game.state == 'select_victim' and
                     (message.text in game.users.get_victims(game.dealer) or
                      game.can_choose_yourself and message.text == game.dealer.name)):
                 game.select_victim(message.text)
+                self.record('victim', user_id, message.text)
                 return
 
-            if game.state == 'guess_card':
-                game.guess_card(message.text)
+            if game.state == 'guess_card' and card_name in game.list_possible_guesses():
+                game.guess_card(card_name)
+                self.record('guess', user_id, card_name)
                 return
 
-        game.public_message('@{}: {}'.format(user_name, message.text), but=user_id)
+        game.public_message('@{}: {}'.format(user_name, message.text), but=user_id, notify=True)
+
+    def callback_handler(self, call):
+        """
+        Handles taps of the moves inline buttons (see loveletter.markups).
+        The move is found by its code, taps of other games, previous turns
+        or already made moves are answered as outdated and dropped
+
+        :param call:
+            telebot.types.CallbackQuery
+        """
+        user_id = call.from_user.id
+        _ = translator.gettext(self.locale(call.from_user))
+
+        move = decode_move(call.data)
+        user = self.users.get(user_id)
+        game = user.game if user is not None else None
+        kind = argument = None
+
+        if move is not None and game is not None:
+            game_id, turn, code, value = move
+            state, kind = self._moves.get(code, (None, None))
+
+            if (game.game_id == game_id and game.turn == turn and game.state == state
+                    and game.dealer.user_id == user_id):
+                argument = self._move_argument(game, code, value)
+
+        if argument is None:
+            self.answer_callback_query(call.id, _("This button is outdated"))
+            return
+
+        self.answer_callback_query(call.id)
+
+        game.act(self._actions[kind](argument))
+        self.record(kind, user_id, argument)
+
+    @staticmethod
+    def _move_argument(game, code, value):
+        """
+        Returns argument of the move's action (name of the card or the victim),
+        or None if the button's value is not allowed at the moment
+        """
+        if code == VICTIM:
+            victims = game.list_possible_victims()
+            return victims[value] if 0 <= value < len(victims) else None
+
+        if not 0 < value < len(CARDS):
+            return None
+
+        name = CARDS[value].name
+
+        if code == CARD and name in (game.dealer.card.name, game.dealer.new_card.name):
+            return name
+
+        if code == GUESS and name in game.list_possible_guesses():
+            return name
+
+        return None
+
+
+def command_words(update):
+    """
+    Returns words of the message's text, taps of inline buttons have no text.
+    The command is the same for routing and handlers, even if it is addressed
+    to the bot, e.g. /join@loveletter_gamebot is /join
+
+    :param update:
+        telebot.types.Message or telebot.types.CallbackQuery
+    :return:
+        list of str
+    """
+    words = (getattr(update, 'text', None) or '').split()
+
+    if words and words[0].startswith('/'):
+        words[0] = words[0].split('@')[0]
+
+    return words
+
+
+def create_parser():
+    """
+    Creates the command line parser of the bot and its commands
+
+    :return:
+        argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--token', type=str, default=None)
+    parser.add_argument('--send-workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=2,
+                        help='number of threads that handle updates')
+    parser.add_argument('--webhook', action='store_true',
+                        help='receive updates by webhook instead of polling')
+    parser.add_argument('--webhook-url', type=str, default=None,
+                        help='public url of the webhook to register in telegram')
+    parser.add_argument('--webhook-path', type=str, default=None,
+                        help='url path of the webhook (/<token> by default)')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--journal', type=str, default=None,
+                        help='directory, where games are saved to survive restarts')
+    parser.add_argument('--snapshot-every', type=int, default=10000,
+                        help='number of journal records between snapshots')
+    parser.add_argument('--session-ttl', type=float, default=24 * 60 * 60,
+                        help='seconds after which abandoned games are evicted')
+    parser.add_argument('--max-games', type=int, default=100000,
+                        help='maximal number of games kept in memory')
+    parser.add_argument('--spill', type=str, default=None,
+                        help='directory, where idle games are moved from memory')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='port of the local prometheus metrics endpoint')
+    parser.add_argument('--metrics-host', type=str, default='127.0.0.1',
+                        help='address of the metrics endpoint')
+    parser.add_argument('--trace', type=str, default=None,
+                        help='JSONL file, where slow traces of updates are saved')
+    parser.add_argument('--trace-sample', type=float, default=0.01,
+                        help='fraction of updates, which are traced')
+    parser.add_argument('--trace-slow', type=float, default=1.0,
+                        help='minimal duration of the saved trace in seconds')
+    parser.add_argument('--table-view', action='store_true',
+                        help='edit one status message of the game instead of public messages')
+    parser.add_argument('--view-delay', type=float, default=1.0,
+                        help='seconds, during which changes of the table view are collected')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='number of processes, which share the games')
+    parser.add_argument('--shard-index', type=str, default=None,
+                        help='SQLite file of routes shared by the processes')
+    parser.add_argument('--queue-timeout', type=float, default=60.0,
+                        help='seconds after which empty seats of /queue are taken by AI players')
+    parser.add_argument('--table-size', type=int, default=4,
+                        help='number of players at the table of /queue by default')
+    parser.add_argument('--card-timeout', type=float, default=0,
+                        help='seconds to choose a card, 0 (default) to wait forever')
+    parser.add_argument('--victim-timeout', type=float, default=0,
+                        help='seconds to choose a player for the card, 0 (default) to wait forever')
+    parser.add_argument('--guess-timeout', type=float, default=0,
+                        help="seconds to guess a card of the Guard's victim, "
+                             "0 (default) to wait forever")
+    parser.add_argument('--afk', choices=['auto', 'kick'], default='auto',
+                        help='make a move for the player out of time or kick him out of the round')
+    parser.add_argument('--ai-budget', type=float, default=ISMCTSPolicy.budget,
+                        help='time to think over a move for AI players in seconds')
+
+    subparsers = parser.add_subparsers(dest='command')
+    tournament.add_parser(subparsers)
+    benchmark.add_parser(subparsers)
+    loadgen.add_parser(subparsers)
+
+    return parser
+
+
+def create_bot(token, args, index=None, transport=None, ingress=None):
+    """
+    Creates GameBot with parsed command line arguments
+
+    :param token:
+        str, token of the bot
+    :param args:
+        argparse.Namespace, see create_parser
+    :param index:
+        ShardIndex, routes shared by processes of the sharded mode
+    :param transport:
+        transport of outgoing calls, TelegramTransport if None
+    :param ingress:
+        function(messages), passes messages back to the ingress of the sharded mode
+    :return:
+        GameBot
+    """
+    journal = None
+    if args.journal is not None:
+        journal = Journal(args.journal, snapshot_every=args.snapshot_every)
+
+    sessions = SessionRegistry(ttl=args.session_ttl, max_games=args.max_games,
+                               spill_path=args.spill)
+
+    tracer = None
+    if args.trace is not None:
+        tracer = Tracer(args.trace, sample_rate=args.trace_sample, slow=args.trace_slow)
+
+    bot = GameBot(token, send_workers=args.send_workers, workers=args.threads,
+                  journal=journal, sessions=sessions, transport=transport,
+                  tracer=tracer, index=index, ingress=ingress,
+                  view_delay=args.view_delay if args.table_view else None,
+                  queue_timeout=args.queue_timeout, table_size=args.table_size,
+                  turn_timeouts={'select_card': args.card_timeout,
+                                 'select_victim': args.victim_timeout,
+                                 'guess_card': args.guess_timeout},
+                  afk=args.afk, ai_budget=args.ai_budget)
+
+    if args.metrics_port is not None:
+        MetricsServer(bot.metrics, args.metrics_host, args.metrics_port).start()
+        logging.info("Metrics are served on %s:%d/metrics", args.metrics_host, args.metrics_port)
+
+    return bot
 
 
 def main():
@@ -431,6 +1860,15 @@ def main():
 
     To correct work you need to specify bot token in --token arg
     or in os environment variable LOVELETTER_TOKEN
+
+    With --webhook bot receives updates by its own http server instead of polling
+    (telegram needs https, so put it behind a reverse proxy and pass public --webhook-url)
+
+    With --shards=N games are handled by N worker processes (see loveletter.shards)
+
+    'loveletter tournament <policies>' plays games between bot policies instead,
+    'loveletter benchmark' measures speed of the engine and the bot,
+    'loveletter loadtest' plays thousands of simultaneous games of scripted players
     """
 
     logging.basicConfig(
@@ -440,10 +1878,20 @@ def main():
         datefmt='%Y-%m-%d %I:%M:%S'
     )
 
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--token', type=str, default=None)
+    args = create_parser().parse_args()
+
+    if args.command == 'tournament':
+        tournament.main(args)
+        return
+
+    if args.command == 'benchmark':
+        benchmark.main(args)
+        return
+
+    if args.command == 'loadtest':
+        loadgen.main(args)
+        return
 
-    args = parser.parse_args()
     token = args.token
 
     if token is None:
@@ -454,8 +1902,34 @@ def main():
 
     logging.info("Bot started")
 
-    bot = GameBot(token)
-    bot.polling(none_stop=True)
+    if args.shards > 1:
+        if args.shard_index is None:
+            directory = args.journal if args.journal is not None else tempfile.gettempdir()
+            args.shard_index = os.path.join(directory, 'loveletter-index.sqlite')
+
+        bot = shards.ShardedBot(token, args, args.shards)
+    else:
+        bot = create_bot(token, args)
+
+    try:
+        if not args.webhook:
+            bot.polling(none_stop=True)
+            return
+
+        path = args.webhook_path or '/{}'.format(token)
+        server = WebhookServer(bot, args.host, args.port, path)
+
+        if args.webhook_url is not None:
+            bot.remove_webhook()
+            bot.set_webhook(url=args.webhook_url.rstrip('/') + path)
+
+        logging.info("Webhook is listening on %s:%d", args.host, args.port)
+        server.serve_forever()
+    finally:
+        if args.shards > 1:
+            bot.stop()
+        elif bot.journal is not None:
+            bot.journal.close()
 
 
 if __name__ == '__main__':
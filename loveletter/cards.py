@@ -5,17 +5,30 @@
 Module that contains classes representing love letter's cards
 """
 
-import gettext
-
-from telebot import types
-
-gettext.install('loveletter', localedir='./loveletter/locale', codeset='UTF-8')
+from loveletter.events import (
+    PrincessDropped,
+    CountessDropped,
+    CardDealt,
+    CardWasted,
+    CardsSwapped,
+    CardDiscarded,
+    ProtectionGained,
+    CardsCompared,
+    CardRevealed,
+    CardGuessed,
+    PlayerKilled,
+)
+from loveletter.i18n import N_
 
 
 class Card:
     """
     An abstract class that represents the arbitrary card
 
+    Cards have no state, so every type of card has a single shared instance
+    (Guard() is Guard()), which holder is tracked by the players hands,
+    decks and dropped cards are kept as card values (see CARDS)
+
     :static attr name:
         str, name of the card
     :static attr value:
@@ -24,25 +37,36 @@ class Card:
         bool, checks if card needs to point another player as a target
     :static attr num_in_deck:
         int, number of cards of this type in standard deck
-    :attr owner:
-        User, player who holds this card right now
     """
 
+    __slots__ = ()
+
     name = None
     value = None
     targeted = None
     num_in_deck = None
 
-    def __init__(self):
-        self.owner = None
+    def __new__(cls):
+        instance = cls.__dict__.get('_instance')
+
+        if instance is None:
+            instance = super().__new__(cls)
+            cls._instance = instance
+
+        return instance
 
     def play(self, game):
         """
         Virtual function, that plays this card
-        within given game and applies feature of specific card
+        within given game and applies feature of specific card.
+        Card is always played by the dealer of the game.
+        It only changes the game state and never talks to players,
+        everything that happened is described by returned events
 
         :param game:
-            Game, game in which this card is played
+            GameState, game in which this card is played
+        :return:
+            list of events (see loveletter.events)
         """
 
         raise NotImplementedError
@@ -50,6 +74,9 @@ class Card:
     def __eq__(self, other):
         return self.name == other
 
+    def __hash__(self):
+        return hash(self.name)
+
     def __le__(self, other):
         return self.value <= other.value
 
@@ -74,18 +101,20 @@ class Princess(Card):
     """
     # pylint: disable=too-few-public-methods
 
-    name = _("Princess")
+    __slots__ = ()
+
+    name = N_("Princess")
     value = 8
     targeted = False
     num_in_deck = 1
 
     def play(self, game):
-        markup = types.ReplyKeyboardRemove(selective=False)
-        message = _("@{} drops a Princess and loses.").format(self.owner.name)
+        owner = game.dealer
+
+        game.used_cards.append(owner.card.value)
+        game.users.kill(owner)
 
-        game.public_message(message, markup)
-        game.used_cards.append(self.owner.card)
-        game.users.kill(self.owner)
+        return [PrincessDropped(owner), PlayerKilled(owner)]
 
 
 class Countess(Card):
@@ -98,16 +127,15 @@ class Countess(Card):
     """
     # pylint: disable=too-few-public-methods
 
-    name = _("Countess")
+    __slots__ = ()
+
+    name = N_("Countess")
     value = 7
     targeted = False
     num_in_deck = 1
 
     def play(self, game):
-        markup = types.ReplyKeyboardRemove(selective=False)
-        message = _("@{} drops a Countess.").format(self.owner.name)
-
-        game.public_message(message, markup)
+        return [CountessDropped(game.dealer)]
 
 
 class King(Card):
@@ -120,41 +148,21 @@ class King(Card):
     """
     # pylint: disable=too-few-public-methods
 
-    name = _("King")
+    __slots__ = ()
+
+    name = N_("King")
     value = 6
     targeted = True
     num_in_deck = 1
 
     def play(self, game):
-        markup = types.ReplyKeyboardRemove(selective=False)
-
         if game.card_without_action:
-            message = \
-                _("@{} drops the King because all players are protected.").format(self.owner.name)
-
-            game.public_message(message, markup)
-
-            return
-
-        message = \
-            _("@{0} plays the King to exchange cards with @{1}.").format(self.owner.name,
-                                                                         game.victim.name)
-
-        game.public_message(message, markup)
-
-        message = _("You've got a {0} from player @{1}").format(game.victim.card.name,
-                                                                game.victim.name)
-        game.dealer_message(message)
-
-        message = _("You've got a {0} from player @{1}").format(game.dealer.card.name,
-                                                                game.dealer.name)
-        game.victim_message(message)
-
-        game.dealer.card.owner = game.victim
-        game.victim.card.owner = game.dealer
+            return [CardWasted(game.dealer, self)]
 
         game.dealer.card, game.victim.card = game.victim.card, game.dealer.card
 
+        return [CardsSwapped(game.dealer, game.victim, game.dealer.card, game.victim.card)]
+
 
 class Prince(Card):
     """
@@ -166,36 +174,33 @@ class Prince(Card):
     """
     # pylint: disable=too-few-public-methods
 
-    name = _("Prince")
+    __slots__ = ()
+
+    name = N_("Prince")
     value = 5
     targeted = True
     num_in_deck = 2
 
     def play(self, game):
-        markup = types.ReplyKeyboardRemove(selective=False)
-        game.used_cards.append(game.victim.card)
+        victim = game.victim
+        dropped = victim.card
 
-        if isinstance(game.victim.card, Princess):
-            message = _("@{0} uses Prince against @{1}. "
-                        "@{1} drops a Princess and loses!").format(self.owner.name,
-                                                                   game.victim.name)
+        game.used_cards.append(dropped.value)
+        events = [CardDiscarded(game.dealer, victim, dropped)]
 
-            game.public_message(message, markup)
-            game.users.kill(game.victim)
+        if isinstance(dropped, Princess):
+            game.users.kill(victim)
+            events.append(PlayerKilled(victim))
 
-            return
-
-        message = \
-            _("@{0} uses a Prince against @{1}. @{1} has the {2}.").format(self.owner.name,
-                                                                           game.victim.name,
-                                                                           game.victim.card.name)
-
-        game.public_message(message, markup)
+            return events
 
         if not game.deck:
             game.deck.append(game.first_card)
 
-        game.victim.take_card(game.deck)
+        victim.take_card(game.deck)
+        events.append(CardDealt(victim, victim.card))
+
+        return events
 
 
 class Maid(Card):
@@ -208,18 +213,17 @@ class Maid(Card):
     """
     # pylint: disable=too-few-public-methods
 
-    name = _("Maid")
+    __slots__ = ()
+
+    name = N_("Maid")
     value = 4
     targeted = False
     num_in_deck = 2
 
     def play(self, game):
-        markup = types.ReplyKeyboardRemove(selective=False)
-        message = _("@{} is under Maid protection for a one full round.").format(self.owner.name)
-
-        game.public_message(message, markup)
+        game.dealer.defence = True
 
-        self.owner.defence = True
+        return [ProtectionGained(game.dealer)]
 
 
 class Baron(Card):
@@ -233,52 +237,32 @@ class Baron(Card):
     """
     # pylint: disable=too-few-public-methods
 
-    name = _("Baron")
+    __slots__ = ()
+
+    name = N_("Baron")
     value = 3
     targeted = True
     num_in_deck = 2
 
     def play(self, game):
-        markup = types.ReplyKeyboardRemove(selective=False)
-
         if game.card_without_action:
-            message = \
-                _("@{} drops a Baron, because all players are protected.").format(self.owner.name)
-
-            game.public_message(message, markup)
-
-            return
-
-        if self.owner.card > game.victim.card:
-            message = _("@{0} uses the Baron against @{1} and wins. "
-                        "@{1} has the {2} card").format(self.owner.name, game.victim.name,
-                                                        game.victim.card.name)
-
-            game.public_message(message, markup)
+            return [CardWasted(game.dealer, self)]
 
-            game.used_cards.append(game.victim.card)
-            game.users.kill(game.victim)
+        owner, victim = game.dealer, game.victim
+        events = [CardsCompared(owner, victim, owner.card, victim.card)]
 
-            return
+        if owner.card > victim.card:
+            looser = victim
+        elif owner.card < victim.card:
+            looser = owner
+        else:
+            return events
 
-        if self.owner.card < game.victim.card:
-            message = _("@{0} uses the Baron against @{1}, but looses. "
-                        "@{0} has the {2} card").format(self.owner.name, game.victim.name,
-                                                        self.owner.card.name)
+        game.used_cards.append(looser.card.value)
+        game.users.kill(looser)
+        events.append(PlayerKilled(looser))
 
-            game.public_message(message, markup)
-
-            game.used_cards.append(self.owner.card)
-            game.users.kill(self.owner)
-
-            return
-
-        message = \
-            _("Aaaand... here goes nothing"
-              "Looks like @{0} and @{1} have the same cards... ").format(self.owner.name,
-                                                                         game.victim.name)
-
-        game.public_message(message, markup)
+        return events
 
 
 class Priest(Card):
@@ -290,28 +274,18 @@ class Priest(Card):
     """
     # pylint: disable=too-few-public-methods
 
-    name = _("Priest")
+    __slots__ = ()
+
+    name = N_("Priest")
     value = 2
     targeted = True
     num_in_deck = 2
 
     def play(self, game):
-        markup = types.ReplyKeyboardRemove(selective=False)
-
         if game.card_without_action:
-            message = \
-                _("@{} drops Priest, because all players are protected.").format(self.owner.name)
-            game.public_message(message, markup)
+            return [CardWasted(game.dealer, self)]
 
-            return
-
-        message = _("@{} uses a Priest card and looks at @{}'s card.").format(self.owner.name,
-                                                                              game.victim.name)
-        game.public_message(message, markup)
-
-        message = _("@{} shows you his card. He(She) has the {}.").format(game.victim.name,
-                                                                          game.victim.card.name)
-        game.dealer_message(message)
+        return [CardRevealed(game.dealer, game.victim, game.victim.card)]
 
 
 class Guard(Card):
@@ -325,37 +299,28 @@ class Guard(Card):
     """
     # pylint: disable=too-few-public-methods
 
-    name = _("Guard")
+    __slots__ = ()
+
+    name = N_("Guard")
     value = 1
     targeted = True
     num_in_deck = 5
 
     def play(self, game):
-        markup = types.ReplyKeyboardRemove(selective=False)
-
         if game.card_without_action:
-            message = \
-                _("@{} drops the Guard, because all players are protected.").format(self.owner.name)
-            game.public_message(message, markup)
-
-            return
+            return [CardWasted(game.dealer, self)]
 
-        if game.victim.card.name == game.guess:
-            message = \
-                _("@{} uses the Guard and guess that @{} has the {}.").format(self.owner.name,
-                                                                              game.victim.name,
-                                                                              game.guess)
+        victim = game.victim
+        hit = victim.card.name == game.guess
+        events = [CardGuessed(game.dealer, victim, game.guess, hit)]
 
-            game.public_message(message, markup)
+        if hit:
+            game.used_cards.append(victim.card.value)
+            game.users.kill(victim)
+            events.append(PlayerKilled(victim))
 
-            game.used_cards.append(game.victim.card)
-            game.users.kill(game.victim)
+        return events
 
-            return
 
-        message = \
-            _("@{0} uses Guard, assuming that "
-              "@{1} holds the {2} card, but do not guess it right.").format(self.owner.name,
-                                                                            game.victim.name,
-                                                                            game.guess)
-        game.public_message(message, markup)
+# shared instances of the cards by their values, 0 means no card
+CARDS = (None, Guard(), Priest(), Baron(), Maid(), Prince(), King(), Countess(), Princess())
@@ -0,0 +1,362 @@
+"""
+Exact endgame solver.
+
+When only a few cards are left in the deck, the rest of the round
+can be searched completely. Hidden hands of other players are enumerated
+with their exact weights (see loveletter.ismcts.Determinizer for the set
+of unseen cards), then every position is solved by expectimax:
+drawing a card is a chance node over the unseen cards (the deck and
+the card set aside are indistinguishable for the players), on their turns
+players choose the move, which maximizes their own chance to win.
+Inside the tree players know all hands, only the first move of the dealer
+is chosen without knowing the hands of others.
+
+Positions are kept in a bounded transposition table. The deck is stored
+as counts of cards, so all the orders of cards which lead to the same
+position are solved only once.
+"""
+
+from collections import OrderedDict
+
+from loveletter.ismcts import (
+    GUARD, BARON, MAID, PRINCE, KING, COUNTESS, PRINCESS,
+    TARGETED, GUESSES, NAMES, Determinizer,
+)
+
+
+class TranspositionTable:
+    """
+    Table of solved positions, the least recently used ones
+    are evicted when the table is full
+
+    :attr max_entries:
+        int, maximal number of positions in the table
+    :attr hits:
+        int, number of positions found in the table
+    :attr misses:
+        int, number of positions which were solved
+    """
+
+    def __init__(self, max_entries=1 << 18):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns value of the position or None
+        """
+        value = self._entries.get(key)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+        return value
+
+    def put(self, key, value):
+        """
+        Saves value of the position
+        """
+        self._entries[key] = value
+
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all positions
+        """
+        self._entries.clear()
+
+
+class Solver:
+    """
+    Solves endgames, position is a tuple (hands, drawn, dealer, protected, pool, deck_size):
+    hands are card values by seats (0 for players who lost), drawn is the second card
+    of the dealer, pool are counts of unseen cards by values (the deck and the card
+    set aside), value of a position is a tuple of chances to win by seats
+
+    :attr max_cards:
+        int, game is solved, when the number of cards in the deck
+        and in hands of alive players is not greater than this
+    :attr table:
+        TranspositionTable
+    """
+
+    def __init__(self, max_cards=6, max_entries=1 << 18):
+        self.max_cards = max_cards
+        self.table = TranspositionTable(max_entries)
+
+    def applicable(self, game):
+        """
+        Checks if the game is small enough to be solved
+
+        :param game:
+            GameState
+        """
+        return game.state == 'select_card' and \
+            len(game.deck) + len(game.users) <= self.max_cards
+
+    def solve(self, game, known=None, excluded=None):
+        """
+        Finds chances to win of all moves of the game's dealer
+
+        :param game:
+            GameState in 'select_card' state
+        :param known:
+            dict of {user_id: card value}, cards of other players known to the dealer
+        :param excluded:
+            dict of {user_id: bit mask}, cards which players surely do not hold
+        :return:
+            list of tuples (chance, card name, victim name or None, guess name or None),
+            the best move goes first
+        """
+        determinizer = Determinizer(game, known)
+        seats = determinizer.seats
+        masks = [(excluded or {}).get(user.user_id, 0) for user in seats]
+
+        pool = [0] * (PRINCESS + 1)
+        for value in determinizer.pool:
+            pool[value] += 1
+
+        totals = {}
+        weight_sum = 0.0
+
+        for hands, rest, weight in self._deals(determinizer.known, masks, pool):
+            hands[0] = determinizer.dealer_card
+            values = self._root_values(tuple(hands), determinizer.drawn,
+                                       tuple(determinizer.protected), tuple(rest),
+                                       determinizer.deck_size)
+            weight_sum += weight
+
+            for move, value in values.items():
+                totals[move] = totals.get(move, 0.0) + weight * value
+
+        moves = [(chance / weight_sum, move) for move, chance in totals.items()]
+        moves.sort(key=lambda item: -item[0])
+
+        return [(chance, NAMES[card], seats[target].name if target >= 0 else None,
+                 NAMES[guess] if guess else None)
+                for chance, (card, target, guess) in moves]
+
+    @staticmethod
+    def _deals(known, masks, pool):
+        """
+        Enumerates hidden hands of other players, yields
+        tuples (hands, pool without these hands, weight)
+        """
+        hands = list(known)
+
+        def deal(seat, weight):
+            if seat == len(hands):
+                yield hands[:], pool[:], weight
+                return
+
+            if known[seat] or not seat:
+                yield from deal(seat + 1, weight)
+                return
+
+            for value in range(GUARD, PRINCESS + 1):
+                count = pool[value]
+
+                if not count or masks[seat] >> value & 1:
+                    continue
+
+                hands[seat] = value
+                pool[value] -= 1
+                yield from deal(seat + 1, weight * count)
+                pool[value] += 1
+
+            hands[seat] = 0
+
+        yield from deal(0, 1)
+
+    def _root_values(self, hands, drawn, protected, pool, deck_size):
+        """
+        Returns chances of the dealer (seat 0) for each move in one deal,
+        all Guard guesses are listed, because the dealer can not see the hands
+        """
+        values = {}
+
+        for move in _moves(hands, drawn, 0, protected, guesses=GUESSES):
+            values[move] = self._play(hands, drawn, 0, protected, pool, deck_size, move)[0]
+
+        return values
+
+    def _value(self, hands, drawn, dealer, protected, pool, deck_size):
+        key = (hands, drawn, dealer, protected, pool, deck_size)
+        value = self.table.get(key)
+
+        if value is not None:
+            return value
+
+        best = None
+
+        for move in _moves(hands, drawn, dealer, protected):
+            result = self._play(hands, drawn, dealer, protected, pool, deck_size, move)
+
+            if best is None or result[dealer] > best[dealer]:
+                best = result
+
+        self.table.put(key, best)
+
+        return best
+
+    def _play(self, hands, drawn, dealer, protected, pool, deck_size, move):
+        """
+        Returns value of the position after the dealer's move
+        """
+        # pylint: disable=too-many-arguments,too-many-branches
+
+        card, target, guess = move
+        hands = list(hands)
+        keep = hands[dealer] if card == drawn else drawn
+        hands[dealer] = keep
+        protected = list(protected)
+
+        if card == PRINCESS:
+            hands[dealer] = 0
+        elif target < 0:
+            if card == MAID:
+                protected[dealer] = True
+        elif card == GUARD:
+            if hands[target] == guess:
+                hands[target] = 0
+        elif card == BARON:
+            if keep > hands[target]:
+                hands[target] = 0
+            elif keep < hands[target]:
+                hands[dealer] = 0
+        elif card == PRINCE:
+            if hands[target] == PRINCESS:
+                hands[target] = 0
+            elif deck_size:
+                return self._draw(hands, dealer, protected, pool, deck_size, target)
+            else:
+                # the card set aside is the only unseen card
+                hands[target] = pool.index(1)
+                return self._pass_turn(hands, dealer, protected, (0,) * len(pool), 0)
+        elif card == KING:
+            hands[dealer], hands[target] = hands[target], keep
+
+        return self._pass_turn(hands, dealer, protected, pool, deck_size)
+
+    def _draw(self, hands, dealer, protected, pool, deck_size, target):
+        """
+        Prince's victim takes a new card, returns expected value
+        """
+        total = sum(pool)
+        result = [0.0] * len(hands)
+        pool = list(pool)
+
+        for value in range(GUARD, PRINCESS + 1):
+            count = pool[value]
+
+            if not count:
+                continue
+
+            hands[target] = value
+            pool[value] -= 1
+            child = self._pass_turn(hands, dealer, protected, tuple(pool), deck_size - 1)
+            pool[value] += 1
+
+            for seat, chance in enumerate(child):
+                result[seat] += count / total * chance
+
+        return tuple(result)
+
+    def _pass_turn(self, hands, dealer, protected, pool, deck_size):
+        """
+        Finishes the game or passes the turn to the next player,
+        who takes a card from the deck, returns expected value
+        """
+        num_seats = len(hands)
+        alive = sum(1 for card in hands if card)
+
+        if alive == 1 or not deck_size:
+            result = [0.0] * num_seats
+            best, winner = -1, -1
+
+            # ties are won by the player, who moves earlier in the next round
+            for shift in range(1, num_seats + 1):
+                seat = (dealer + shift) % num_seats
+                if hands[seat] > best:
+                    best, winner = hands[seat], seat
+
+            result[winner] = 1.0
+            return tuple(result)
+
+        seat = (dealer + 1) % num_seats
+        while not hands[seat]:
+            seat = (seat + 1) % num_seats
+
+        protected = list(protected)
+        protected[seat] = False
+        protected = tuple(protected)
+        hands = tuple(hands)
+
+        total = sum(pool)
+        result = [0.0] * num_seats
+        pool = list(pool)
+
+        for value in range(GUARD, PRINCESS + 1):
+            count = pool[value]
+
+            if not count:
+                continue
+
+            pool[value] -= 1
+            child = self._value(hands, value, seat, protected, tuple(pool), deck_size - 1)
+            pool[value] += 1
+
+            for index, chance in enumerate(child):
+                result[index] += count / total * chance
+
+        return tuple(result)
+
+
+def _moves(hands, drawn, dealer, protected, guesses=None):
+    """
+    Returns legal moves of the dealer, if guesses are not given,
+    the Guard names the victim's card and one wrong card,
+    other wrong guesses lead to the same position
+    """
+    card = hands[dealer]
+
+    if COUNTESS in (card, drawn):
+        cards = [value for value in (card, drawn) if value not in (KING, PRINCE)]
+    else:
+        cards = [card, drawn]
+
+    if cards[0] == cards[-1]:
+        cards = cards[:1]
+
+    targets = [seat for seat, hand in enumerate(hands)
+               if hand and seat != dealer and not protected[seat]]
+    moves = []
+
+    for card in cards:
+        card_targets = targets + [dealer] if card == PRINCE else targets
+
+        if not TARGETED[card] or not card_targets:
+            moves.append((card, -1, 0))
+        elif card != GUARD:
+            moves.extend((card, target, 0) for target in card_targets)
+        elif guesses is not None:
+            moves.extend((card, target, guess) for target in card_targets for guess in guesses)
+        else:
+            for target in card_targets:
+                if hands[target] != GUARD:
+                    moves.append((card, target, hands[target]))
+
+                wrong = GUESSES[0] if hands[target] != GUESSES[0] else GUESSES[1]
+                moves.append((card, target, wrong))
+
+    return moves
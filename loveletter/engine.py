@@ -0,0 +1,523 @@
+"""
+Here contains the headless rules engine of the game.
+
+GameState holds everything that is happening at the table
+and changes only through the apply(action) method, which returns
+a list of events (see loveletter.events). Engine does not send anything
+and does not know about telegram, so it can be used for simulations,
+tests and AI players as well as for the bot itself
+"""
+
+import random
+from collections import namedtuple
+from itertools import chain
+
+from loveletter.beliefs import BeliefTracker
+from loveletter.users import User, Users
+from loveletter.cards import (
+    CARDS,
+    Princess,
+    Countess,
+    King,
+    Prince,
+    Maid,
+    Baron,
+    Priest,
+    Guard
+)
+from loveletter.events import (
+    GameStarted,
+    CardDealt,
+    TurnStarted,
+    CardDrawn,
+    DeckCounted,
+    CardRequested,
+    CountessForced,
+    VictimRequested,
+    GuessRequested,
+    TurnTimedOut,
+    PlayerKilled,
+    GameOver,
+)
+
+Start = namedtuple('Start', [])
+Restart = namedtuple('Restart', [])
+SelectCard = namedtuple('SelectCard', ['card_name'])
+SelectVictim = namedtuple('SelectVictim', ['victim_name'])
+GuessCard = namedtuple('GuessCard', ['guess'])
+KickDealer = namedtuple('KickDealer', [])
+
+
+class GameState:
+    """
+    Class that holds state of one game and applies the rules to it
+
+    Game has several states, running cycle is:
+
+    not_started (initial state) ─→ select_card
+    select_card ┬→ select_victim (if card is targeted)
+                ├→ select_card (next turn)
+                └→ game_over
+    select_victim ┬→ guess_card (if card is Guard)
+                  ├→ select_card (next turn)
+                  └→ game_over
+    guess_card ┬→ select_card (next turn)
+               └→ game_over
+    select_card, select_victim, guess_card ┬→ select_card (dealer is kicked)
+                                           └→ game_over
+    game_over ─→ select_card (on restart)
+
+    change_turn is a transitional state between turns,
+    it is never observed outside of apply()
+
+    Cards in hands are shared card instances (see loveletter.cards.CARDS),
+    the deck, dropped cards and the first card (removed from the deck
+    at the start) are kept as card values
+    """
+
+    __slots__ = ('rng', 'users', 'used_cards', 'dealer', 'victim', 'guess', 'first_card',
+                 'can_choose_yourself', 'card_without_action', 'double_deck', 'state',
+                 'turn', 'beliefs', 'deck')
+
+    card_types = (
+        Princess,
+        Countess,
+        King,
+        Prince,
+        Maid,
+        Baron,
+        Priest,
+        Guard,
+    )
+
+    def __init__(self, rng=None):
+        """
+        Creates a new game state without players
+
+        :param rng:
+            random.Random, source of randomness for deck and players order,
+            if None, global random module is used
+        """
+
+        self.rng = rng if rng is not None else random
+        self.users = Users()
+        self.used_cards = bytearray()
+        self.dealer = None
+        self.victim = None
+        self.guess = None
+        self.first_card = 0
+        self.can_choose_yourself = False
+        self.card_without_action = False
+        self.double_deck = False
+        self.state = 'not_started'
+        self.turn = 0
+        self.beliefs = BeliefTracker(self)
+
+        self.deck = self.generate_deck()
+
+    def apply(self, action):
+        """
+        Applies player's action to the game
+
+        :param action:
+            one of Start, Restart, SelectCard, SelectVictim, GuessCard, KickDealer
+        :return:
+            list of events, that describes what happened
+        """
+        handler = self._handlers[type(action)]
+        events = handler(self, action)
+        self.beliefs.update(events)
+
+        return events
+
+    def list_possible_victims(self):
+        """
+        Returns a list of possible victims within one game
+        Player can be a victim only if he is not defended by Maid
+        and he is not a dealer. Howewer if everybody are defended,
+        dealer can become the only one victim, or he can use Prince on himself
+
+        :return:
+            list, list of victims names
+        """
+        victims_list = self.users.get_victims(self.dealer)
+
+        if isinstance(self.dealer.new_card, Prince) or not victims_list:
+            victims_list.append(self.dealer.name)
+
+        return victims_list
+
+    def list_playable_cards(self):
+        """
+        Returns a list of cards, which dealer is allowed to play.
+        Countess must be played if dealer also holds the King or the Prince
+
+        :return:
+            list, list of cards names
+        """
+        cards = [self.dealer.card, self.dealer.new_card]
+
+        if any(isinstance(card, Countess) for card in cards):
+            cards = [card for card in cards if not isinstance(card, (King, Prince))]
+
+        return [card.name for card in cards]
+
+    def list_possible_guesses(self):
+        """
+        Returns a list of cards, which can be guessed with the Guard,
+        any card but the Guard itself
+
+        :return:
+            list, list of cards names
+        """
+        return [card.name for card in self.card_types[:-1]]
+
+    def dump(self):
+        """
+        Returns the state as plain python data, e.g. for snapshots.
+        Cards are coded by their values (0 means no card),
+        dealer and victim are coded by user_id
+
+        :return:
+            dict, see load()
+        """
+        def code(card):
+            return card.value if card is not None else 0
+
+        def dump_user(user):
+            return (user.name, user.user_id, code(user.card), code(user.new_card),
+                    user.defence, user.locale,
+                    user.policy.name if user.policy is not None else None)
+
+        return {
+            'state': self.state,
+            'double_deck': self.double_deck,
+            'deck': list(self.deck),
+            'used_cards': list(self.used_cards),
+            'first_card': self.first_card,
+            'users': [dump_user(user) for user in self.users],
+            'loosers': [dump_user(user) for user in self.users.loosers],
+            'dealer': self.dealer.user_id if self.dealer is not None else None,
+            'victim': self.victim.user_id if self.victim is not None else None,
+            'guess': self.guess,
+            'can_choose_yourself': self.can_choose_yourself,
+            'card_without_action': self.card_without_action,
+            'turn': self.turn,
+            'beliefs': self.beliefs.dump(),
+        }
+
+    def load(self, data):
+        """
+        Restores the state dumped by dump(), users are created anew
+
+        :param data:
+            dict, result of dump()
+        """
+        def load_user(name, user_id, card, new_card, defence, locale=None, policy=None):
+            user = User(name, user_id, self, locale,
+                        self.make_policy(policy) if policy is not None else None)
+            user.card = CARDS[card]
+            user.new_card = CARDS[new_card]
+            user.defence = defence
+            return user
+
+        self.users = Users()
+        for user_data in data['users']:
+            self.users.add(load_user(*user_data))
+        self.users.loosers = [load_user(*user_data) for user_data in data['loosers']]
+
+        by_id = {user.user_id: user for user in chain(self.users, self.users.loosers)}
+
+        self.state = data['state']
+        self.double_deck = data['double_deck']
+        self.deck = bytearray(data['deck'])
+        self.used_cards = bytearray(data['used_cards'])
+        self.first_card = data['first_card']
+        self.dealer = by_id.get(data['dealer'])
+        self.victim = by_id.get(data['victim'])
+        self.guess = data['guess']
+        self.can_choose_yourself = data['can_choose_yourself']
+        self.card_without_action = data['card_without_action']
+        self.turn = data.get('turn', 0)
+
+        if 'beliefs' in data:
+            self.beliefs.load(data['beliefs'])
+
+    @staticmethod
+    def make_policy(spec):
+        """
+        Creates policy of the AI player
+
+        :param spec:
+            str, name of the policy (see loveletter.policies.load_policy)
+        :return:
+            Policy
+        """
+        # policies depend on the engine, so they are imported only when needed
+        from loveletter.policies import load_policy  # pylint: disable=import-outside-toplevel
+
+        return load_policy(spec)
+
+    def _start(self, action=None):
+        """
+        Starts a new game and deals the cards.
+        This action must be applied after adding
+        all players to game and configuring it.
+
+        current_state: not_started
+        next_state: select_card
+        """
+        # pylint: disable=unused-argument
+
+        if self.state != 'not_started':
+            raise RuntimeError('Trying to start a game, when it is already started')
+
+        if self.double_deck:
+            self.deck.extend(self.generate_deck())
+
+        self.rng.shuffle(self.deck)
+        self.first_card = self.deck.pop()
+
+        self.users.shuffle(self.rng)
+
+        events = []
+        for user in self.users:
+            user.take_card(self.deck)
+            events.append(CardDealt(user, user.card))
+
+        events.append(GameStarted(list(self.users)))
+
+        self.state = 'change_turn'
+        events.extend(self._start_turn())
+
+        return events
+
+    def _restart(self, action=None):
+        """
+        Restarts the game
+
+        current state: any
+        next state: select_card
+        """
+        self.users.reset(self.rng)
+        self.deck = self.generate_deck()
+        self.used_cards = bytearray()
+        self.dealer = None
+        self.victim = None
+        self.guess = None
+
+        self.state = 'not_started'
+
+        return self._start(action)
+
+    def _start_turn(self):
+        """
+        Starts a player's turn
+
+        If player has Maid's defence, removes it,
+        and makes current dealer take a new card.
+        Turns are numbered through all rounds of the game,
+        so prompts of the previous turns can be told apart
+
+        current state: change_turn
+        next state: select_card
+        """
+
+        if self.state != 'change_turn':
+            raise RuntimeError('Trying to start a turn while not in change_turn state')
+
+        self.turn += 1
+        self.dealer = self.users.get_dealer()
+        self.dealer.defence = False
+        self.dealer.take_new_card(self.deck)
+
+        self.state = 'select_card'
+
+        return [
+            TurnStarted(self.dealer),
+            CardDrawn(self.dealer, self.dealer.new_card),
+            DeckCounted(len(self.deck)),
+            CardRequested(self.dealer, (self.dealer.card, self.dealer.new_card)),
+        ]
+
+    def _select_card(self, action):
+        """
+        Applies card selected by user
+
+        If card is targeted, game changes state to select a victim,
+        if there is no one to target, card is dropped without effect
+
+        current_state: select_card
+        next_state:
+            select_victim (if card is targeted)
+            select_card (next turn)
+            game_over
+        """
+        if self.state != 'select_card':
+            raise RuntimeError('Trying to select card while not in select_card state')
+
+        dealer = self.dealer
+        card_name = action.card_name
+
+        if card_name not in (dealer.card.name, dealer.new_card.name):
+            raise ValueError('Dealer has no card {}'.format(card_name))
+
+        if card_name not in self.list_playable_cards():
+            return [CountessForced(dealer)]
+
+        if card_name != dealer.new_card.name:
+            dealer.new_card, dealer.card = dealer.card, dealer.new_card
+
+        self.can_choose_yourself = False
+        self.card_without_action = False
+
+        if dealer.new_card.targeted:
+            self.state = 'select_victim'
+
+            possible_victims = self.list_possible_victims()
+
+            if isinstance(dealer.new_card, Prince):
+                self.can_choose_yourself = True
+            elif possible_victims == [dealer.name]:
+                self.card_without_action = True
+
+            if not self.card_without_action:
+                return [VictimRequested(dealer, possible_victims)]
+
+        return self._play_card()
+
+    def _select_victim(self, action):
+        """
+        Applies victim selected by user
+
+        current_state: select_victim
+        next_state:
+            guess_card (if card is Guard)
+            select_card (next turn)
+            game_over
+        """
+
+        if self.state != 'select_victim':
+            raise RuntimeError("Trying to select a victim, while not in select_victim state")
+
+        if action.victim_name not in self.list_possible_victims():
+            raise ValueError('Player {} cannot be a victim'.format(action.victim_name))
+
+        self.victim = self.users.find_by_name(action.victim_name)
+
+        if isinstance(self.dealer.new_card, Guard):
+            self.state = 'guess_card'
+            return [GuessRequested(self.dealer, self.victim, self.card_types[:-1])]
+
+        return self._play_card()
+
+    def _guess_card(self, action):
+        """
+        Applies guess of victim's card (when Guard is played)
+
+        current_state: guess_card
+        next_state:
+            select_card (next turn)
+            game_over
+        """
+
+        if self.state != 'guess_card':
+            raise RuntimeError('Guessing card while not in guess state')
+
+        if action.guess not in self.list_possible_guesses():
+            raise ValueError('Card {} cannot be guessed'.format(action.guess))
+
+        self.guess = action.guess
+
+        return self._play_card()
+
+    def _kick_dealer(self, action=None):
+        """
+        Throws the dealer, who is out of time, out of the round,
+        both his cards are dropped
+
+        current_state: select_card, select_victim, guess_card
+        next_state:
+            select_card (next turn)
+            game_over
+        """
+
+        if self.state not in ('select_card', 'select_victim', 'guess_card'):
+            raise RuntimeError('Kicking the dealer while it is not his turn')
+
+        dealer = self.dealer
+        card = dealer.new_card
+
+        dealer.new_card = None
+        self.used_cards.append(card.value)
+        self.used_cards.append(dealer.card.value)
+        self.users.kill(dealer)
+
+        events = [TurnTimedOut(dealer, card), PlayerKilled(dealer)]
+        events.extend(self._is_game_over())
+
+        return events
+
+    def _play_card(self):
+        """
+        Drops the dealer's selected card and applies its features,
+        then passes the turn to the next player
+        """
+
+        active_card = self.dealer.new_card
+
+        self.dealer.new_card = None
+        self.used_cards.append(active_card.value)
+
+        events = active_card.play(self)
+        events.extend(self._is_game_over())
+
+        return events
+
+    def _is_game_over(self):
+        """
+        Checks if game is over
+
+        game ends if it is only one player left,
+        or there is no cards in deck.
+        If game is not ended, starts a new turn
+
+        next state:
+            game_over (if game ended)
+            select_card (if game not ended)
+        """
+
+        if len(self.users) == 1 or not self.deck:
+            players_remains = sorted(self.users, key=lambda user: user.card, reverse=True)
+
+            self.state = 'game_over'
+
+            return [GameOver(
+                players_remains[0],
+                [(user, user.card) for user in players_remains],
+                list(self.users.loosers),
+            )]
+
+        self.state = 'change_turn'
+        return self._start_turn()
+
+    @classmethod
+    def generate_deck(cls):
+        """
+        Generates a standard deck of cards
+
+        :return:
+            bytearray, values of the cards
+        """
+        return bytearray(chain.from_iterable(
+            [card.value] * card.num_in_deck for card in cls.card_types
+        ))
+
+    _handlers = {
+        Start: _start,
+        Restart: _restart,
+        SelectCard: _select_card,
+        SelectVictim: _select_victim,
+        GuessCard: _guess_card,
+        KickDealer: _kick_dealer,
+    }
@@ -0,0 +1,73 @@
+"""
+Module contains typed events, that are produced by the rules engine
+(see loveletter.engine) while applying players actions.
+
+Events are plain immutable records, they do not know anything about
+telegram, so they can be rendered to chat, logged, or just ignored
+(e.g. in simulations)
+"""
+
+from collections import namedtuple
+
+# Cards were dealt at the start of the game, the order is the players order
+GameStarted = namedtuple('GameStarted', ['order'])
+
+# User has taken a card to his (empty) hand
+CardDealt = namedtuple('CardDealt', ['user', 'card'])
+
+# A new turn is started
+TurnStarted = namedtuple('TurnStarted', ['dealer'])
+
+# Dealer has taken the second card on his turn
+CardDrawn = namedtuple('CardDrawn', ['user', 'card'])
+
+# Number of cards remaining in the deck after the dealer took his card
+DeckCounted = namedtuple('DeckCounted', ['cards_left'])
+
+# Dealer should choose one of the cards to play
+CardRequested = namedtuple('CardRequested', ['dealer', 'cards'])
+
+# Dealer tried to keep the Countess with the King or the Prince
+CountessForced = namedtuple('CountessForced', ['dealer'])
+
+# Dealer should choose a target for his card
+VictimRequested = namedtuple('VictimRequested', ['dealer', 'victims'])
+
+# Dealer should guess the victim's card (Guard is played)
+GuessRequested = namedtuple('GuessRequested', ['dealer', 'victim', 'cards'])
+
+# Princess is dropped
+PrincessDropped = namedtuple('PrincessDropped', ['user'])
+
+# Countess is dropped
+CountessDropped = namedtuple('CountessDropped', ['user'])
+
+# Targeted card is dropped without effect, because all players are protected
+CardWasted = namedtuple('CardWasted', ['user', 'card'])
+
+# King is played, dealer_card and victim_card are the cards they hold after exchange
+CardsSwapped = namedtuple('CardsSwapped', ['dealer', 'victim', 'dealer_card', 'victim_card'])
+
+# Prince is played, victim drops the card
+CardDiscarded = namedtuple('CardDiscarded', ['dealer', 'victim', 'card'])
+
+# Maid is played
+ProtectionGained = namedtuple('ProtectionGained', ['user'])
+
+# Baron is played
+CardsCompared = namedtuple('CardsCompared', ['dealer', 'victim', 'dealer_card', 'victim_card'])
+
+# Priest is played, the card is shown only to the dealer
+CardRevealed = namedtuple('CardRevealed', ['dealer', 'victim', 'card'])
+
+# Guard is played
+CardGuessed = namedtuple('CardGuessed', ['dealer', 'victim', 'guess', 'hit'])
+
+# Dealer is out of time, he drops the drawn card and leaves the round
+TurnTimedOut = namedtuple('TurnTimedOut', ['user', 'card'])
+
+# User is kicked off the game
+PlayerKilled = namedtuple('PlayerKilled', ['user'])
+
+# Game is over, ranking is a list of (user, card) pairs, the best goes first
+GameOver = namedtuple('GameOver', ['winner', 'ranking', 'loosers'])
@@ -3,411 +3,465 @@
 
 """
 Here contains the Game class that represents
-the game table and handles all events within one game
+the game table and renders all events within one game to players
 """
 
-import random
 from itertools import chain
-import gettext
 
-from telebot import types
-
-from loveletter.users import Users
+from loveletter.engine import (
+    GameState,
+    Start,
+    Restart,
+    SelectCard,
+    SelectVictim,
+    GuessCard,
+    KickDealer,
+)
+from loveletter.i18n import N_, translator
+from loveletter.markups import CARD, GUESS, REMOVE_KEYBOARD, VICTIM, encode_move, move_keyboard
+from loveletter.outbox import Outbox
+from loveletter.tableview import TableView
 from loveletter.cards import (
     Princess,
-    Countess,
     King,
-    Prince,
-    Maid,
     Baron,
     Priest,
-    Guard
+    Guard,
+)
+from loveletter.events import (
+    GameStarted,
+    CardDealt,
+    TurnStarted,
+    CardDrawn,
+    DeckCounted,
+    CardRequested,
+    CountessForced,
+    VictimRequested,
+    GuessRequested,
+    PrincessDropped,
+    CountessDropped,
+    CardWasted,
+    CardsSwapped,
+    CardDiscarded,
+    ProtectionGained,
+    CardsCompared,
+    CardRevealed,
+    CardGuessed,
+    TurnTimedOut,
+    PlayerKilled,
+    GameOver,
 )
-
-gettext.install('loveletter', localedir='./loveletter/locale', codeset='UTF-8')
 
 
-class Game:
+class Game(GameState):
     """
     Class that handles one game, a virtual table if you prefer
 
-    Game has several states, running cycle is:
-
-    not_started (initial state) ─→ change_turn
-    change_turn ─→ select_card
-    select_card ┬→ select_victim (if card is targeted)
-                ├→ change_turn
-                └→ not_started (if game over)
-    select_victim ┬→ guess_card (if card is Guard)
-                  ├→ change_turn
-                  └→ not_started (if game over)
-    guess_card ┬→ change_turn
-               └→ not_started (if game over)
+    All the rules are applied by the GameState (see loveletter.engine),
+    this class only translates players moves to actions and renders
+    resulting events to the telegram chats.
+
+    Messages rendered from one action are coalesced by the outbox,
+    so every player receives a single message per action
+
+    Prompts of the dealer's moves have inline buttons, which carry
+    the game_id and the turn number (see Game.move)
+
+    AI players (users with a policy) do not move within the action,
+    which passed the turn to them: the bot makes each of their moves
+    as a separate task of the game's actor (see GameBot.play_ai)
+
+    With the table view public messages are not sent, but added
+    to the log of the players status messages (see loveletter.tableview)
     """
 
-    card_types = (
-        Princess,
-        Countess,
-        King,
-        Prince,
-        Maid,
-        Baron,
-        Priest,
-        Guard,
-    )
-
-    def __init__(self, bot):
+    __slots__ = ('bot', 'game_id', 'outbox', 'view')
+
+    def __init__(self, bot, game_id=None, views=None):
         """
         Creates a new game
 
-        TODO This class has too many instances and needs to be broken into more abstract subclasses
-
         :param bot:
             Bot, the bot that handles all the player-to-game interactions
         :param game_id:
             int, unique game id (also user_id of the game creator)
+        :param views:
+            ViewUpdater, that delivers status messages of the table view,
+            None to send every public message
         """
 
+        super().__init__()
         self.bot = bot
-        self.users = Users()
-        self.used_cards = []
-        self.dealer = None
-        self.victim = None
-        self.guess = None
-        self.first_card = None
-        self.can_choose_yourself = False
-        self.card_without_action = False
-        self.double_deck = False
-        self.state = 'not_started'
-
-        self.deck = self.generate_deck()
+        self.game_id = game_id
+        self.view = TableView(self, views) if views is not None else None
+        self.outbox = Outbox(bot, self.view.refresh if self.view is not None else None)
 
     def start(self):
         """
-        Starts a new game and deals the cards.
+        Starts a new game, deals the cards and makes the first turn.
         This method must be called after adding
         all players to game and configuring it.
-
-        current_state: not_started
-        next_state: change_turn
         """
-
-        if self.state != 'not_started':
-            raise RuntimeError('Trying to start a game, when it is already started')
-
-        if self.double_deck:
-            self.deck.extend(self.generate_deck())
-
-        random.shuffle(self.deck)
-        self.first_card = self.deck.pop()
-
-        self.users.shuffle()
-        for user in self.users:
-            user.take_card(self.deck)
-
-        message = _("The game is started!\n"
-                    "Players order (top moves first):\n")
-
-        for num, user in enumerate(self.users):
-            if num == 0:
-                message += '\t@{} <<\n'.format(user.name)
-            else:
-                message += '\t@{}\n'.format(user.name)
-
-        self.public_message(message)
-
-        self.state = 'change_turn'
+        self.act(Start())
 
     def restart(self):
         """
-        Restarts the game
-
-        current state: any
-        next state: not_started
+        Restarts the game with the same players
         """
-        self.users.reset()
-        self.deck = self.generate_deck()
-        self.used_cards = []
-
-        self.state = 'not_started'
+        self.act(Restart())
 
-        self.start()
-        self.start_turn()
-
-    def is_game_over(self):
+    def select_card(self, card_name):
         """
-        Checks if game is over
+        Plays the card selected by dealer
 
-        game ends if it is only one player left,
-        or there is no cards in deck.
-        If game is ended, sends game result to chat.
-        If game is not ended, starts a new turn
-
-        current state: any
-        next state:
-            game_over (if game ended)
-            change_turn (if game not ended)
+        :param card_name:
+            str, name of the card, which player want to play
         """
+        self.act(SelectCard(card_name))
 
-        if len(self.users) == 1 or not self.deck:
-            players_remains = sorted(self.users, key=lambda user: user.card, reverse=True)
-            winner = players_remains[0]
-
-            message = [_("Game is over\n"
-                         "Winner is {}\n"
-                         "Players remains\n").format(winner.name)]
-
-            for i, user in enumerate(players_remains):
-                message.append("\t#{} @{} - {} ({})\n".format(i+1, user.name, user.card.name,
-                                                              user.card.value))
-
-            message.append(_("Kicked off the game:\n"))
-
-            for i, user in enumerate(self.users.loosers):
-                message.append("\t@{}\n".format(user.name))
-
-            self.public_message(''.join(message))
-
-            self.bot.send_message(winner.user_id, _("Greetings! You've won!"))
-            for user in self.users:
-                if user != winner:
-                    self.bot.send_message(user.user_id, _("You loose!"))
-
-            self.state = 'game_over'
-
-            return
-
-        self.state = 'change_turn'
-        self.start_turn()
-
-    def start_turn(self):
+    def select_victim(self, victim_name):
         """
-        Starts a player's turn
-
-        If player has Maid's defence, removes it,
-        sends messages to chat about number of card left and
-        current player, make current dealer take new card
-        offers player to choose which card to play.
+        Applies dealer's card to the selected player
 
-        current state: change_turn
-        next state: select_card
+        :param victim_name:
+            str, name of the player
         """
+        self.act(SelectVictim(victim_name))
 
-        if self.state != 'change_turn':
-            raise RuntimeError('Trying to start a turn while not in change_turn state')
-
-        self.dealer = self.users.get_dealer()
-        self.dealer.defence = False
-
-        self.public_message(_("@{}'s turn").format(self.dealer.name))
-        self.dealer.take_new_card(self.deck)
-
-        if self.deck:
-            self.public_message(_("It's {} cards left.").format(len(self.deck)))
-        else:
-            self.public_message(_("Attention! It's the last turn"))
-
-        markup = types.ReplyKeyboardMarkup(row_width=2)
-        button1 = types.KeyboardButton(self.dealer.card.name)
-        button2 = types.KeyboardButton(self.dealer.new_card.name)
-        markup.add(button1, button2)
-
-        self.dealer_message(_("Choose a card which you want to play:"), markup)
-
-        self.state = 'select_card'
-
-    def select_card(self, card_name):
+    def guess_card(self, guess):
         """
-        Applies card features selected by user in game
-
-        If card is targeted, game changes state to select a victim,
-
-        :param card_name:
-            str, name of the card, which player want to play
+        Checks dealer's guess of the victim's card (when Guard is played)
 
-        current_state: select_card
-        next_state:
-            select_victim (if card is targeted)
-            change_turn (else)
+        :param guess:
+            str, name of the card
         """
-        if self.state != 'select_card':
-            raise RuntimeError('Trying to select card while not in select_card state')
-
-        if card_name in [_("Prince"), _("King")] and (isinstance(self.dealer.card, Countess) or
-                                                      isinstance(self.dealer.new_card, Countess)):
-            self.dealer_message(_("Woopsy-daisy... You need to drop a countess."))
-            return
+        self.act(GuessCard(guess))
 
-        if card_name != self.dealer.new_card.name:
-            self.dealer.new_card, self.dealer.card = self.dealer.card, self.dealer.new_card
-
-        if self.dealer.new_card.targeted:
-            self.state = 'select_victim'
-
-            self.can_choose_yourself = False
-            self.card_without_action = False
+    def kick_dealer(self):
+        """
+        Throws the dealer, who is out of time, out of the round
+        """
+        self.act(KickDealer())
 
-            markup = types.ReplyKeyboardMarkup()
-            possible_victims = self.list_possible_victims()
+    def act(self, action):
+        """
+        Applies the action and renders it
 
-            for user_name in possible_victims:
-                button = types.KeyboardButton(user_name)
-                markup.add(button)
+        :param action:
+            one of Start, Restart, SelectCard, SelectVictim, GuessCard, KickDealer
+        """
+        with self.outbox:
+            self.render(self.apply(action))
 
-            if not self.card_without_action:
-                self.dealer_message(_("Choose the player you want play this card with:"), markup)
-                return
+    def make_policy(self, spec):
+        """
+        Creates policy of the restored AI player by the bot (see GameBot.make_policy)
+        """
+        return self.bot.make_policy(spec)
 
-        active_card = self.dealer.new_card
+    def render(self, events):
+        """
+        Sends messages, which describes given events, to players
 
-        self.dealer.new_card = None
-        self.used_cards.append(active_card)
+        :param events:
+            list of events (see loveletter.events)
+        """
+        with self.outbox:
+            for event in events:
+                self._renderers[type(event)](self, event)
 
-        active_card.play(self)
+    def translation(self, user):
+        """
+        Returns translation function for the player's language
 
-        self.state = 'change_turn'
-        self.is_game_over()
+        :param user:
+            User, who receives a message
+        :return:
+            function(str) -> str
+        """
+        return translator.gettext(user.locale)
 
-    def select_victim(self, victim_name):
+    def move(self, code, argument):
         """
+        Returns callback_data of the button of the current turn (see loveletter.markups)
 
-        :param victim_name:
+        :param code:
+            str, code of the move
+        :param argument:
+            int, argument of the move
         :return:
+            str
         """
+        return encode_move(self.game_id, self.turn, code, argument)
 
-        if self.state != 'select_victim':
-            raise RuntimeError("Trying to select a victim, while not in select_victim state")
+    def _render_game_started(self, event):
+        def message(_):
+            text = _("The game is started!\n"
+                     "Players order (top moves first):\n")
 
-        self.victim = self.users.find_by_name(victim_name)
+            for num, user in enumerate(event.order):
+                if num == 0:
+                    text += '\t@{} <<\n'.format(user.name)
+                else:
+                    text += '\t@{}\n'.format(user.name)
 
-        if self.card_without_action:
-            active_card = self.dealer.new_card
-            self.dealer.new_card = None
-            self.used_cards.append(active_card)
-            active_card.play(self)
-            self.is_game_over()
+            return text
 
-            self.state = 'change_turn'
+        # reply keyboards, which were sent before inline buttons, are cleared once a round
+        self.public_message(message, REMOVE_KEYBOARD)
 
-            return
+    def _render_card_dealt(self, event):
+        _ = self.translation(event.user)
+        self.private_message(event.user, _("Your card is '{}'").format(_(event.card.name)))
 
-        if isinstance(self.dealer.new_card, Guard):
-            markup = types.ReplyKeyboardMarkup()
+    def _render_turn_started(self, event):
+        self.public_message(lambda _: _("@{}'s turn").format(event.dealer.name))
 
-            for card in Game.card_types[:-1]:
-                button = types.KeyboardButton(card.name)
-                markup.add(button)
+    def _render_card_drawn(self, event):
+        _ = self.translation(event.user)
+        self.private_message(event.user,
+                             _("You have taken the '{}' card").format(_(event.card.name)))
 
-            self.dealer_message(_("Guess the @{}'s card:").format(self.victim.name), markup)
-            self.state = 'guess_card'
-            return
+    def _render_deck_counted(self, event):
+        if event.cards_left:
+            self.public_message(lambda _: _("It's {} cards left.").format(event.cards_left))
+        else:
+            self.public_message(lambda _: _("Attention! It's the last turn"))
+
+    def _render_card_requested(self, event):
+        _ = self.translation(event.dealer)
+        markup = move_keyboard(self.game_id, self.turn, tuple(
+            (_(card.name), CARD, card.value) for card in event.cards), row_width=2)
+
+        self.private_message(event.dealer, _("Choose a card which you want to play:"), markup)
+
+    def _render_countess_forced(self, event):
+        _ = self.translation(event.dealer)
+        self.private_message(event.dealer, _("Woopsy-daisy... You need to drop a countess."))
+
+    def _render_victim_requested(self, event):
+        _ = self.translation(event.dealer)
+        markup = move_keyboard(self.game_id, self.turn, tuple(
+            (name, VICTIM, index) for index, name in enumerate(event.victims)), row_width=1)
+
+        self.private_message(event.dealer,
+                             _("Choose the player you want play this card with:"), markup)
+
+    def _render_guess_requested(self, event):
+        _ = self.translation(event.dealer)
+        markup = move_keyboard(self.game_id, self.turn, tuple(
+            (_(card.name), GUESS, card.value) for card in event.cards), row_width=1)
+
+        self.private_message(event.dealer,
+                             _("Guess the @{}'s card:").format(event.victim.name), markup)
+
+    def _render_princess_dropped(self, event):
+        self.public_message(lambda _: _("@{} drops a Princess and loses.").format(event.user.name))
+
+    def _render_countess_dropped(self, event):
+        self.public_message(lambda _: _("@{} drops a Countess.").format(event.user.name))
+
+    def _render_card_wasted(self, event):
+        messages = {
+            King: N_("@{} drops the King because all players are protected."),
+            Baron: N_("@{} drops a Baron, because all players are protected."),
+            Priest: N_("@{} drops Priest, because all players are protected."),
+            Guard: N_("@{} drops the Guard, because all players are protected."),
+        }
+        message = messages[type(event.card)]
+
+        self.public_message(lambda _: _(message).format(event.user.name))
+
+    def _render_cards_swapped(self, event):
+        self.public_message(
+            lambda _: _("@{0} plays the King to exchange cards with @{1}.").format(
+                event.dealer.name, event.victim.name)
+        )
+
+        _ = self.translation(event.dealer)
+        self.private_message(event.dealer,
+                             _("You've got a {0} from player @{1}").format(
+                                 _(event.dealer_card.name), event.victim.name))
+
+        _ = self.translation(event.victim)
+        self.private_message(event.victim,
+                             _("You've got a {0} from player @{1}").format(
+                                 _(event.victim_card.name), event.dealer.name))
+
+    def _render_card_discarded(self, event):
+        def message(_):
+            if isinstance(event.card, Princess):
+                return _("@{0} uses Prince against @{1}. "
+                         "@{1} drops a Princess and loses!").format(event.dealer.name,
+                                                                    event.victim.name)
+
+            return _("@{0} uses a Prince against @{1}. @{1} has the {2}.").format(
+                event.dealer.name, event.victim.name, _(event.card.name))
 
-        self.state = 'change_turn'
+        self.public_message(message)
 
-        active_card = self.dealer.new_card
-        self.dealer.new_card = None
-        self.used_cards.append(active_card)
+    def _render_protection_gained(self, event):
+        self.public_message(
+            lambda _: _("@{} is under Maid protection for a one full round.").format(
+                event.user.name)
+        )
+
+    def _render_cards_compared(self, event):
+        dealer, victim = event.dealer, event.victim
+
+        def message(_):
+            if event.dealer_card > event.victim_card:
+                return _("@{0} uses the Baron against @{1} and wins. "
+                         "@{1} has the {2} card").format(dealer.name, victim.name,
+                                                         _(event.victim_card.name))
+            if event.dealer_card < event.victim_card:
+                return _("@{0} uses the Baron against @{1}, but looses. "
+                         "@{0} has the {2} card").format(dealer.name, victim.name,
+                                                         _(event.dealer_card.name))
+
+            return _("Aaaand... here goes nothing"
+                     "Looks like @{0} and @{1} have the same cards... ").format(dealer.name,
+                                                                                victim.name)
 
-        active_card.play(self)
-        self.is_game_over()
+        self.public_message(message)
 
-    def guess_card(self, guess):
-        """
+    def _render_card_revealed(self, event):
+        self.public_message(
+            lambda _: _("@{} uses a Priest card and looks at @{}'s card.").format(
+                event.dealer.name, event.victim.name)
+        )
 
-        :param guess:
-        :return:
-        """
+        _ = self.translation(event.dealer)
+        message = _("@{} shows you his card. He(She) has the {}.").format(event.victim.name,
+                                                                          _(event.card.name))
+        self.private_message(event.dealer, message)
 
-        if self.state != 'guess_card':
-            raise RuntimeError('Guessing card while not in guess state')
+    def _render_card_guessed(self, event):
+        def message(_):
+            if event.hit:
+                return _("@{} uses the Guard and guess that @{} has the {}.").format(
+                    event.dealer.name, event.victim.name, _(event.guess))
 
-        active_card = self.dealer.new_card
-        self.dealer.new_card = None
-        self.used_cards.append(active_card)
+            return _("@{0} uses Guard, assuming that "
+                     "@{1} holds the {2} card, but do not guess it right.").format(
+                         event.dealer.name, event.victim.name, _(event.guess))
 
-        self.guess = guess
-        active_card.play(self)
+        self.public_message(message)
 
-        self.is_game_over()
+    def _render_turn_timed_out(self, event):
+        self.public_message(lambda _: _("@{} is out of time and drops the '{}' card.").format(
+            event.user.name, _(event.card.name)))
 
-    def list_possible_victims(self):
-        """
-        Returns a list of possible victims within one game
-        Player can be a victim only if he is not defended by Maid
-        and he is not a dealer. Howewer if everybody are defended,
-        dealer can become the only one victim, or he can use Prince on himself
+    def _render_player_killed(self, event):
+        self.private_message(event.user, self.translation(event.user)("You've lost!"))
 
-        :return:
-            list, list of victims
-        """
-        victims_list = []
-        for user in self.users:
-            if not user.defence and user != self.dealer:
-                victims_list.append(user.name)
+    def _render_game_over(self, event):
+        def message(_):
+            text = [_("Game is over\n"
+                      "Winner is {}\n"
+                      "Players remains\n").format(event.winner.name)]
 
-        if isinstance(self.dealer.new_card, Prince) or len(victims_list) == 0:
-            victims_list.append(self.dealer.name)
+            for i, (user, card) in enumerate(event.ranking):
+                text.append("\t#{} @{} - {} ({})\n".format(i+1, user.name, _(card.name),
+                                                          card.value))
 
-            if not isinstance(self.dealer.new_card, Prince):
-                self.card_without_action = True
-            else:
-                self.can_choose_yourself = True
+            text.append(_("Kicked off the game:\n"))
+
+            for user in event.loosers:
+                text.append("\t@{}\n".format(user.name))
 
-        return victims_list
+            return ''.join(text)
 
-    def public_message(self, message, markup=None, but=None):
+        self.public_message(message)
+
+        self.private_message(event.winner, self.translation(event.winner)("Greetings! You've won!"))
+        for user, _card in event.ranking:
+            if user != event.winner:
+                self.private_message(user, self.translation(user)("You loose!"))
+
+    _renderers = {
+        GameStarted: _render_game_started,
+        CardDealt: _render_card_dealt,
+        TurnStarted: _render_turn_started,
+        CardDrawn: _render_card_drawn,
+        DeckCounted: _render_deck_counted,
+        CardRequested: _render_card_requested,
+        CountessForced: _render_countess_forced,
+        VictimRequested: _render_victim_requested,
+        GuessRequested: _render_guess_requested,
+        PrincessDropped: _render_princess_dropped,
+        CountessDropped: _render_countess_dropped,
+        CardWasted: _render_card_wasted,
+        CardsSwapped: _render_cards_swapped,
+        CardDiscarded: _render_card_discarded,
+        ProtectionGained: _render_protection_gained,
+        CardsCompared: _render_cards_compared,
+        CardRevealed: _render_card_revealed,
+        CardGuessed: _render_card_guessed,
+        TurnTimedOut: _render_turn_timed_out,
+        PlayerKilled: _render_player_killed,
+        GameOver: _render_game_over,
+    }
+
+    def public_message(self, message, markup=None, but=None, notify=False):
         """
         sends message to all users in this game
 
         :param message:
-            message to be sent
+            str, message to be sent, or function(_) -> str, that
+            translates the message with the given translation function,
+            so every player receives it in his own language
         :param markup:
             markup with helper buttons
         :param but:
             int, user_id, who don't need a message
+        :param notify:
+            bool, if True, message is sent even with the table view
+            (e.g. chat of the players)
         """
+        if self.view is not None and not notify:
+            self.view.add(message)
 
-        for user in self.users:
-            if but is not None and user == but:
-                continue
-            self.bot.send_message(user.user_id, message, reply_markup=markup)
+            if not self.outbox.depth:
+                self.view.refresh()
+            return
+
+        texts = {}
 
-        for user in self.users.loosers:
-            if but is not None and user == but:
+        for user in chain(self.users, self.users.loosers):
+            if (but is not None and user == but) or user.policy is not None:
                 continue
-            self.bot.send_message(user.user_id, message, reply_markup=markup)
 
-    def dealer_message(self, message, markup=None):
+            if callable(message):
+                if user.locale not in texts:
+                    texts[user.locale] = message(self.translation(user))
+                text = texts[user.locale]
+            else:
+                text = message
+
+            self.outbox.send(user.user_id, text, markup)
+
+    def private_message(self, user, message, markup=None):
         """
-        sends message to dealer
+        sends message to one player
 
+        :param user:
+            User, who receives a message
         :param message:
             message to be sent
         :param markup:
             markup with helper buttons
         """
-        self.bot.send_message(self.dealer.user_id, message, reply_markup=markup)
+        if user.policy is None:
+            self.outbox.send(user.user_id, message, markup)
 
-    def victim_message(self, message, markup=None):
+    def dealer_message(self, message, markup=None):
         """
-        sends message to victim
+        sends message to dealer
 
         :param message:
-           message to be sent
+            message to be sent
         :param markup:
-           markup with helper buttons
-        """
-        self.bot.send_message(self.victim.user_id, message, reply_markup=markup)
-
-    @staticmethod
-    def generate_deck():
-        """
-        Generates a standard deck of cards
-
-        :return:
-            list of Cards, the deck
+            markup with helper buttons
         """
-        return list(chain(*[
-            [Card() for _ in range(Card.num_in_deck)]
-            for Card in Game.card_types
-        ]))
+        self.private_message(self.dealer, message, markup)
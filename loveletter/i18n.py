@@ -0,0 +1,150 @@
+# pylint: disable=protected-access
+
+"""
+Module contains the translation layer of the bot.
+
+All message catalogs of the package are loaded once at import
+into plain dicts, so translating a message is a single dict lookup.
+Every player has his own locale, so messages are translated
+for each recipient separately (see Game.public_message).
+
+Card names are kept untranslated inside the game (they are marked by N_),
+they are translated when rendered and parsed back from players answers.
+"""
+
+import gettext
+import os
+
+DOMAIN = 'loveletter'
+LOCALEDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locale')
+DEFAULT_LOCALE = 'en'
+
+
+def N_(message):  # pylint: disable=invalid-name
+    """
+    Marks message for translation without translating it
+
+    :param message:
+        str, message id
+    :return:
+        str, the same message
+    """
+    return message
+
+
+class Translator:
+    """
+    Table of all loaded catalogs
+
+    :attr catalogs:
+        dict of {locale: {message id: translated message}}
+    :attr default:
+        str, locale of players, whose language is not supported
+    """
+
+    def __init__(self, localedir=LOCALEDIR, domain=DOMAIN, default=None):
+        """
+        Loads all catalogs of the domain
+
+        :param localedir:
+            str, directory with <locale>/LC_MESSAGES/<domain>.mo catalogs
+        :param domain:
+            str, name of catalogs
+        :param default:
+            str, default locale, if None it is taken from LANGUAGE, LC_ALL,
+            LC_MESSAGES or LANG environment variables (as gettext does)
+        """
+        self.catalogs = {}
+        self._reversed = {}
+        self._functions = {}
+
+        for locale in sorted(os.listdir(localedir)) if os.path.isdir(localedir) else []:
+            path = os.path.join(localedir, locale, 'LC_MESSAGES', domain + '.mo')
+
+            if not os.path.exists(path):
+                continue
+
+            with open(path, 'rb') as file:
+                catalog = dict(gettext.GNUTranslations(file)._catalog)
+
+            catalog.pop('', None)
+            self._add(locale, catalog)
+
+        if DEFAULT_LOCALE not in self.catalogs:
+            self._add(DEFAULT_LOCALE, {})
+
+        if default is None:
+            for variable in ('LANGUAGE', 'LC_ALL', 'LC_MESSAGES', 'LANG'):
+                if os.environ.get(variable):
+                    default = os.environ[variable].split(':')[0].split('.')[0]
+                    break
+
+        self.default = self.resolve(default, DEFAULT_LOCALE)
+
+    def resolve(self, language_code, default=None):
+        """
+        Finds the loaded locale for the language, e.g. 'ru' -> 'ru_RU'
+
+        :param language_code:
+            str, IETF language tag (as telegram sends it) or locale name
+        :param default:
+            str, locale to return if language is not supported
+            (self.default if None)
+        :return:
+            str, name of the loaded locale
+        """
+        if language_code:
+            code = language_code.replace('-', '_')
+
+            for locale in self.catalogs:
+                if locale.lower() == code.lower():
+                    return locale
+
+            language = code.split('_')[0].lower()
+
+            for locale in self.catalogs:
+                if locale.split('_')[0].lower() == language:
+                    return locale
+
+        return default if default is not None else self.default
+
+    def gettext(self, locale=None):
+        """
+        Returns translation function of the locale
+
+        :param locale:
+            str, name of the loaded locale (default locale if None or unknown)
+        :return:
+            function(str) -> str
+        """
+        return self._functions.get(locale) or self._functions[self.default]
+
+    def parse(self, locale, text):
+        """
+        Finds message id of the translated message, e.g. a card name
+        chosen by player on the keyboard
+
+        :param locale:
+            str, locale of the player
+        :param text:
+            str, translated message
+        :return:
+            str, message id, or the text if it is not a translation
+        """
+        catalog = self._reversed.get(locale)
+
+        if catalog is None:
+            catalog = self._reversed[self.default]
+
+        return catalog.get(text, text)
+
+    def _add(self, locale, catalog):
+        self.catalogs[locale] = catalog
+        self._reversed[locale] = {message: message_id for message_id, message in catalog.items()}
+
+        # function is created once, so translation is just a dict lookup
+        get = catalog.get
+        self._functions[locale] = lambda message: get(message, message)
+
+
+translator = Translator()  # pylint: disable=invalid-name
@@ -0,0 +1,408 @@
+"""
+Information set Monte Carlo tree search (ISMCTS) for the AI players.
+
+The dealer does not know cards of other players, the order of the deck
+and the card set aside at the start, so every iteration of the search
+samples them (determinization) from the cards which are not seen yet:
+the whole deck without the dropped cards (GameState.used_cards)
+and without the dealer's own cards. The tree is built over moves
+of all players, every node counts how often it was available,
+so moves which are legal only in some determinizations are not favoured.
+
+Search runs on the compact copy of the rules (SearchState), where cards
+are encoded by their values and players by seats, so cloning a state
+is a couple of list copies and random playouts are fast.
+Rules are the same as in loveletter.engine.GameState.
+"""
+
+import math
+import random
+import time
+
+from loveletter.engine import GameState
+
+GUARD, PRIEST, BARON, MAID, PRINCE, KING, COUNTESS, PRINCESS = range(1, 9)
+TARGETED = (False, True, True, True, False, True, True, False, False)
+GUESSES = tuple(range(PRIEST, PRINCESS + 1))
+NAMES = {card.value: card.name for card in GameState.card_types}
+VALUES = {card.name: card.value for card in GameState.card_types}
+
+
+class SearchState:
+    """
+    Compact state of the game, seen from the moment when the dealer
+    has taken a new card and has to play one of his two cards
+
+    Seats are numbered in the turn order, 0 means no card.
+    Move is a tuple (card, target seat or -1, guess or 0)
+
+    :attr hands:
+        list of int, cards of players (0 for players who lost)
+    :attr drawn:
+        int, the second card of the dealer
+    :attr dealer:
+        int, seat of the dealer
+    :attr deck:
+        list of int, the last card is the top one
+    :attr first_card:
+        int, card set aside at the start
+    :attr protected:
+        list of bool, players protected by the Maid
+    :attr alive:
+        int, number of players in game
+    :attr winner:
+        int, seat of the winner, -1 if game is not over
+    """
+
+    __slots__ = ('hands', 'drawn', 'dealer', 'deck', 'first_card', 'protected', 'alive', 'winner')
+
+    def __init__(self, hands, drawn, dealer, deck, first_card, protected):
+        self.hands = hands
+        self.drawn = drawn
+        self.dealer = dealer
+        self.deck = deck
+        self.first_card = first_card
+        self.protected = protected
+        self.alive = sum(1 for card in hands if card)
+        self.winner = -1
+
+    def clone(self):
+        """
+        Returns independent copy of the state
+        """
+        state = SearchState.__new__(SearchState)
+        state.hands = self.hands[:]
+        state.drawn = self.drawn
+        state.dealer = self.dealer
+        state.deck = self.deck[:]
+        state.first_card = self.first_card
+        state.protected = self.protected[:]
+        state.alive = self.alive
+        state.winner = self.winner
+        return state
+
+    def playable(self):
+        """
+        Returns cards, which dealer may play (Countess rule is applied)
+        """
+        card, drawn = self.hands[self.dealer], self.drawn
+
+        if COUNTESS in (card, drawn):
+            cards = [value for value in (card, drawn) if value not in (KING, PRINCE)]
+        else:
+            cards = [card, drawn]
+
+        return cards if cards[0] != cards[-1] else cards[:1]
+
+    def targets(self, card):
+        """
+        Returns seats, which can be targeted by the card,
+        empty list means that card is played without action
+        """
+        dealer = self.dealer
+        targets = [seat for seat, hand in enumerate(self.hands)
+                   if hand and seat != dealer and not self.protected[seat]]
+
+        if card == PRINCE:
+            targets.append(dealer)
+
+        return targets
+
+    def moves(self):
+        """
+        Returns all legal moves of the dealer
+        """
+        moves = []
+
+        for card in self.playable():
+            if not TARGETED[card]:
+                moves.append((card, -1, 0))
+                continue
+
+            targets = self.targets(card)
+
+            if not targets:
+                moves.append((card, -1, 0))
+            elif card == GUARD:
+                moves.extend((card, target, guess) for target in targets for guess in GUESSES)
+            else:
+                moves.extend((card, target, 0) for target in targets)
+
+        return moves
+
+    def random_move(self, rng):
+        """
+        Returns random legal move, the Princess is never dropped
+        if there is another option (it is used in playouts)
+        """
+        cards = self.playable()
+
+        if len(cards) > 1 and PRINCESS in cards:
+            card = cards[0] if cards[1] == PRINCESS else cards[1]
+        else:
+            card = cards[0] if len(cards) == 1 else cards[rng.random() < 0.5]
+
+        if not TARGETED[card]:
+            return card, -1, 0
+
+        targets = self.targets(card)
+
+        if not targets:
+            return card, -1, 0
+
+        target = targets[int(rng.random() * len(targets))]
+
+        if card == GUARD:
+            return card, target, GUESSES[int(rng.random() * len(GUESSES))]
+
+        return card, target, 0
+
+    def play(self, move):
+        """
+        Applies dealer's move and passes the turn to the next player
+        (or finishes the game)
+
+        :param move:
+            tuple (card, target, guess)
+        """
+        card, target, guess = move
+        hands = self.hands
+        dealer = self.dealer
+
+        if card == self.drawn:
+            keep = hands[dealer]
+        else:
+            keep = self.drawn
+
+        hands[dealer] = keep
+
+        if card == PRINCESS:
+            self._kill(dealer)
+        elif target < 0:
+            if card == MAID:
+                self.protected[dealer] = True
+        elif card == GUARD:
+            if hands[target] == guess:
+                self._kill(target)
+        elif card == BARON:
+            if keep > hands[target]:
+                self._kill(target)
+            elif keep < hands[target]:
+                self._kill(dealer)
+        elif card == PRINCE:
+            if hands[target] == PRINCESS:
+                self._kill(target)
+            else:
+                if not self.deck:
+                    self.deck.append(self.first_card)
+                hands[target] = self.deck.pop()
+        elif card == KING:
+            hands[dealer], hands[target] = hands[target], keep
+
+        self._next_turn()
+
+    def _kill(self, seat):
+        self.hands[seat] = 0
+        self.alive -= 1
+
+    def _next_turn(self):
+        hands = self.hands
+        num_seats = len(hands)
+
+        if self.alive == 1 or not self.deck:
+            # ties are won by the player, who moves earlier in the next round
+            best = -1
+            for shift in range(1, num_seats + 1):
+                seat = (self.dealer + shift) % num_seats
+                if hands[seat] > best:
+                    best, self.winner = hands[seat], seat
+            return
+
+        seat = (self.dealer + 1) % num_seats
+        while not hands[seat]:
+            seat = (seat + 1) % num_seats
+
+        self.dealer = seat
+        self.protected[seat] = False
+        self.drawn = self.deck.pop()
+
+
+class Determinizer:
+    """
+    Samples hidden cards of the game, as they are seen by its dealer
+
+    :attr seats:
+        list of User, players in the turn order, the dealer is seat 0
+    """
+
+    def __init__(self, game, known=None):
+        """
+        Prepares the pool of unseen cards
+
+        :param game:
+            GameState in 'select_card' state
+        :param known:
+            dict of {user_id: card value}, cards of other players,
+            which are known to the dealer (e.g. shown by the Priest)
+        """
+        queue = list(game.users)
+
+        # dealer has been moved to the end of the queue at the start of his turn
+        self.seats = [game.dealer] + [user for user in queue if user is not game.dealer]
+
+        pool = list(game.generate_deck())
+        if game.double_deck:
+            pool += pool
+
+        seen = list(game.used_cards)
+        seen += [game.dealer.card.value, game.dealer.new_card.value]
+
+        self.known = [0] * len(self.seats)
+        for seat, user in enumerate(self.seats[1:], 1):
+            if known and user.user_id in known:
+                self.known[seat] = known[user.user_id]
+                seen.append(known[user.user_id])
+
+        for value in seen:
+            if value in pool:
+                pool.remove(value)
+
+        self.pool = pool
+        self.deck_size = len(game.deck)
+        self.dealer_card = game.dealer.card.value
+        self.drawn = game.dealer.new_card.value
+        self.protected = [user.defence for user in self.seats]
+
+    def sample(self, rng):
+        """
+        Returns random SearchState consistent with the dealer's information
+        """
+        pool = self.pool[:]
+        rng.shuffle(pool)
+
+        hands = self.known[:]
+        hands[0] = self.dealer_card
+
+        for seat in range(1, len(hands)):
+            if not hands[seat]:
+                hands[seat] = pool.pop()
+
+        deck = pool[:self.deck_size]
+        first_card = pool[self.deck_size] if len(pool) > self.deck_size else 0
+
+        return SearchState(hands, self.drawn, 0, deck, first_card, self.protected[:])
+
+
+class Node:
+    """
+    Node of the search tree
+
+    :attr move:
+        tuple, move which leads to this node
+    :attr player:
+        int, seat of the player who made the move
+    :attr visits:
+        int, number of playouts through this node
+    :attr wins:
+        int, number of these playouts won by the player
+    :attr avail:
+        int, number of times the move was legal, when its parent was visited
+    """
+
+    __slots__ = ('move', 'player', 'parent', 'children', 'visits', 'wins', 'avail')
+
+    def __init__(self, move=None, player=-1, parent=None):
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = {}
+        self.visits = 0
+        self.wins = 0
+        self.avail = 1
+
+    def select(self, moves, exploration):
+        """
+        Chooses the child by UCB among moves, legal in this determinization
+        """
+        best, best_score = None, -1.0
+
+        for move in moves:
+            child = self.children[move]
+            score = child.wins / child.visits + \
+                exploration * math.sqrt(math.log(child.avail) / child.visits)
+
+            if score > best_score:
+                best, best_score = child, score
+
+        return best
+
+
+def search(game, budget=0.2, iterations=None, exploration=0.7, rng=random, known=None):
+    """
+    Finds the best move of the game's dealer
+
+    :param game:
+        GameState in 'select_card' state
+    :param budget:
+        float, time to think in seconds
+    :param iterations:
+        int, number of playouts (if given, budget is ignored)
+    :param exploration:
+        float, UCB exploration constant
+    :param rng:
+        random.Random, source of randomness
+    :param known:
+        dict of {user_id: card value}, cards of other players known to the dealer
+    :return:
+        tuple (card name, victim name or None, guess name or None, number of playouts)
+    """
+    determinizer = Determinizer(game, known)
+    root = Node()
+    deadline = time.perf_counter() + budget
+    count = 0
+
+    # at least one playout is made, so the root always has a move to choose
+    while iterations is None or count < iterations or not count:
+        # time is checked once in a while, it is slower than a playout step
+        if iterations is None and count and not count % 16 and time.perf_counter() > deadline:
+            break
+
+        count += 1
+        state = determinizer.sample(rng)
+        node = root
+
+        # selection and expansion
+        while state.winner < 0:
+            moves = state.moves()
+            children = node.children
+            untried = []
+
+            for move in moves:
+                if move in children:
+                    children[move].avail += 1
+                else:
+                    untried.append(move)
+
+            if untried:
+                move = untried[int(rng.random() * len(untried))]
+                node = children[move] = Node(move, state.dealer, node)
+                state.play(move)
+                break
+
+            node = node.select(moves, exploration)
+            state.play(node.move)
+
+        # playout
+        while state.winner < 0:
+            state.play(state.random_move(rng))
+
+        while node is not root:
+            node.visits += 1
+            if node.player == state.winner:
+                node.wins += 1
+            node = node.parent
+
+    card, target, guess = max(root.children.values(), key=lambda child: child.visits).move
+    victim = determinizer.seats[target].name if target >= 0 else None
+
+    return NAMES[card], victim, NAMES[guess] if guess else None, count
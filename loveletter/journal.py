@@ -0,0 +1,266 @@
+"""
+Module contains the Journal class, an append-only log of players actions,
+that lets the bot restore all running games after restart.
+
+Journal is a directory with numbered segments 'journal.<N>' and one
+'snapshot' file. Every segment is a list of json records, one per line.
+Records are written by a background thread in batches with a single fsync
+per batch (group commit), so handlers never wait for the disk.
+Snapshot holds the whole state at the start of some segment, so only
+segments after it are replayed and older ones are deleted.
+"""
+
+import json
+import logging
+import os
+import threading
+
+SNAPSHOT = 'snapshot'
+SEGMENT_PREFIX = 'journal.'
+
+
+class Journal:
+    """
+    Append-only journal of records with snapshots
+
+    Record is a json-serializable list, e.g. ['join', user_id, name, friend_name]
+
+    :attr path:
+        str, directory of the journal
+    :attr segment:
+        int, number of the segment, where records are written now
+    :attr written:
+        int, number of records written since the last snapshot
+    """
+
+    def __init__(self, path, flush_interval=0.05, snapshot_every=10000):
+        """
+        Opens journal (directory is created if it does not exist),
+        call load() to read it and open() to start writing
+
+        :param path:
+            str, directory of the journal
+        :param flush_interval:
+            float, how often buffered records are written to disk in seconds,
+            it is the maximal time of records, that can be lost on crash
+        :param snapshot_every:
+            int, number of records after which a new snapshot is due
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+
+        self.segment = None
+        self.written = 0
+
+        self._file = None
+        self._buffer = []
+        self._condition = threading.Condition()
+        self._file_lock = threading.Lock()
+        self._snapshotting = False
+        self._stopped = False
+        self._flusher = None
+
+        os.makedirs(path, exist_ok=True)
+
+    def segments(self):
+        """
+        Returns numbers of all segments on disk in ascending order
+        """
+        return sorted(int(name[len(SEGMENT_PREFIX):]) for name in os.listdir(self.path)
+                      if name.startswith(SEGMENT_PREFIX) and name[len(SEGMENT_PREFIX):].isdigit())
+
+    def load(self):
+        """
+        Reads the last snapshot and all records written after it.
+        The last record of a segment may be torn by crash, such record is skipped
+
+        :return:
+            tuple (snapshot, records), where snapshot is a dict
+            passed to write_snapshot() or None, and records is a list of records
+        """
+        snapshot = None
+        first = 0
+
+        if os.path.exists(self._file_path(SNAPSHOT)):
+            with open(self._file_path(SNAPSHOT), encoding='utf-8') as file:
+                snapshot = json.load(file)
+            first = snapshot['segment']
+
+        records = []
+
+        for segment in self.segments():
+            if segment < first:
+                continue
+
+            with open(self._segment_path(segment), encoding='utf-8') as file:
+                lines = file.read().split('\n')
+
+            for num, line in enumerate(lines):
+                if not line:
+                    continue
+
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    if num < len(lines) - 1:
+                        raise
+                    logging.warning('Torn record in segment %d is skipped', segment)
+
+        return snapshot, records
+
+    def open(self):
+        """
+        Starts writing to a new segment (the old ones are never appended,
+        so a torn tail of the crashed one stays the last line of its segment)
+        """
+        segments = self.segments()
+        self.segment = segments[-1] + 1 if segments else 0
+        self._file = open(self._segment_path(self.segment), 'a', encoding='utf-8')
+
+        self._flusher = threading.Thread(target=self._flush_loop, name='Journal', daemon=True)
+        self._flusher.start()
+
+    def append(self, record):
+        """
+        Adds record to the journal, returns immediately,
+        record is written to disk by the background thread
+
+        :param record:
+            list, json-serializable record
+        """
+        line = json.dumps(record, separators=(',', ':'), ensure_ascii=False)
+
+        with self._condition:
+            self._buffer.append(line)
+            self.written += 1
+
+            if len(self._buffer) == 1:
+                self._condition.notify_all()
+
+    def sync(self):
+        """
+        Writes all buffered records to disk
+        """
+        self._write()
+
+    def rotate(self):
+        """
+        Writes buffered records and starts a new segment
+
+        :return:
+            int, number of the new segment
+        """
+        with self._file_lock:
+            with self._condition:
+                lines, self._buffer = self._buffer, []
+                self.written = 0
+
+            self._write_lines(lines)
+            self._file.close()
+
+            self.segment += 1
+            self._file = open(self._segment_path(self.segment), 'a', encoding='utf-8')
+
+            return self.segment
+
+    def snapshot_due(self):
+        """
+        Checks if it is time to make a snapshot, returns True only once
+        for each snapshot, so it is not made twice concurrently.
+        Caller must call write_snapshot() after that
+
+        :return:
+            bool
+        """
+        with self._condition:
+            if self._snapshotting or self.written < self.snapshot_every:
+                return False
+
+            self._snapshotting = True
+            return True
+
+    def write_snapshot(self, segment, data):
+        """
+        Saves snapshot atomically and deletes segments, that are older than it
+
+        :param segment:
+            int, segment, which starts right after the snapshotted state
+            (returned by rotate())
+        :param data:
+            dict, json-serializable state
+        """
+        tmp_path = self._file_path(SNAPSHOT + '.tmp')
+
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(dict(data, segment=segment), file, separators=(',', ':'),
+                          ensure_ascii=False)
+                file.flush()
+                os.fsync(file.fileno())
+
+            os.replace(tmp_path, self._file_path(SNAPSHOT))
+        finally:
+            with self._condition:
+                self._snapshotting = False
+
+        for old_segment in self.segments():
+            if old_segment < segment:
+                os.remove(self._segment_path(old_segment))
+
+    def close(self):
+        """
+        Writes buffered records and stops the background thread
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        if self._flusher is not None:
+            self._flusher.join()
+
+        self._write()
+
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _flush_loop(self):
+        while True:
+            with self._condition:
+                while not self._buffer and not self._stopped:
+                    self._condition.wait()
+
+                if self._stopped:
+                    return
+
+                # records appended while waiting go to the same batch
+                self._condition.wait(self.flush_interval)
+
+            self._write()
+
+    def _write(self):
+        """
+        Writes buffered records with a single fsync,
+        appenders are not blocked while the disk is busy
+        """
+        with self._file_lock:
+            with self._condition:
+                lines, self._buffer = self._buffer, []
+
+            self._write_lines(lines)
+
+    def _write_lines(self, lines):
+        if not lines or self._file is None:
+            return
+
+        self._file.write('\n'.join(lines) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _file_path(self, name):
+        return os.path.join(self.path, name)
+
+    def _segment_path(self, segment):
+        return self._file_path('{}{}'.format(SEGMENT_PREFIX, segment))
@@ -0,0 +1,159 @@
+"""
+Load generator, that plays thousands of simultaneous games of scripted
+players through the whole bot (routing, actors, handlers, rendering),
+messages are carried by the in-memory transport (see loveletter.transport).
+
+Games go through the phases together: all of them are created,
+then joined, then started, then every round each running game gets
+the next move of its dealer (a tap of the inline button), so the bot always has one pending update
+per game. Latency of an update is the time from its delivery
+to the end of its handler (see GameBot on_handled).
+"""
+
+import json
+import logging
+import random
+import time
+
+from loveletter.benchmark import summary
+from loveletter.markups import CARD, GUESS, VICTIM
+from loveletter.sessions import SessionRegistry
+from loveletter.transport import FakeTransport, callback_query, text_message
+
+
+def run_load(num_games=10000, num_players=2, workers=4, batch_size=1000, seed=0):
+    """
+    Plays games of scripted players with random moves
+
+    :param num_games:
+        int, number of simultaneous games
+    :param num_players:
+        int, players in each game
+    :param workers:
+        int, number of threads that handle updates
+    :param batch_size:
+        int, number of updates passed to the bot at once
+    :param seed:
+        int, seed of the players moves
+    :return:
+        dict, report with updates per second and latencies
+    """
+    # bot registers this module as a command, so it is imported only when needed
+    from loveletter.bot import GameBot  # pylint: disable=import-outside-toplevel
+
+    submitted = {}
+    latencies = {}
+
+    def handled(message, seconds):
+        kind = submitted.pop(id(message), None)
+
+        if kind is not None:
+            latencies.setdefault(kind, []).append(seconds)
+
+    rng = random.Random(seed)
+    transport = FakeTransport(keep=False)
+    bot = GameBot('123:loadtest', workers=workers, transport=transport,
+                  sessions=SessionRegistry(max_games=None), on_handled=handled)
+
+    def deliver(updates):
+        for num in range(0, len(updates), batch_size):
+            messages = []
+
+            for kind, message in updates[num:num + batch_size]:
+                messages.append(message)
+                submitted[id(message)] = kind
+
+            transport.deliver(messages, wait=False)
+
+        bot.actors.join()
+
+    def player(game_num, seat):
+        return game_num * num_players + seat + 1, 'g{}p{}'.format(game_num, seat)
+
+    start = time.perf_counter()
+
+    deliver([('create', text_message(*player(num, 0), '/create')) for num in range(num_games)])
+    deliver([('join', text_message(*player(num, seat), '/join @' + player(num, 0)[1]))
+             for num in range(num_games) for seat in range(1, num_players)])
+    deliver([('start', text_message(*player(num, 0), '/start')) for num in range(num_games)])
+
+    games = [bot.users[player(num, 0)[0]].game for num in range(num_games)]
+    rounds = 0
+
+    while games:
+        updates = []
+
+        for game in games:
+            dealer = game.dealer
+
+            if game.state == 'select_card':
+                cards = [card for card in (dealer.card, dealer.new_card)
+                         if card.name in game.list_playable_cards()]
+                kind, data = 'card', game.move(CARD, rng.choice(cards).value)
+            elif game.state == 'select_victim':
+                victims = game.list_possible_victims()
+                kind, data = 'victim', game.move(VICTIM, rng.randrange(len(victims)))
+            else:
+                kind, data = 'guess', game.move(GUESS, rng.choice(game.card_types[:-1]).value)
+
+            updates.append((kind, callback_query(dealer.user_id, dealer.name, data)))
+
+        deliver(updates)
+        games = [game for game in games if game.state != 'game_over']
+        rounds += 1
+
+    elapsed = time.perf_counter() - start
+    bot.actors.stop()
+
+    everything = [latency for values in latencies.values() for latency in values]
+
+    return {
+        'games': num_games,
+        'players': num_players,
+        'workers': workers,
+        'rounds': rounds,
+        'updates': len(everything),
+        'seconds': elapsed,
+        'updates_per_second': len(everything) / elapsed,
+        'messages_sent': sum(transport.counts.values()),
+        'latency': summary(everything),
+        'latency_by_type': {kind: summary(values) for kind, values in latencies.items()},
+    }
+
+
+def add_parser(subparsers):
+    """
+    Adds 'loadtest' command to the command line parser
+
+    :param subparsers:
+        argparse subparsers action
+    """
+    parser = subparsers.add_parser('loadtest', help='play many simultaneous games without telegram')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--players', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of threads that handle updates')
+    parser.add_argument('--batch', type=int, default=1000,
+                        help='number of updates passed to the bot at once')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help='json file for the results')
+
+
+def main(args):
+    """
+    Runs load test with parsed command line arguments
+
+    :param args:
+        argparse.Namespace, see add_parser
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+
+    report = run_load(args.games, args.players, args.workers, args.batch, args.seed)
+
+    print('{updates} updates of {games} games in {seconds:.1f}s: {updates_per_second:.0f}/s, '
+          'p50 {p50:.0f}us, p99 {p99:.0f}us'.format(p50=report['latency']['p50_us'],
+                                                    p99=report['latency']['p99_us'], **report))
+
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
@@ -0,0 +1,111 @@
+"""
+Module contains keyboards of the game's prompts.
+
+Moves are made by inline buttons: callback_data of the button is
+a compact string '<game_id>:<turn>:<code><argument>' (e.g. '42:7:c3'
+is the card of value 3 at the 7th turn of the game 42), so the bot
+finds the move by its code and drops taps of the previous turns
+without looking at the text of the prompt.
+
+Prompts use only a few keyboards (pairs of cards, guess of the Guard,
+names of players at the table), so every keyboard is serialized to json
+once, without the game and the turn, and only they are inserted
+into the cached json, when the prompt is sent.
+"""
+
+import json
+from functools import lru_cache
+
+from telebot import types
+
+REMOVE_KEYBOARD = types.ReplyKeyboardRemove(selective=False).to_json()
+
+# codes of moves in callback_data
+CARD = 'c'
+VICTIM = 'v'
+GUESS = 'g'
+
+# marks the place of '<game_id>:<turn>:' in the cached keyboards
+PREFIX = '\0'
+
+
+def encode_move(game_id, turn, code, argument):
+    """
+    Returns callback_data of the move's button
+
+    :param game_id:
+        int, id of the game
+    :param turn:
+        int, number of the turn (see GameState.turn)
+    :param code:
+        str, one of CARD, VICTIM, GUESS
+    :param argument:
+        int, value of the card or index of the victim
+        in the list of possible victims (see GameState.list_possible_victims)
+    :return:
+        str
+    """
+    return '{}:{}:{}{}'.format(game_id, turn, code, argument)
+
+
+def decode_move(data):
+    """
+    Parses callback_data of the move's button
+
+    :param data:
+        str, callback_data
+    :return:
+        tuple (game_id, turn, code, argument), or None if data is malformed
+    """
+    try:
+        game_id, turn, move = data.split(':')
+        return int(game_id), int(turn), move[:1], int(move[1:])
+    except (AttributeError, ValueError):
+        return None
+
+
+def inline_keyboard(buttons, row_width=3):
+    """
+    Returns serialized inline keyboard
+
+    :param buttons:
+        list of tuples (text, callback_data)
+    :param row_width:
+        int, number of buttons in a row
+    :return:
+        str, json of the InlineKeyboardMarkup
+    """
+    buttons = [{'text': text, 'callback_data': data} for text, data in buttons]
+    rows = [buttons[num:num + row_width] for num in range(0, len(buttons), row_width)]
+
+    return json.dumps({'inline_keyboard': rows})
+
+
+def move_keyboard(game_id, turn, moves, row_width=3):
+    """
+    Returns serialized inline keyboard of the moves of the turn
+
+    :param game_id:
+        int, id of the game
+    :param turn:
+        int, number of the turn (see GameState.turn)
+    :param moves:
+        tuple of tuples (text, code, argument), texts are translated,
+        so keyboards of different languages are cached separately
+    :param row_width:
+        int, number of buttons in a row
+    :return:
+        str, json of the InlineKeyboardMarkup
+    """
+    return '{}:{}:'.format(game_id, turn).join(_keyboard_parts(moves, row_width))
+
+
+@lru_cache(maxsize=4096)
+def _keyboard_parts(moves, row_width):
+    """
+    Returns json of the keyboard split by the places of '<game_id>:<turn>:'
+    """
+    markup = inline_keyboard([(text, '{}{}{}'.format(PREFIX, code, argument))
+                              for text, code, argument in moves], row_width)
+
+    return tuple(markup.split(json.dumps(PREFIX)[1:-1]))
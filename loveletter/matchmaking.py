@@ -0,0 +1,238 @@
+"""
+Module contains matchmaking of strangers: players, who sent /queue,
+wait in buckets by the table size and the language, a bucket becomes
+a table as soon as it is full. If the oldest player of the bucket waits
+longer than the timeout, his table is completed by AI players.
+
+Buckets keep players in the order of arrival, so the oldest player
+is always the first one, and deadlines are kept in the heap,
+every operation is O(log n) of the waiting players.
+Players are removed from the heap lazily, when their deadline comes.
+A matchmaker without thread is moved by hand (see Matchmaker.advance).
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+MIN_TABLE_SIZE = 2
+MAX_TABLE_SIZE = 8
+
+Ticket = namedtuple('Ticket', ['user_id', 'name', 'locale', 'size'])
+
+
+class Matchmaker:
+    """
+    Queue of players, who wait for a table
+
+    :attr timeout:
+        float, seconds after which the table is filled by AI players
+    :attr tables:
+        int, number of formed tables
+    """
+
+    def __init__(self, on_table=None, timeout=60.0, clock=time.monotonic, threaded=True):
+        """
+        Creates empty queue, its thread is started by the first player
+
+        :param on_table:
+            function(tickets, ai), called when the table is formed, tickets
+            is list of Ticket (the oldest first), ai is number of AI players.
+            It is called without the lock, in the thread of enqueue()
+            or in the matchmaker's thread (may be set later, before the first player)
+        :param timeout:
+            float, seconds to wait for other players
+        :param clock:
+            function, that returns current time in seconds
+        :param threaded:
+            bool, if False the matchmaker has no thread, tables of expired
+            players are formed by advance()
+        """
+        self.on_table = on_table
+        self.timeout = timeout
+        self.clock = clock
+        self.threaded = threaded
+        self.tables = 0
+
+        self._condition = threading.Condition()
+        # (size, locale) -> OrderedDict of {user_id: Ticket}
+        self._buckets = {}
+        self._tickets = {}
+        self._deadlines = []
+        self._counter = itertools.count()
+        self._thread = None
+        self._stopped = False
+
+    def enqueue(self, user_id, name, locale, size):
+        """
+        Puts player to the queue (moves him, if he is already waiting)
+
+        :param user_id:
+            int, id of the player
+        :param name:
+            str, name of the player
+        :param locale:
+            str, language of the player, players of different languages never meet
+        :param size:
+            int, preferred number of players at the table
+        :return:
+            int, number of players in his bucket (including him),
+            0 if the table is formed right away
+        """
+        ticket = Ticket(user_id, name, locale, size)
+
+        with self._condition:
+            self._remove(user_id)
+
+            bucket = self._buckets.setdefault((size, locale), OrderedDict())
+            bucket[user_id] = ticket
+            self._tickets[user_id] = ticket
+
+            if len(bucket) < size:
+                heapq.heappush(self._deadlines,
+                               (self.clock() + self.timeout, next(self._counter), ticket))
+                self._start()
+                self._condition.notify()
+                return len(bucket)
+
+            tickets = self._take(bucket, size)
+
+        self.on_table(tickets, 0)
+
+        return 0
+
+    def cancel(self, user_id):
+        """
+        Removes player from the queue
+
+        :return:
+            bool, True if he was waiting
+        """
+        with self._condition:
+            return self._remove(user_id) is not None
+
+    def __contains__(self, user_id):
+        with self._condition:
+            return user_id in self._tickets
+
+    def __len__(self):
+        with self._condition:
+            return len(self._tickets)
+
+    def stop(self):
+        """
+        Stops the thread, waiting players stay in the queue
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+            thread = self._thread
+
+        if thread is not None:
+            thread.join()
+
+    def advance(self):
+        """
+        Forms tables of players, whose deadline has come, in the caller's thread
+
+        :return:
+            int, number of formed tables
+        """
+        tables = []
+
+        with self._condition:
+            tickets = self._pop_expired()
+
+            while tickets is not None:
+                tables.append(tickets)
+                tickets = self._pop_expired()
+
+        for tickets in tables:
+            self.on_table(tickets, tickets[0].size - len(tickets))
+
+        return len(tables)
+
+    def _start(self):
+        if self._thread is None and self.threaded:
+            self._thread = threading.Thread(target=self._work, name='Matchmaker', daemon=True)
+            self._thread.start()
+
+    def _remove(self, user_id):
+        ticket = self._tickets.pop(user_id, None)
+
+        if ticket is not None:
+            bucket = self._buckets[(ticket.size, ticket.locale)]
+            del bucket[user_id]
+
+            if not bucket:
+                del self._buckets[(ticket.size, ticket.locale)]
+
+        return ticket
+
+    def _take(self, bucket, size):
+        """
+        Takes up to size oldest players of the bucket. Must be called under the lock
+        """
+        tickets = []
+
+        while bucket and len(tickets) < size:
+            _, ticket = bucket.popitem(last=False)
+            del self._tickets[ticket.user_id]
+            tickets.append(ticket)
+
+        if not bucket:
+            del self._buckets[(tickets[0].size, tickets[0].locale)]
+
+        self.tables += 1
+
+        return tickets
+
+    def _pop_expired(self):
+        """
+        Takes the table of the player, whose deadline has come,
+        None if there is no such player. Must be called under the lock
+        """
+        while self._deadlines and self._deadlines[0][0] <= self.clock():
+            _, _, ticket = heapq.heappop(self._deadlines)
+
+            # player has left the queue, got the table or queued again
+            if self._tickets.get(ticket.user_id) is not ticket:
+                continue
+
+            return self._take(self._buckets[(ticket.size, ticket.locale)], ticket.size)
+
+        return None
+
+    def _expired(self):
+        """
+        Waits for the player, whose deadline has come,
+        and takes his table. Must be called under the lock
+        """
+        while not self._stopped:
+            tickets = self._pop_expired()
+
+            if tickets is not None:
+                return tickets
+
+            if not self._deadlines:
+                self._condition.wait()
+                continue
+
+            delay = self._deadlines[0][0] - self.clock()
+
+            if delay > 0:
+                self._condition.wait(delay)
+
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                tickets = self._expired()
+
+            if tickets is None:
+                return
+
+            self.on_table(tickets, tickets[0].size - len(tickets))
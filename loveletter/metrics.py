@@ -0,0 +1,300 @@
+"""
+Module contains the bot's metrics and a tiny http server,
+that exposes them in the Prometheus text format.
+
+Handlers are timed by BotMetrics.timed, gauges (e.g. games by state)
+are computed by collectors only when metrics are scraped,
+so the bot does not do any extra work for them between scrapes.
+"""
+
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names, values):
+    """
+    Formats labels of a sample, e.g. {command="start"}
+    """
+    if not names:
+        return ''
+
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append('{}="{}"'.format(name, value))
+
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    """
+    Monotonic counter with labels, it is either increased directly
+    or computed by collect function when metrics are rendered
+
+    :attr name:
+        str, name of the metric
+    :attr documentation:
+        str, help text of the metric
+    :attr labels:
+        tuple of str, names of labels
+    :attr collect:
+        function, that returns dict of {label values tuple: value}, or None
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=(), collect=None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        """
+        Increases the counter of given labels
+        """
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def get(self, *label_values):
+        """
+        Returns current value of given labels
+        """
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def samples(self):
+        """
+        Returns list of (name, label values, value)
+        """
+        if self.collect is not None:
+            values = self.collect()
+
+            with self._lock:
+                self._values = dict(values)
+
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    """
+    Value, that can go up and down
+    """
+
+    kind = 'gauge'
+
+    def set(self, value, *label_values):
+        """
+        Sets value of given labels
+        """
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    """
+    Histogram of observed values with labels
+
+    :attr buckets:
+        tuple of float, upper bounds of buckets
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        """
+        Adds observed value to the histogram of given labels
+        """
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            counts = self._values.get(label_values)
+
+            if counts is None:
+                # counts by buckets, +Inf bucket, sum of values
+                counts = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        """
+        Returns list of (name, label values, value), buckets are cumulative
+        """
+        with self._lock:
+            values = {key: counts[:] for key, counts in self._values.items()}
+
+        samples = []
+        for key, counts in sorted(values.items()):
+            total = 0
+
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                total += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append((self.name + '_bucket', key + (le,), total))
+
+            samples.append((self.name + '_count', key, total))
+            samples.append((self.name + '_sum', key, counts[-1]))
+
+        return samples
+
+
+class Registry:
+    """
+    Set of metrics, which are rendered together
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        """
+        Adds metric to the registry
+
+        :return:
+            the same metric
+        """
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        Returns all metrics in the Prometheus text format
+
+        :return:
+            str
+        """
+        lines = []
+
+        for metric in self.metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.documentation))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+
+            for name, label_values, value in metric.samples():
+                labels = metric.labels
+                if name.endswith('_bucket'):
+                    labels += ('le',)
+
+                lines.append('{}{} {}'.format(name, format_labels(labels, label_values), value))
+
+        return '\n'.join(lines) + '\n'
+
+
+class BotMetrics(Registry):
+    """
+    Metrics of the GameBot
+
+    :attr updates:
+        Counter, handled updates by handler
+    :attr errors:
+        Counter, handlers which raised an exception
+    :attr latency:
+        Histogram, time spent in handlers
+    :attr messages:
+        Counter, send_message calls of the bot
+    """
+
+    def __init__(self):
+        super().__init__()
+
+        self.updates = self.register(Counter(
+            'loveletter_updates_total', 'Handled updates', ['handler']))
+        self.errors = self.register(Counter(
+            'loveletter_handler_errors_total', 'Handlers failed with exception', ['handler']))
+        self.latency = self.register(Histogram(
+            'loveletter_handler_seconds', 'Time spent in handlers', ['handler']))
+        self.messages = self.register(Counter(
+            'loveletter_messages_total', 'Outgoing messages requested by handlers'))
+
+    def timed(self, handler):
+        """
+        Wraps handler, so its calls are counted and timed
+
+        :param handler:
+            function(message)
+        :return:
+            function(message)
+        """
+        name = handler.__name__
+
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+
+            try:
+                return handler(*args, **kwargs)
+            except Exception:
+                self.errors.inc(name)
+                raise
+            finally:
+                self.updates.inc(name)
+                self.latency.observe(time.perf_counter() - start, name)
+
+        return wrapper
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Serves GET /metrics
+    """
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answers with rendered metrics
+        """
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+
+        body = self.server.registry.render().encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug(format, *args)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """
+    Http server of the metrics, it is run in a daemon thread by start()
+
+    :attr registry:
+        Registry, metrics to be served
+    """
+
+    daemon_threads = True
+
+    def __init__(self, registry, host='127.0.0.1', port=9100):
+        super().__init__((host, port), MetricsHandler)
+        self.registry = registry
+
+    def start(self):
+        """
+        Starts serving in background
+        """
+        thread = threading.Thread(target=self.serve_forever, name='MetricsServer', daemon=True)
+        thread.start()
+
+        return thread
@@ -0,0 +1,120 @@
+"""
+Module contains the Outbox class, that coalesces messages
+sent to players while one update is processed
+"""
+
+from collections import OrderedDict
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+class Outbox:
+    """
+    Buffer of outgoing messages of one game
+
+    Outbox is used as a context manager, all messages sent inside
+    the outermost 'with' block are joined and sent as a single
+    message to each recipient when the block is exited.
+    Outside of 'with' block messages are sent immediately.
+
+    Recipients receive their messages in the order of their first message,
+    keyboard of the combined message is the last one that was attached
+    (so prompts, that always go last, keep their buttons)
+
+    :attr bot:
+        Bot, that sends messages
+    :attr depth:
+        int, number of nested 'with' blocks
+    :attr messages:
+        OrderedDict of {chat_id: (list of texts, markup)}
+    :attr on_flush:
+        function, called after every flush (e.g. to refresh the table view), or None
+    """
+
+    def __init__(self, bot, on_flush=None):
+        """
+        Creates empty outbox
+
+        :param bot:
+            Bot, that sends messages
+        :param on_flush:
+            function, called after every flush
+        """
+        self.bot = bot
+        self.depth = 0
+        self.messages = OrderedDict()
+        self.on_flush = on_flush
+
+    def send(self, chat_id, text, markup=None):
+        """
+        Sends message or buffers it, if outbox is opened
+
+        :param chat_id:
+            int, id of the recipient
+        :param text:
+            str, message to be sent
+        :param markup:
+            markup with helper buttons
+        """
+        if not self.depth:
+            self.bot.send_message(chat_id, text, reply_markup=markup)
+            return
+
+        texts, last_markup = self.messages.get(chat_id, ([], None))
+        texts.append(text)
+        self.messages[chat_id] = (texts, markup if markup is not None else last_markup)
+
+    def flush(self):
+        """
+        Sends all buffered messages, one per recipient
+        (or several, if the text is longer than telegram allows)
+        """
+        messages, self.messages = self.messages, OrderedDict()
+
+        for chat_id, (texts, markup) in messages.items():
+            chunks = self.split(texts)
+
+            for chunk in chunks[:-1]:
+                self.bot.send_message(chat_id, chunk)
+
+            self.bot.send_message(chat_id, chunks[-1], reply_markup=markup)
+
+        if self.on_flush is not None:
+            self.on_flush()
+
+    @staticmethod
+    def split(texts):
+        """
+        Joins texts into as few messages as possible
+
+        :param texts:
+            list of str
+        :return:
+            list of str, each one is not longer than MAX_MESSAGE_LENGTH
+            (if the single text is not longer too)
+        """
+        chunks = []
+        current = []
+        length = 0
+
+        for text in texts:
+            if current and length + len(text) + 1 > MAX_MESSAGE_LENGTH:
+                chunks.append('\n'.join(current))
+                current, length = [], 0
+
+            current.append(text)
+            length += len(text) + 1
+
+        chunks.append('\n'.join(current))
+
+        return chunks
+
+    def __enter__(self):
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.depth -= 1
+
+        if not self.depth:
+            self.flush()
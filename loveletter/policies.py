@@ -0,0 +1,225 @@
+"""
+Module contains players policies, that make moves in the game
+without any human. Policies are used in tournaments to compare strategies.
+
+Policy gets the whole GameState (see loveletter.engine), but fair
+policy should look only at public information and the dealer's own cards
+"""
+
+import importlib
+
+from loveletter import ismcts
+from loveletter.endgame import Solver
+from loveletter.engine import SelectCard, SelectVictim, GuessCard
+from loveletter.cards import CARDS, Princess
+
+
+class Policy:
+    """
+    An abstract class that represents a strategy of the player
+
+    :static attr name:
+        str, name of the policy, used to choose it from command line
+    """
+
+    name = None
+
+    def act(self, state, rng):
+        """
+        Makes a move for the dealer of the game
+
+        :param state:
+            GameState, game in which the move is made
+        :param rng:
+            random.Random, source of randomness
+        :return:
+            action, which should be applied to the game
+        """
+        if state.state == 'select_card':
+            return SelectCard(self.select_card(state, rng))
+
+        if state.state == 'select_victim':
+            return SelectVictim(self.select_victim(state, rng))
+
+        if state.state == 'guess_card':
+            return GuessCard(self.guess_card(state, rng))
+
+        raise RuntimeError('There is no move in {} state'.format(state.state))
+
+    def select_card(self, state, rng):
+        """
+        Virtual function, that chooses one of the dealer's cards
+
+        :return:
+            str, name of the card from state.list_playable_cards()
+        """
+        raise NotImplementedError
+
+    def select_victim(self, state, rng):
+        """
+        Virtual function, that chooses a target for the dealer's card
+
+        :return:
+            str, name of the player from state.list_possible_victims()
+        """
+        raise NotImplementedError
+
+    def guess_card(self, state, rng):
+        """
+        Virtual function, that guesses the victim's card when Guard is played
+
+        :return:
+            str, name of any card but the Guard
+        """
+        raise NotImplementedError
+
+
+class RandomPolicy(Policy):
+    """
+    Policy that makes random moves
+    """
+
+    name = 'random'
+
+    def select_card(self, state, rng):
+        return rng.choice(state.list_playable_cards())
+
+    def select_victim(self, state, rng):
+        return rng.choice(state.list_possible_victims())
+
+    def guess_card(self, state, rng):
+        return rng.choice(state.card_types[:-1]).name
+
+
+class CautiousPolicy(RandomPolicy):
+    """
+    Policy that never drops the Princess, always keeps the best card,
+    does not play the Prince against itself if there is another target,
+    and guesses the card that is most frequent among the unseen ones
+    """
+
+    name = 'cautious'
+
+    def select_card(self, state, rng):
+        dealer = state.dealer
+        playable = state.list_playable_cards()
+
+        cards = [card for card in (dealer.card, dealer.new_card)
+                 if card.name in playable and not isinstance(card, Princess)]
+
+        if not cards:
+            return playable[0]
+
+        return min(cards).name
+
+    def select_victim(self, state, rng):
+        victims = state.list_possible_victims()
+
+        if len(victims) > 1 and state.dealer.name in victims:
+            victims.remove(state.dealer.name)
+
+        return rng.choice(victims)
+
+    def guess_card(self, state, rng):
+        unseen = {
+            card.name: card.num_in_deck * (2 if state.double_deck else 1)
+            for card in state.card_types[:-1]
+        }
+
+        for card in [CARDS[value] for value in state.used_cards] + [state.dealer.card]:
+            if card.name in unseen:
+                unseen[card.name] -= 1
+
+        best = max(unseen.values())
+
+        return rng.choice([name for name, count in unseen.items() if count == best])
+
+
+class ISMCTSPolicy(Policy):
+    """
+    Policy that chooses the whole move (card, victim and guess)
+    by information set Monte Carlo tree search (see loveletter.ismcts),
+    victim and guess are remembered until they are asked.
+    Near the end of the round the move is found by the exact
+    endgame solver (see loveletter.endgame)
+
+    :static attr budget:
+        float, default time to think over a move in seconds
+    """
+
+    name = 'ismcts'
+    budget = 0.2
+
+    def __init__(self, budget=None, iterations=None):
+        """
+        :param budget:
+            float, time to think over a move in seconds (class default if None)
+        :param iterations:
+            int, number of playouts per move (if given, budget is ignored)
+        """
+        self.budget = budget if budget is not None else self.budget
+        self.iterations = iterations
+        self.plan = (None, None)
+        self.solver = Solver(max_entries=1 << 15)
+
+    def select_card(self, state, rng):
+        if self.solver.applicable(state):
+            _, card, victim, guess = self.solver.solve(state, self.known_cards(state),
+                                                       state.beliefs.excluded)[0]
+
+            # positions of the next turn differ, so memory is freed between turns
+            self.solver.table.clear()
+        else:
+            card, victim, guess, _ = ismcts.search(state, self.budget, self.iterations, rng=rng,
+                                                   known=self.known_cards(state))
+
+        self.plan = (victim, guess)
+
+        return card
+
+    def select_victim(self, state, rng):
+        victims = state.list_possible_victims()
+
+        if self.plan[0] in victims:
+            return self.plan[0]
+
+        return rng.choice(victims)
+
+    def guess_card(self, state, rng):
+        if self.plan[1] is not None:
+            return self.plan[1]
+
+        return rng.choice(state.card_types[:-1]).name
+
+    def known_cards(self, state):  # pylint: disable=no-self-use
+        """
+        Returns cards of other players, which the dealer knows
+
+        :return:
+            dict of {user_id: card value} or None
+        """
+        return state.beliefs.known_cards(state.dealer)
+
+
+POLICIES = {policy.name: policy for policy in (RandomPolicy, CautiousPolicy, ISMCTSPolicy)}
+
+
+def load_policy(spec):
+    """
+    Creates a policy by its name or by path to the class
+
+    :param spec:
+        str, name of the builtin policy (see POLICIES)
+        or 'module:Class' path to the custom Policy subclass
+    :return:
+        Policy
+    """
+    if spec in POLICIES:
+        return POLICIES[spec]()
+
+    if ':' not in spec:
+        raise ValueError('Unknown policy {}, use one of {} or module:Class'.format(
+            spec, ', '.join(POLICIES)))
+
+    module_name, class_name = spec.split(':', 1)
+    return getattr(importlib.import_module(module_name), class_name)()
@@ -0,0 +1,347 @@
+"""
+Module contains the asynchronous send queue, that delivers messages
+to telegram in background threads, so game logic never waits for network.
+
+Telegram allows about one message per second in one chat and about
+thirty messages per second in total, so every chat and the whole bot
+have their own token buckets. If telegram still answers with
+'429 Too Many Requests', the chat is paused for the given retry_after.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """
+    Classic token bucket rate limiter
+
+    :attr rate:
+        float, tokens added per second
+    :attr capacity:
+        float, maximal number of tokens (the allowed burst)
+    :attr tokens:
+        float, tokens available at the moment of last update
+    :attr updated:
+        float, time of the last update
+    """
+
+    def __init__(self, rate, capacity, now=0.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def delay(self, now):
+        """
+        Returns how long to wait until one token is available
+
+        :param now:
+            float, current time
+        :return:
+            float, seconds to wait (0 if token is available now)
+        """
+        self._refill(now)
+
+        if self.tokens >= 1:
+            return 0.0
+
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now):
+        """
+        Takes one token from the bucket (tokens may become negative)
+
+        :param now:
+            float, current time
+        """
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now):
+        """
+        Checks if bucket has maximal number of tokens,
+        so it is the same as a new one
+
+        :param now:
+            float, current time
+        """
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+def get_retry_after(exception):
+    """
+    Extracts retry_after from telegram's 'Too Many Requests' error
+
+    :param exception:
+        Exception raised by the send function
+    :return:
+        float, seconds to wait, or None if it is not a 429 error
+    """
+    result_json = getattr(exception, 'result_json', None)
+    result = getattr(exception, 'result', None)
+
+    if result_json is None and result is not None:
+        try:
+            result_json = result.json()
+        except ValueError:
+            return None
+
+    if not isinstance(result_json, dict) or result_json.get('error_code') != 429:
+        return None
+
+    return float(result_json.get('parameters', {}).get('retry_after', 1))
+
+
+class SendQueue:
+    """
+    Background dispatcher of outgoing messages
+
+    Messages of one chat are sent strictly in order, one at a time,
+    messages of different chats are sent concurrently by worker threads.
+    put() never blocks.
+
+    :attr pending:
+        int, number of messages that are not delivered yet
+    :attr sent:
+        int, number of delivered messages
+    :attr failed:
+        int, number of dropped messages
+    """
+
+    def __init__(self, send, workers=4, chat_rate=1.0, chat_burst=3,
+                 global_rate=30.0, global_burst=30, max_retries=5, clock=time.monotonic):
+        """
+        Creates a queue and starts worker threads
+
+        :param send:
+            function(chat_id, *args, **kwargs), blocking send function
+            (e.g. telebot.TeleBot.send_message)
+        :param workers:
+            int, number of sending threads
+        :param chat_rate:
+            float, messages per second in one chat
+        :param chat_burst:
+            int, messages that can be sent to one chat without waiting
+        :param global_rate:
+            float, messages per second in total
+        :param global_burst:
+            int, messages that can be sent without waiting in total
+        :param max_retries:
+            int, how many times message is resent after network errors
+        :param clock:
+            function, that returns current time in seconds
+        """
+        self.send = send
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.clock = clock
+
+        self.pending = 0
+        self.sent = 0
+        self.failed = 0
+
+        self._condition = threading.Condition()
+        self._queues = {}
+        self._buckets = {}
+        self._schedule = []
+        self._counter = itertools.count()
+        self._global_bucket = TokenBucket(global_rate, global_burst, clock())
+        self._stopped = False
+
+        self._workers = [
+            threading.Thread(target=self._work, name='SendQueue{}'.format(num), daemon=True)
+            for num in range(workers)
+        ]
+
+        for worker in self._workers:
+            worker.start()
+
+    def put(self, chat_id, *args, callback=None, **kwargs):
+        """
+        Adds message to the queue of the chat, returns immediately
+
+        :param chat_id:
+            int, id of the recipient
+        :param args, kwargs:
+            other arguments of the send function
+        :param callback:
+            function(delivered=bool), called by the worker,
+            when message is delivered or dropped
+        """
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError('Send queue is stopped')
+
+            queue = self._queues.get(chat_id)
+
+            if queue is None:
+                queue = self._queues[chat_id] = deque()
+                self._push(chat_id, self.clock())
+
+            queue.append([args, kwargs, 0, callback])
+            self.pending += 1
+
+            self._condition.notify()
+
+    def join(self, timeout=None):
+        """
+        Waits until all messages are delivered
+
+        :param timeout:
+            float, maximal time to wait in seconds
+        :return:
+            bool, True if queue is empty
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            while self.pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+
+                if remaining is not None and remaining <= 0:
+                    return False
+
+                self._condition.wait(remaining)
+
+        return True
+
+    def stop(self, timeout=None):
+        """
+        Delivers remaining messages and stops worker threads
+
+        :param timeout:
+            float, maximal time to wait for delivery
+        """
+        self.join(timeout)
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def _push(self, chat_id, ready_at):
+        heapq.heappush(self._schedule, (ready_at, next(self._counter), chat_id))
+
+    def _take(self):
+        """
+        Waits for the chat, which next message can be sent now,
+        takes tokens for it and returns the chat and the message.
+        The chat is not scheduled while its message is in flight.
+        Must be called under the lock.
+        """
+        while not self._stopped:
+            if not self._schedule:
+                self._condition.wait()
+                continue
+
+            ready_at, _, chat_id = self._schedule[0]
+            now = self.clock()
+
+            if ready_at > now:
+                self._condition.wait(ready_at - now)
+                continue
+
+            bucket = self._buckets.get(chat_id)
+
+            if bucket is None:
+                bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+
+            delay = max(bucket.delay(now), self._global_bucket.delay(now))
+
+            if delay > 0:
+                heapq.heapreplace(self._schedule, (now + delay, next(self._counter), chat_id))
+                continue
+
+            heapq.heappop(self._schedule)
+            bucket.consume(now)
+            self._global_bucket.consume(now)
+
+            return chat_id, self._queues[chat_id][0]
+
+        return None, None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                chat_id, message = self._take()
+
+            if chat_id is None:
+                return
+
+            args, kwargs, attempts, callback = message
+            delivered = False
+            delay = None
+
+            try:
+                self.send(chat_id, *args, **kwargs)
+                delivered = True
+            except Exception as exception:  # pylint: disable=broad-except
+                delay = get_retry_after(exception)
+
+                # network errors are retried with exponential backoff
+                if delay is None and isinstance(exception, OSError) and \
+                        attempts < self.max_retries:
+                    delay = 2 ** attempts
+
+                if delay is None:
+                    logging.error('Message to #%s is dropped: %s', chat_id, exception)
+                else:
+                    logging.warning('Message to #%s is delayed for %.1fs: %s',
+                                    chat_id, delay, exception)
+                    message[2] += 1
+
+            # callback is called before the message is finished, so join() waits for it
+            if delay is None and callback is not None:
+                try:
+                    callback(delivered=delivered)
+                except Exception:  # pylint: disable=broad-except
+                    logging.exception('Callback of the message to #%s failed', chat_id)
+
+            with self._condition:
+                if delay is not None:
+                    self._push(chat_id, self.clock() + delay)
+                else:
+                    self._finish(chat_id, delivered)
+
+                self._condition.notify_all()
+
+    def _finish(self, chat_id, delivered):
+        """
+        Removes the message from the chat's queue and schedules the next one.
+        Must be called under the lock.
+        """
+        queue = self._queues[chat_id]
+        queue.popleft()
+
+        self.pending -= 1
+
+        if delivered:
+            self.sent += 1
+        else:
+            self.failed += 1
+
+        if queue:
+            self._push(chat_id, self.clock())
+            return
+
+        del self._queues[chat_id]
+
+        # buckets of idle chats are forgotten, when they are full again
+        if len(self._buckets) > 2 * len(self._queues) + 1024:
+            now = self.clock()
+            for idle_chat_id in [idle_chat_id for idle_chat_id, bucket in self._buckets.items()
+                                 if idle_chat_id not in self._queues and bucket.is_full(now)]:
+                del self._buckets[idle_chat_id]
@@ -0,0 +1,300 @@
+"""
+Module contains the SessionRegistry class, that keeps track of
+games activity and decides which of them should leave the memory.
+
+Finished games are forgotten after a short time, abandoned ones after a long one,
+and the least recently used games are removed when there are too many of them.
+Cold games, which are still running, can be spilled to disk instead,
+they are loaded back as soon as one of their players writes to the bot.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class SessionRegistry:
+    """
+    Registry of games in memory, ordered by their last activity
+
+    :attr ttl:
+        float, seconds after which idle game is considered abandoned and evicted
+    :attr finished_ttl:
+        float, seconds after which finished game is evicted
+    :attr max_games:
+        int, maximal number of games in memory, least recently used games
+        are spilled (or evicted, if spilling is disabled) above it
+    :attr spill_path:
+        str, directory for spilled games, None to disable spilling
+    :attr spill_after:
+        float, seconds after which idle running game is spilled
+    :attr spilled:
+        dict of {key: {'game_id': int, 'users': [[user_id, name], ...]}},
+        games on disk and their players
+    :attr evicted:
+        int, number of games evicted since start
+    """
+
+    def __init__(self, ttl=24 * 60 * 60, finished_ttl=10 * 60, max_games=100000,
+                 spill_path=None, spill_after=60 * 60, sweep_interval=60,
+                 clock=time.monotonic):
+        """
+        Creates empty registry
+
+        :param sweep_interval:
+            float, how often games are checked in seconds
+        :param clock:
+            function, that returns current time in seconds
+
+        Other params are described in the class docstring
+        """
+        self.ttl = ttl
+        self.finished_ttl = finished_ttl
+        self.max_games = max_games
+        self.spill_path = spill_path
+        self.spill_after = spill_after
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+
+        self.spilled = {}
+        self.evicted = 0
+
+        self._games = OrderedDict()
+        self._by_user = {}
+        self._by_name = {}
+        self._garbage = []
+        self._lock = threading.Lock()
+        self._last_sweep = clock()
+        self._sweeping = False
+
+        if spill_path is not None:
+            os.makedirs(spill_path, exist_ok=True)
+
+    def touch(self, game):
+        """
+        Marks game as used right now
+
+        :param game:
+            Game
+        """
+        with self._lock:
+            self._games[game] = self.clock()
+            self._games.move_to_end(game)
+
+    def sweep_due(self):
+        """
+        Checks if it is time to collect idle games, returns True only once
+        for each sweep, caller must call collect() after that
+
+        :return:
+            bool
+        """
+        with self._lock:
+            if self._sweeping or self.clock() - self._last_sweep < self.sweep_interval:
+                return False
+
+            self._sweeping = True
+            return True
+
+    def collect(self, bound_games):
+        """
+        Finds games, which should leave the memory, and forgets them
+
+        :param bound_games:
+            set of Games, which have players,
+            other games are forgotten without any actions
+        :return:
+            list of tuples (game, action), action is 'evict' or 'spill'
+        """
+        result = []
+
+        with self._lock:
+            now = self.clock()
+            over = len(self._games) - self.max_games if self.max_games is not None else 0
+
+            # oldest games go first
+            for game, last_seen in list(self._games.items()):
+                idle = now - last_seen
+                action = None
+
+                if game not in bound_games:
+                    over -= 1
+                    del self._games[game]
+                    continue
+
+                if idle > self.ttl or game.state == 'game_over' and idle > self.finished_ttl:
+                    action = 'evict'
+                elif self.spill_path is not None and (idle > self.spill_after or over > 0):
+                    action = 'spill'
+                elif over > 0:
+                    action = 'evict'
+
+                if action is not None:
+                    over -= 1
+                    del self._games[game]
+                    result.append((game, action))
+
+                    if action == 'evict':
+                        self.evicted += 1
+
+            self._last_sweep = now
+            self._sweeping = False
+
+        return result
+
+    def spill(self, game, users, key=None):
+        """
+        Saves game to disk, game must be already forgotten by collect()
+
+        :param game:
+            Game to be saved
+        :param users:
+            list of Users, players who are bound to the game
+        :param key:
+            str, key of already saved game (when journal is replayed),
+            None to save the game with a new key
+        :return:
+            str, key of the spilled game
+        """
+        if key is None:
+            key = uuid.uuid4().hex
+
+            with open(self._spill_file(key), 'w', encoding='utf-8') as file:
+                json.dump(dict(game.dump(), game_id=game.game_id), file,
+                          separators=(',', ':'), ensure_ascii=False)
+
+        with self._lock:
+            self._add_spilled(key, {
+                'game_id': game.game_id,
+                'users': [[user.user_id, user.name] for user in users],
+            })
+
+        return key
+
+    def find(self, user_id=None, name=None):
+        """
+        Finds spilled game of the player
+
+        :param user_id:
+            int, id of the player
+        :param name:
+            str, name of the player
+        :return:
+            str, key of the spilled game or None
+        """
+        with self._lock:
+            if user_id is not None and user_id in self._by_user:
+                return self._by_user[user_id]
+
+            return self._by_name.get(name)
+
+    def game_id(self, key):
+        """
+        Returns id of the spilled game
+        """
+        return self.spilled[key]['game_id']
+
+    def wake(self, key, keep=False):
+        """
+        Loads spilled game from disk, caller must create the game and touch() it
+
+        :param key:
+            str, key of the spilled game
+        :param keep:
+            bool, if True, file is removed only by delete_garbage()
+            (journal may need it to be replayed)
+        :return:
+            tuple (data, users), where data is the game's dump
+            and users is a list of [user_id, name] of its players
+        """
+        with open(self._spill_file(key), encoding='utf-8') as file:
+            data = json.load(file)
+
+        with self._lock:
+            spilled = self.spilled.pop(key)
+
+            for user_id, name in spilled['users']:
+                if self._by_user.get(user_id) == key:
+                    del self._by_user[user_id]
+                if self._by_name.get(name) == key:
+                    del self._by_name[name]
+
+            if keep:
+                self._garbage.append(key)
+
+        if not keep:
+            os.remove(self._spill_file(key))
+
+        return data, spilled['users']
+
+    def take_garbage(self):
+        """
+        Returns keys of woken games, which files are kept,
+        pass them to delete_garbage(), when they are not needed anymore
+
+        :return:
+            list of str
+        """
+        with self._lock:
+            garbage, self._garbage = self._garbage, []
+            return garbage
+
+    def delete_garbage(self, keys):
+        """
+        Deletes files of woken games
+
+        :param keys:
+            list of str, result of take_garbage()
+        """
+        for key in keys:
+            if os.path.exists(self._spill_file(key)):
+                os.remove(self._spill_file(key))
+
+    def stats(self, players=None):
+        """
+        Returns numbers of games in memory, on disk and evicted ones
+
+        :param players:
+            int, number of players in memory to be added to stats
+        :return:
+            dict
+        """
+        with self._lock:
+            stats = {
+                'live': len(self._games),
+                'spilled': len(self.spilled),
+                'evicted': self.evicted,
+            }
+
+        if players is not None:
+            stats['players'] = players
+
+        return stats
+
+    def dump(self):
+        """
+        Returns index of spilled games for snapshots
+        """
+        with self._lock:
+            return dict(self.spilled)
+
+    def load(self, spilled):
+        """
+        Restores index of spilled games dumped by dump()
+        """
+        with self._lock:
+            for key, data in spilled.items():
+                self._add_spilled(key, data)
+
+    def _add_spilled(self, key, data):
+        self.spilled[key] = data
+
+        for user_id, name in data['users']:
+            self._by_user[user_id] = key
+            self._by_name[name] = key
+
+    def _spill_file(self, key):
+        return os.path.join(self.spill_path, '{}.json'.format(key))
@@ -0,0 +1,333 @@
+"""
+Module contains the sharded mode of the bot, which uses all cores
+of one machine: the ingress process receives updates (by polling
+or webhook) and passes them to worker processes, each worker runs
+its own GameBot with a shard of games.
+
+A game lives in the shard game_id % shards (game_id is user_id of its creator).
+Routes of players to their games (see GameBot.route) are kept
+in the SQLite index, which is shared by all processes: the ingress
+predicts routes of /create and /join, workers update them,
+when players join, leave, rename or are evicted, and restore them,
+when /create or /join fails. A message of a player, whose game
+is not kept by the worker, is passed back to the ingress to be routed again.
+"""
+
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+
+import telebot
+
+
+class SharedRoutes:
+    """
+    Dict-like table of routes in the SQLite index,
+    changes are visible to all processes at once
+
+    :attr table:
+        str, name of the table
+    """
+
+    def __init__(self, connection, lock, table):
+        self.connection = connection
+        self.table = table
+        self._lock = lock
+
+    def get(self, key, default=None):
+        """
+        Returns game_id of the key or default
+        """
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT game_id FROM {} WHERE key = ?'.format(self.table), (key,)).fetchone()
+
+        return default if row is None else row[0]
+
+    def __getitem__(self, key):
+        game_id = self.get(key)
+
+        if game_id is None:
+            raise KeyError(key)
+
+        return game_id
+
+    def __setitem__(self, key, game_id):
+        with self._lock:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO {} (key, game_id) VALUES (?, ?)'.format(self.table),
+                (key, game_id))
+
+    def __delitem__(self, key):
+        with self._lock:
+            self.connection.execute('DELETE FROM {} WHERE key = ?'.format(self.table), (key,))
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM {}'.format(self.table)).fetchone()[0]
+
+
+class ShardIndex:
+    """
+    Routes shared by the processes of the sharded bot,
+    every process opens the index by itself
+
+    :attr routes:
+        SharedRoutes, game_id by user_id
+    :attr name_routes:
+        SharedRoutes, game_id by username
+    """
+
+    def __init__(self, path):
+        """
+        :param path:
+            str, path of the SQLite database (created if it does not exist)
+        """
+        self.path = path
+
+        # the index is rebuilt by workers on start, so it is never synced to disk
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                          check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=OFF')
+
+        lock = threading.Lock()
+
+        for table in ('routes', 'name_routes'):
+            self.connection.execute('CREATE TABLE IF NOT EXISTS {} '
+                                    '(key PRIMARY KEY, game_id INTEGER NOT NULL)'.format(table))
+
+        self.routes = SharedRoutes(self.connection, lock, 'routes')
+        self.name_routes = SharedRoutes(self.connection, lock, 'name_routes')
+
+    def clear(self):
+        """
+        Removes all routes
+        """
+        for table in ('routes', 'name_routes'):
+            self.connection.execute('DELETE FROM {}'.format(table))
+
+    def close(self):
+        """
+        Closes the database
+        """
+        self.connection.close()
+
+
+def shard_args(args, shard):
+    """
+    Returns command line arguments of the shard's GameBot:
+    journal, spilled games and traces of every shard are kept apart
+    and metrics are served on consecutive ports
+
+    :param args:
+        argparse.Namespace, arguments of the ingress
+    :param shard:
+        int, number of the shard
+    :return:
+        argparse.Namespace
+    """
+    args = type(args)(**vars(args))
+    suffix = 'shard{}'.format(shard)
+
+    if args.journal is not None:
+        args.journal = os.path.join(args.journal, suffix)
+
+    if args.spill is not None:
+        args.spill = os.path.join(args.spill, suffix)
+
+    if args.trace is not None:
+        args.trace = '{}.{}'.format(args.trace, suffix)
+
+    if args.metrics_port is not None:
+        args.metrics_port += shard
+
+    return args
+
+
+def run_shard(token, args, shard, queue, transport=None, ingress=None):
+    """
+    Runs the shard's GameBot, until None is received from the queue
+
+    :param token:
+        str, token of the bot
+    :param args:
+        argparse.Namespace, arguments of the ingress
+    :param shard:
+        int, number of the shard
+    :param queue:
+        multiprocessing.Queue of lists of tuples (message, key, previous),
+        where message is telebot.types.Message or telebot.types.CallbackQuery
+        (see GameBot.predict)
+    :param transport:
+        class of the transport (TelegramTransport if None)
+    :param ingress:
+        multiprocessing.Queue, where messages of games of other shards are passed back
+    """
+    # bot starts the sharded mode, so it is imported only when needed
+    from loveletter.bot import create_bot  # pylint: disable=import-outside-toplevel
+
+    index = ShardIndex(args.shard_index)
+    bot = create_bot(token, shard_args(args, shard), index=index,
+                     transport=transport() if transport is not None else None,
+                     ingress=ingress.put if ingress is not None else None)
+
+    logging.info('Shard %d started, %d players restored', shard, len(bot.users))
+
+    while True:
+        messages = queue.get()
+
+        if messages is None:
+            break
+
+        bot.process_routed_messages(messages)
+
+    bot.actors.stop()
+
+    if bot.sender is not None:
+        bot.sender.stop()
+        bot.answers.stop()
+
+    if bot.journal is not None:
+        bot.journal.close()
+
+    index.close()
+
+
+class ShardedBot(telebot.TeleBot):
+    """
+    Ingress of the sharded mode, it only routes updates
+    to the worker processes, which own the games
+
+    :attr shards:
+        int, number of worker processes
+    :attr index:
+        ShardIndex, shared routes
+    :attr returned:
+        multiprocessing.Queue, where workers pass back messages of other shards
+    """
+
+    def __init__(self, token, args, shards=2, transport=None):
+        """
+        :param token:
+            str, token of the bot
+        :param args:
+            argparse.Namespace, command line arguments of GameBot
+            (shard_index is the path of the index)
+        :param shards:
+            int, number of worker processes
+        :param transport:
+            class of the workers transport (TelegramTransport if None)
+        """
+        # bot starts the sharded mode, so it is imported only when needed
+        from loveletter.bot import GameBot  # pylint: disable=import-outside-toplevel
+
+        super().__init__(token, threaded=False)
+        self.shards = shards
+        self.index = ShardIndex(args.shard_index)
+        self.routes = self.index.routes
+        self.name_routes = self.index.name_routes
+        self.routes_lock = threading.Lock()
+        self._predict = GameBot.predict
+
+        # routes are restored by workers from their journals
+        self.index.clear()
+
+        context = multiprocessing.get_context('spawn')
+        self.queues = [context.Queue() for _ in range(shards)]
+        self.returned = context.Queue()
+        self.workers = [
+            context.Process(target=run_shard, name='Shard{}'.format(shard), daemon=True,
+                            args=(token, args, shard, self.queues[shard], transport,
+                                  self.returned))
+            for shard in range(shards)
+        ]
+
+        for worker in self.workers:
+            worker.start()
+
+        self._stopped = False
+        self._returns = threading.Thread(target=self._route_returned, name='Returned',
+                                         daemon=True)
+        self._returns.start()
+
+    def process_new_messages(self, new_messages):
+        """
+        Passes messages to the shards of the games they belong to
+
+        :param new_messages:
+            list of telebot.types.Message
+        """
+        batches = {}
+
+        for message in new_messages:
+            key, previous = self.predict(message)
+            batches.setdefault(key % self.shards, []).append((message, key, previous))
+
+        for shard, routed in batches.items():
+            self.queues[shard].put(routed)
+
+    def process_new_callback_query(self, new_callback_querys):
+        """
+        Passes taps of inline buttons to the shards of the players games,
+        workers handle them together with messages
+        """
+        self.process_new_messages(new_callback_querys)
+
+    def route(self, message):
+        """
+        Predicts the game of the message, the same way as GameBot.route
+        """
+        return self.predict(message)[0]
+
+    def predict(self, message):
+        """
+        Predicts the game of the message and keeps the previous routes
+        of /create and /join, the same way as GameBot.predict
+        """
+        return self._predict(self, message)
+
+    def actor_key(self, message):
+        """
+        Returns the game of the message's author or his user_id,
+        when the game of /join can not be predicted
+        """
+        return self.routes.get(message.from_user.id, message.from_user.id)
+
+    def stop(self):
+        """
+        Lets workers finish their updates and waits for them
+        """
+        for queue in self.queues:
+            queue.put(None)
+
+        for worker in self.workers:
+            worker.join()
+
+        self._stopped = True
+        self.returned.put(None)
+        self._returns.join()
+        self.index.close()
+
+    def _route_returned(self):
+        """
+        Routes messages, which are passed back by workers, again
+        """
+        while True:
+            messages = self.returned.get()
+
+            if messages is None:
+                return
+
+            if self._stopped:
+                logging.warning('%d returned messages are dropped, shards are stopped',
+                                len(messages))
+                continue
+
+            self.process_new_messages(messages)
@@ -0,0 +1,316 @@
+"""
+Vectorized simulator, that plays a batch of games at once
+
+Every game of the batch is stored as a row of int8 numpy arrays
+(deck, hands, discards, alive and protection masks, turn pointer),
+and each card effect is applied as a masked operation over all rows,
+so millions of games can be played without creating any python objects.
+
+Cards are encoded by their values: Guard is 1, ..., Princess is 8,
+0 means no card. Players are encoded by seats, seat order is the turn order,
+seat 0 moves first.
+
+Rules are the same as in loveletter.engine.GameState,
+including tie resolution at the end of the game: the player who
+moves earlier in the next round wins.
+"""
+
+import numpy as np
+
+from loveletter.engine import GameState
+
+GUARD, PRIEST, BARON, MAID, PRINCE, KING, COUNTESS, PRINCESS = range(1, 9)
+TARGETED = np.array([False, True, True, True, False, True, True, False, False])
+
+
+def standard_deck(double_deck=False):
+    """
+    Generates a standard deck of coded cards
+
+    :param double_deck:
+        bool, if True, two sets of cards are used
+    :return:
+        np.ndarray of int8, card values
+    """
+    deck = np.repeat(
+        np.array([card.value for card in GameState.card_types], dtype=np.int8),
+        [card.num_in_deck for card in GameState.card_types]
+    )
+
+    if double_deck:
+        deck = np.concatenate([deck, deck])
+
+    return deck
+
+
+def random_policy(sim, idx, dealer, hand, new_card):
+    """
+    Policy, that plays random card against random player
+    and makes random guesses.
+
+    Any policy is a function with the same signature, it makes moves
+    for the dealers of all running games at once
+
+    :param sim:
+        BatchSimulator, simulator that asks for moves
+    :param idx:
+        np.ndarray, indices of running games
+    :param dealer:
+        np.ndarray, dealers seats in these games
+    :param hand:
+        np.ndarray, cards in the dealers hands
+    :param new_card:
+        np.ndarray, cards taken by dealers on this turn
+    :return:
+        tuple of three arrays:
+        play_new (bool, True if dealer plays the new card),
+        victim (seat of the target, ignored for not targeted cards),
+        guess (card value for the Guard)
+    """
+    rng = sim.rng
+    num_games = len(idx)
+
+    play_new = rng.random(num_games) < 0.5
+    played = np.where(play_new, new_card, hand)
+
+    targets = sim.valid_targets(idx, dealer, played)
+    victim = np.where(targets, rng.random(targets.shape), -1).argmax(axis=1)
+    guess = rng.integers(PRIEST, PRINCESS + 1, num_games, dtype=np.int8)
+
+    return play_new, victim, guess
+
+
+class BatchSimulator:
+    """
+    Class that holds a batch of games with the same number of players
+    and plays them simultaneously
+
+    :attr deck:
+        (num_games, deck_size) int8, shuffled decks, card 0 is set aside
+    :attr top:
+        (num_games,) int16, index of the next card to take from the deck
+    :attr first_card:
+        (num_games,) int8, card that was set aside (0 if it is already taken)
+    :attr hands:
+        (num_games, num_players) int8, cards in players hands
+    :attr discards:
+        (num_games, 9) int8, number of dropped cards of each value
+    :attr alive:
+        (num_games, num_players) bool, players who is still in game
+    :attr protected:
+        (num_games, num_players) bool, players protected by the Maid
+    :attr turn:
+        (num_games,) int8, seat of the current dealer
+    :attr done:
+        (num_games,) bool, finished games
+    :attr winner:
+        (num_games,) int8, seat of the winner (-1 if game is not finished)
+    """
+
+    def __init__(self, num_games, num_players, deck=None, seed=None):
+        """
+        Creates a batch of games and deals the cards
+
+        :param num_games:
+            int, number of games in batch
+        :param num_players:
+            int, number of players in each game
+        :param deck:
+            array-like of card values, deck composition
+            (standard deck if None)
+        :param seed:
+            int or np.random.SeedSequence, seed for the random generator
+        """
+        self.deck_template = standard_deck() if deck is None else np.asarray(deck, dtype=np.int8)
+
+        if num_players < 2:
+            raise ValueError('Game needs at least 2 players')
+
+        if len(self.deck_template) < num_players + 2:
+            raise ValueError('Not enough cards for {} players'.format(num_players))
+
+        self.num_games = num_games
+        self.num_players = num_players
+        self.rng = np.random.default_rng(seed)
+
+        self.reset()
+
+    def reset(self):
+        """
+        Shuffles the decks and deals the cards in all games of the batch
+        """
+        num_games, num_players = self.num_games, self.num_players
+        deck_size = len(self.deck_template)
+
+        order = np.argsort(self.rng.random((num_games, deck_size)), axis=1)
+
+        self.deck = self.deck_template[order]
+        self.top = np.full(num_games, num_players + 1, dtype=np.int16)
+        self.first_card = self.deck[:, 0].copy()
+        self.hands = self.deck[:, 1:num_players + 1].copy()
+        self.discards = np.zeros((num_games, 9), dtype=np.int8)
+        self.alive = np.ones((num_games, num_players), dtype=bool)
+        self.protected = np.zeros((num_games, num_players), dtype=bool)
+        self.turn = np.zeros(num_games, dtype=np.int8)
+        self.done = np.zeros(num_games, dtype=bool)
+        self.winner = np.full(num_games, -1, dtype=np.int8)
+
+    def valid_targets(self, idx, dealer, played):
+        """
+        Finds players, who can be targeted by played cards
+
+        :param idx:
+            np.ndarray, indices of games
+        :param dealer:
+            np.ndarray, dealers seats in these games
+        :param played:
+            np.ndarray, played cards
+        :return:
+            (len(idx), num_players) bool mask,
+            dealer can target himself only with the Prince
+        """
+        targets = self.alive[idx] & ~self.protected[idx]
+        targets[np.arange(len(idx)), dealer] = played == PRINCE
+
+        return targets
+
+    def step(self, policy=random_policy):
+        """
+        Makes one turn in every running game
+
+        :param policy:
+            function, that selects moves (see random_policy)
+        :return:
+            bool, True if some games are still running
+        """
+        idx = np.flatnonzero(~self.done)
+
+        if not idx.size:
+            return False
+
+        rows = np.arange(idx.size)
+        dealer = self.turn[idx].astype(np.intp)
+
+        self.protected[idx, dealer] = False
+
+        hand = self.hands[idx, dealer]
+        new_card = self.deck[idx, self.top[idx]]
+        self.top[idx] += 1
+
+        play_new, victim, guess = policy(self, idx, dealer, hand, new_card)
+
+        # Countess must be dropped if there is the King or the Prince in hand
+        forced_hand = (hand == COUNTESS) & ((new_card == KING) | (new_card == PRINCE))
+        forced_new = (new_card == COUNTESS) & ((hand == KING) | (hand == PRINCE))
+        play_new = (np.asarray(play_new, dtype=bool) | forced_new) & ~forced_hand
+
+        played = np.where(play_new, new_card, hand)
+        kept = np.where(play_new, hand, new_card)
+
+        self.hands[idx, dealer] = kept
+        self.discards[idx, played] += 1
+
+        targets = self.valid_targets(idx, dealer, played)
+        acting = TARGETED[played] & targets.any(axis=1)
+
+        victim = np.where(acting, np.asarray(victim, dtype=np.intp), dealer)
+
+        if not targets[rows[acting], victim[acting]].all():
+            raise ValueError('Policy selected a player who cannot be targeted')
+
+        victim_card = self.hands[idx, victim]
+        kill = np.full(idx.size, -1, dtype=np.intp)
+
+        kill[played == PRINCESS] = dealer[played == PRINCESS]
+
+        mask = played == MAID
+        self.protected[idx[mask], dealer[mask]] = True
+
+        mask = acting & (played == KING)
+        self.hands[idx[mask], dealer[mask]] = victim_card[mask]
+        self.hands[idx[mask], victim[mask]] = kept[mask]
+
+        mask = acting & (played == BARON)
+        kill = np.where(mask & (kept > victim_card), victim, kill)
+        kill = np.where(mask & (kept < victim_card), dealer, kill)
+
+        mask = acting & (played == GUARD) & (victim_card == guess) & (victim_card != GUARD)
+        kill = np.where(mask, victim, kill)
+
+        self._kill(idx, kill)
+
+        mask = acting & (played == PRINCE)
+        self.discards[idx[mask], victim_card[mask]] += 1
+        self._draw(idx[mask & (victim_card != PRINCESS)], victim[mask & (victim_card != PRINCESS)])
+
+        kill = np.where(mask & (victim_card == PRINCESS), victim, -1)
+        self.hands[idx[kill >= 0], kill[kill >= 0]] = 0
+        self._kill(idx, kill)
+
+        self._finish_turn(idx, dealer)
+
+        return True
+
+    def run(self, policy=random_policy):
+        """
+        Plays all games of the batch till the end
+
+        :param policy:
+            function, that selects moves (see random_policy)
+        :return:
+            np.ndarray, seats of the winners
+        """
+        while self.step(policy):
+            pass
+
+        return self.winner
+
+    def _draw(self, idx, seat):
+        """
+        Players take a card from the deck,
+        if it is empty, they take the card set aside at the start
+        """
+        empty = self.top[idx] >= self.deck.shape[1]
+        top = np.minimum(self.top[idx], self.deck.shape[1] - 1)
+
+        self.hands[idx, seat] = np.where(empty, self.first_card[idx], self.deck[idx, top])
+        self.first_card[idx[empty]] = 0
+        self.top[idx] += ~empty
+
+    def _kill(self, idx, kill):
+        """
+        Throws players out of the games, their cards are dropped
+
+        :param idx:
+            np.ndarray, indices of games
+        :param kill:
+            np.ndarray, seat to kill in each game or -1
+        """
+        mask = kill >= 0
+        idx, seat = idx[mask], kill[mask]
+
+        cards = self.hands[idx, seat]
+        self.discards[idx[cards > 0], cards[cards > 0]] += 1
+        self.hands[idx, seat] = 0
+        self.alive[idx, seat] = False
+
+    def _finish_turn(self, idx, dealer):
+        """
+        Finishes games with one player or without cards in deck,
+        and passes the turn to the next alive player in other games
+        """
+        num_players = self.num_players
+        rows = np.arange(idx.size)
+        alive = self.alive[idx]
+
+        over = (alive.sum(axis=1) == 1) | (self.top[idx] >= self.deck.shape[1])
+
+        # the best card wins, on tie the one who moves earlier wins
+        rank = (np.arange(num_players) - dealer[:, None] - 1) % num_players
+        score = np.where(alive, self.hands[idx].astype(np.int16) * num_players - rank, -1)
+
+        self.winner[idx[over]] = score[over].argmax(axis=1)
+        self.done[idx[over]] = True
+
+        seats = (dealer[:, None] + np.arange(1, num_players + 1)) % num_players
+        self.turn[idx] = seats[rows, alive[rows[:, None], seats].argmax(axis=1)]
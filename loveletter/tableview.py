@@ -0,0 +1,282 @@
+"""
+Module contains the table view: instead of a new message for every
+public event, each player has one pinned status message of the game
+(players, dealer, protection, cards left and the recent log),
+which is edited in place.
+
+Views are rendered by the game's actor, when its outbox is flushed,
+and edits are debounced by ViewUpdater in background: the chat gets
+only the latest text, not earlier than the delay after it was changed.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from itertools import chain
+
+from loveletter.outbox import MAX_MESSAGE_LENGTH
+from loveletter.sender import TokenBucket
+
+LOG_SIZE = 8
+
+
+class TableView:
+    """
+    Status messages of one game
+
+    :attr game:
+        Game, the game of the view
+    :attr updater:
+        ViewUpdater, that delivers texts of the view
+    :attr log:
+        deque of str or function(_) -> str, recent public messages
+    """
+
+    def __init__(self, game, updater, log_size=LOG_SIZE):
+        self.game = game
+        self.updater = updater
+        self.log = deque(maxlen=log_size)
+
+    def add(self, message):
+        """
+        Adds public message to the log
+
+        :param message:
+            str or function(_) -> str, see Game.public_message
+        """
+        self.log.append(message)
+
+    def refresh(self):
+        """
+        Renders the view for every player and passes it to the updater
+        """
+        texts = {}
+
+        for user in chain(self.game.users, self.game.users.loosers):
+            if user.policy is not None:
+                continue
+
+            if user.locale not in texts:
+                texts[user.locale] = self.render(self.game.translation(user))
+
+            self.updater.update(user.user_id, texts[user.locale], id(self))
+
+    def render(self, _):
+        """
+        Returns text of the view
+
+        :param _:
+            function(str) -> str, translation function of the player
+        :return:
+            str
+        """
+        game = self.game
+        text = _("Players remained: \n")
+
+        for user in game.users:
+            text += ' - @{} '.format(user.name)
+            if user.defence:
+                text += '^'
+            if user == game.dealer and game.state != 'game_over':
+                text += '<<'
+            text += '\n'
+
+        if game.state in ('select_card', 'select_victim', 'guess_card'):
+            if game.deck:
+                text += _("It's {} cards left.").format(len(game.deck)) + '\n'
+            else:
+                text += _("Attention! It's the last turn") + '\n'
+
+        log = [message(_) if callable(message) else message for message in self.log]
+
+        # the oldest messages are dropped, if the view is too long
+        while log and len(text) + sum(len(line) + 1 for line in log) > MAX_MESSAGE_LENGTH:
+            log.pop(0)
+
+        return '\n'.join([text] + log)
+
+
+class ViewUpdater:
+    """
+    Background sender of status messages, the first text of the view
+    is sent as a new pinned message, later texts edit it
+
+    :attr delay:
+        float, seconds between the change of the view and its edit
+    :attr sent:
+        int, number of status messages sent
+    :attr edited:
+        int, number of edits
+    :attr failed:
+        int, number of failed calls
+    """
+
+    def __init__(self, transport, delay=1.0, global_rate=20.0, clock=time.monotonic):
+        """
+        Creates updater and starts its thread
+
+        :param transport:
+            transport of the bot (see loveletter.transport)
+        :param delay:
+            float, debounce window in seconds
+        :param global_rate:
+            float, calls per second in total, the rest of telegram's limit
+            is left for usual messages
+        :param clock:
+            function, that returns current time in seconds
+        """
+        self.transport = transport
+        self.delay = delay
+        self.clock = clock
+
+        self.sent = 0
+        self.edited = 0
+        self.failed = 0
+
+        self._condition = threading.Condition()
+        # chat_id -> [view key, message_id, sent text, latest text]
+        self._views = {}
+        self._schedule = []
+        self._scheduled = set()
+        self._counter = itertools.count()
+        self._bucket = TokenBucket(global_rate, global_rate, clock())
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._work, name='ViewUpdater', daemon=True)
+        self._thread.start()
+
+    def update(self, chat_id, text, key):
+        """
+        Sets the latest text of the chat's view, returns immediately
+
+        :param chat_id:
+            int, id of the player
+        :param text:
+            str, text of the view
+        :param key:
+            hashable, key of the view, other key means another game,
+            so a new status message is sent
+        """
+        with self._condition:
+            view = self._views.get(chat_id)
+
+            if view is None or view[0] != key:
+                view = self._views[chat_id] = [key, None, None, text]
+
+            view[3] = text
+
+            if text != view[2] and chat_id not in self._scheduled:
+                self._scheduled.add(chat_id)
+                heapq.heappush(self._schedule,
+                               (self.clock() + self.delay, next(self._counter), chat_id))
+                self._condition.notify()
+
+    def forget(self, chat_id):
+        """
+        Forgets the status message of the chat
+        """
+        with self._condition:
+            self._views.pop(chat_id, None)
+
+    def flush(self, timeout=None):
+        """
+        Waits until all scheduled views are delivered
+
+        :param timeout:
+            float, maximal time to wait in seconds
+        :return:
+            bool, True if nothing is scheduled
+        """
+        with self._condition:
+            # the thread rechecks its deadlines at once, if the clock is moved
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self._scheduled, timeout)
+
+    def stop(self):
+        """
+        Delivers scheduled views and stops the thread
+        """
+        self.flush()
+
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        self._thread.join()
+
+    def _take(self):
+        """
+        Waits for the chat, which view should be delivered now.
+        Must be called under the lock.
+        """
+        while not self._stopped:
+            if not self._schedule:
+                self._condition.wait()
+                continue
+
+            ready_at, _, chat_id = self._schedule[0]
+            now = self.clock()
+            delay = max(ready_at - now, self._bucket.delay(now))
+
+            if delay > 0:
+                self._condition.wait(delay)
+                continue
+
+            heapq.heappop(self._schedule)
+            self._bucket.consume(now)
+
+            view = self._views.get(chat_id)
+            if view is None:
+                self._scheduled.discard(chat_id)
+                continue
+
+            return chat_id, view
+
+        return None, None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                chat_id, view = self._take()
+
+            if chat_id is None:
+                return
+
+            message_id, text = view[1], view[3]
+            sent = None
+
+            try:
+                if message_id is None:
+                    message = self.transport.send_message(chat_id, text)
+                    message_id = message.message_id
+                    self.transport.pin_chat_message(chat_id, message_id,
+                                                    disable_notification=True)
+                    self.sent += 1
+                else:
+                    self.transport.edit_message_text(text, chat_id, message_id)
+                    self.edited += 1
+
+                sent = text
+            except Exception as exception:  # pylint: disable=broad-except
+                logging.warning('Status message of #%s is not updated: %s', chat_id, exception)
+                self.failed += 1
+
+                # the next change of the view is sent as a new message
+                message_id = None
+
+            with self._condition:
+                self._scheduled.discard(chat_id)
+
+                if self._views.get(chat_id) is view:
+                    view[1], view[2] = message_id, sent
+
+                    # the view was changed while it was sent
+                    if sent is not None and view[3] != sent:
+                        self._scheduled.add(chat_id)
+                        heapq.heappush(self._schedule, (self.clock() + self.delay,
+                                                        next(self._counter), chat_id))
+
+                self._condition.notify_all()
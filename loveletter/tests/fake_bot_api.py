@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+class FakeBotApiHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def handle_request(self):
+        url = urlparse(self.path)
+        method = url.path.rsplit('/', 1)[-1]
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = self.rfile.read(length).decode()
+            params.update({key: values[-1] for key, values in parse_qs(body).items()})
+
+        status, response = self.server.answer(method, params)
+        data = json.dumps(response).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeBotApi(ThreadingHTTPServer):
+    """
+    Local http server, that pretends to be a telegram Bot API.
+    It records sent messages, and answers '429 Too Many Requests'
+    to first flood[chat_id] messages of the chat
+    """
+
+    daemon_threads = True
+
+    def __init__(self, flood=None, retry_after=1):
+        super().__init__(('127.0.0.1', 0), FakeBotApiHandler)
+
+        self.flood = dict(flood or {})
+        self.retry_after = retry_after
+        self.messages = []
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/bot{{0}}/{{1}}'.format(self.server_address[1])
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+    def answer(self, method, params):
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'bot', 'username': 'loveletter_gamebot'
+            }}
+
+        chat_id = int(params['chat_id'])
+
+        with self.lock:
+            if self.flood.get(chat_id):
+                self.flood[chat_id] -= 1
+                return 429, {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': 'Too Many Requests: retry after {}'.format(self.retry_after),
+                    'parameters': {'retry_after': self.retry_after},
+                }
+
+            self.messages.append((time.monotonic(), chat_id, params.get('text')))
+            message_id = len(self.messages)
+
+        return 200, {'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'text': params.get('text'),
+        }}
+
+    def texts(self, chat_id):
+        with self.lock:
+            return [text for _, message_chat_id, text in self.messages if message_chat_id == chat_id]
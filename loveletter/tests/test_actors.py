@@ -0,0 +1,98 @@
+import threading
+import time
+import unittest
+
+from telebot import types
+
+from loveletter.actors import ActorPool
+from loveletter.bot import GameBot
+
+
+class TestActors(unittest.TestCase):
+    def test_serial_per_key(self):
+        pool = ActorPool(workers=8)
+        results = {key: [] for key in range(4)}
+        running = {key: 0 for key in range(4)}
+        overlaps = []
+
+        def task(key, num):
+            running[key] += 1
+            if running[key] > 1:
+                overlaps.append(key)
+            time.sleep(0.001)
+            results[key].append(num)
+            running[key] -= 1
+
+        for num in range(50):
+            for key in range(4):
+                pool.submit(key, task, key, num)
+
+        self.assertTrue(pool.join(10))
+        pool.stop()
+
+        self.assertEqual(overlaps, [])
+        for key in range(4):
+            self.assertEqual(results[key], list(range(50)))
+
+    def test_parallel_keys(self):
+        pool = ActorPool(workers=2)
+        barrier = threading.Barrier(2, timeout=5)
+
+        pool.submit('a', barrier.wait)
+        pool.submit('b', barrier.wait)
+
+        self.assertTrue(pool.join(5))
+        self.assertFalse(barrier.broken)
+
+    def test_failed_task(self):
+        pool = ActorPool(workers=1)
+        results = []
+
+        pool.submit('a', lambda: 1 / 0)
+        pool.submit('a', results.append, 1)
+
+        self.assertTrue(pool.join(5))
+        self.assertEqual(results, [1])
+
+    def test_bot_routes(self):
+        bot = GameBot('123:fake')
+        bot.send_message = lambda chat_id, text, **kwargs: None
+        bot.get_me = lambda: types.User(1, True, 'bot', username='loveletter_gamebot')
+
+        messages = [
+            self.new_message(10, 'alice', '/create'),
+            self.new_message(11, 'bob', '/join @alice'),
+            self.new_message(11, 'bob', '/players'),
+            self.new_message(12, 'cinderella', '/join @bob'),
+            self.new_message(10, 'alice', '/start'),
+            self.new_message(13, 'dolly', '/join @alice'),
+            self.new_message(14, 'eve', '/join @nobody'),
+        ]
+
+        self.assertEqual([bot.route(message) for message in messages],
+                         [10, 10, 10, 10, 10, 10, 14])
+
+        bot.process_new_messages(messages)
+        self.assertTrue(bot.actors.join(10))
+
+        game = bot.users[10].game
+        self.assertEqual(game.game_id, 10)
+        self.assertEqual(sorted(user.user_id for user in game.users), [10, 11, 12])
+        self.assertNotEqual(game.state, 'not_started')
+
+        # dolly's join failed, so her next message is forwarded back to her own actor
+        bot.process_new_messages([self.new_message(13, 'dolly', '/players')])
+        self.assertTrue(bot.actors.join(10))
+        self.assertEqual(bot.routes[13], 13)
+
+    @staticmethod
+    def new_message(user_id, name, text):
+        user = types.User(id=user_id, is_bot=False, first_name=name, username=name)
+        chat = types.Chat(id=user_id, type='private')
+
+        return types.Message(message_id=0, from_user=user, date=None, chat=chat,
+                             content_type='text', options={'text': text}, json_string='')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import random
+import unittest
+from collections import Counter
+
+from loveletter.cards import Guard, Priest, Baron
+from loveletter.engine import GameState, Start, SelectCard, SelectVictim, GuessCard
+from loveletter.users import User
+
+
+class TestBeliefs(unittest.TestCase):
+    def test_consistent_with_game(self):
+        rng = random.Random(179)
+
+        for _ in range(200):
+            state = GameState(rng)
+            state.double_deck = rng.random() < 0.3
+
+            for user_id in range(rng.randint(2, 8)):
+                state.users.add(User('player{}'.format(user_id), user_id, state))
+
+            state.apply(Start())
+
+            while state.state != 'game_over':
+                if state.state == 'select_card':
+                    state.apply(SelectCard(rng.choice(state.list_playable_cards())))
+                elif state.state == 'select_victim':
+                    state.apply(SelectVictim(rng.choice(state.list_possible_victims())))
+                elif state.state == 'guess_card':
+                    state.apply(GuessCard(rng.choice(state.card_types[:-1]).name))
+
+                self.check_beliefs(state)
+
+    def test_priest_and_guard(self):
+        state = GameState(random.Random(0))
+        alice, bob = User('alice', 1, state), User('bob', 2, state)
+        state.users.add(alice)
+        state.users.add(bob)
+        state.apply(Start())
+
+        dealer = state.dealer
+        victim = bob if dealer is alice else alice
+
+        self.assertEqual(state.beliefs.known_cards(dealer), {})
+
+        dealer.card, dealer.new_card, victim.card = Guard(), Priest(), Baron()
+
+        state.apply(SelectCard(Priest.name))
+        state.apply(SelectVictim(victim.name))
+
+        self.assertEqual(state.beliefs.known_cards(dealer), {victim.user_id: Baron.value})
+        self.assertEqual(state.beliefs.distribution(victim, dealer), {Baron.name: 1.0})
+        self.assertNotEqual(state.beliefs.distribution(victim), {Baron.name: 1.0})
+
+    def check_beliefs(self, state):
+        beliefs = state.beliefs
+        num_decks = 2 if state.double_deck else 1
+        unseen = Counter({card.value: card.num_in_deck * num_decks for card in state.card_types})
+        unseen.subtract(state.used_cards)
+
+        self.assertEqual(beliefs.unseen[1:], [unseen[value] for value in range(1, 9)])
+
+        for user in state.users:
+            # dealer holds two cards until his card is played
+            hand = [card for card in (user.card, user.new_card) if card is not None]
+
+            for observer_id, value in beliefs.known.get(user.user_id, {}).items():
+                if observer_id != user.user_id:
+                    self.assertIn(value, [card.value for card in hand])
+
+            excluded = beliefs.excluded.get(user.user_id, 0)
+            self.assertFalse(all(excluded >> card.value & 1 for card in hand))
+
+            for observer in state.users:
+                chances = beliefs.distribution(user, observer)
+                self.assertAlmostEqual(sum(chances.values()), 1.0)
+                self.assertTrue(any(card.name in chances for card in hand))
+
+
+if __name__ == '__main__':
+    unittest.main()
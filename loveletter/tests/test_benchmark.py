@@ -0,0 +1,26 @@
+import json
+import unittest
+
+from loveletter.benchmark import run_benchmarks, compare
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_benchmarks(self):
+        report = run_benchmarks(scale=0.01)
+        results = report['results']
+
+        self.assertEqual(set(results), {'games', 'deck', 'updates', 'memory'})
+        self.assertGreater(results['games']['games_per_second'], 0)
+        self.assertTrue({'create', 'join', 'start', 'card'} <= set(results['updates']))
+        self.assertGreater(results['memory']['bytes_per_game'], 0)
+
+        # report survives json and can be compared with itself
+        baseline = json.loads(json.dumps(report))
+        changes = compare(report, baseline)
+
+        self.assertIn('games.games_per_second', [path for path, *_ in changes])
+        self.assertTrue(all(change == 0 for *_, change in changes))
+
+
+if __name__ == '__main__':
+    unittest.main()
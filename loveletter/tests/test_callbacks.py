@@ -0,0 +1,111 @@
+import unittest
+
+from loveletter.bot import GameBot
+from loveletter.cards import Guard
+from loveletter.markups import CARD, GUESS, REMOVE_KEYBOARD, VICTIM
+from loveletter.transport import FakeTransport, callback_query, text_message
+
+
+class TestCallbacks(unittest.TestCase):
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.bot = GameBot('123:fake', transport=self.transport)
+
+        self.transport.deliver([text_message(10, 'alice', '/create')])
+        self.transport.deliver([text_message(11, 'bob', '/join @alice'),
+                                text_message(10, 'alice', '/start')])
+
+        self.game = self.bot.users[10].game
+
+    def tearDown(self):
+        self.bot.actors.stop()
+
+    def tap(self, data, query_id='1'):
+        dealer = self.game.dealer
+        self.transport.deliver([callback_query(dealer.user_id, dealer.name, data, query_id)])
+
+        return self.transport.answers[-1]
+
+    def play_turn(self):
+        """
+        Plays the dealer's first card by buttons, returns callback_data of the card
+        """
+        dealer = self.game.dealer
+        card = next(card for card in (dealer.card, dealer.new_card)
+                    if card.name in self.game.list_playable_cards())
+        data = self.game.move(CARD, card.value)
+
+        self.assertEqual(self.tap(data), ('1', None))
+
+        if self.game.state == 'select_victim':
+            self.tap(self.game.move(VICTIM, 0))
+
+        if self.game.state == 'guess_card':
+            self.tap(self.game.move(GUESS, 8))
+
+        return data
+
+    def test_buttons(self):
+        markup = [kwargs.get('reply_markup') for chat_id, _, kwargs in self.transport.calls
+                  if chat_id == self.game.dealer.user_id][-1]
+        self.assertIn('"callback_data": "10:{}:c'.format(self.game.turn), markup)
+
+        records = []
+        self.bot.record = lambda *record: records.append(record)
+        dealer, turn = self.game.dealer, self.game.turn
+
+        self.play_turn()
+
+        self.assertEqual(records[0][:2], ('card', dealer.user_id))
+        self.assertTrue(self.game.turn == turn + 1 or self.game.state == 'game_over')
+
+    def test_no_reply_keyboards(self):
+        other = 10 if self.game.dealer.user_id == 11 else 11
+        calls = len(self.transport.calls)
+        self.play_turn()
+
+        # old reply keyboards are cleared only at the start of the round
+        markups = [kwargs.get('reply_markup') for _, _, kwargs in self.transport.calls]
+        self.assertIn(REMOVE_KEYBOARD, markups[:calls])
+        self.assertNotIn(REMOVE_KEYBOARD, markups[calls:])
+        self.assertTrue(any(chat_id == other for chat_id, _, _ in self.transport.calls[calls:]))
+
+    def test_text_guess(self):
+        dealer = self.game.dealer
+        victim = next(user for user in self.game.users if user != dealer)
+        dealer.new_card = victim.card = Guard()
+
+        for text in (Guard.name, victim.name, Guard.name):
+            self.transport.deliver([text_message(dealer.user_id, dealer.name, text)])
+
+        # the Guard can not be guessed, so the text is passed to the chat
+        self.assertEqual(self.game.state, 'guess_card')
+        self.assertIn(victim, self.game.users)
+        self.assertEqual(self.transport.texts(victim.user_id)[-1],
+                         '@{}: {}'.format(dealer.name, Guard.name))
+
+    def test_outdated(self):
+        dealer = self.game.dealer
+        data = self.play_turn()
+
+        if self.game.state == 'game_over':
+            return
+
+        state, turn, used_cards = self.game.state, self.game.turn, bytes(self.game.used_cards)
+        other = self.bot.users[10 if self.game.dealer.user_id == 11 else 11]
+        taps = [
+            # the same tap again, taps of another game and garbage
+            (dealer, data), (dealer, '99:{}:c1'.format(turn)), (dealer, 'garbage'),
+            # the current move, but it is not his turn
+            (other, self.game.move(CARD, self.game.dealer.card.value)),
+        ]
+
+        for user, stale in taps:
+            self.transport.deliver([callback_query(user.user_id, user.name, stale, '2')])
+            self.assertEqual(self.transport.answers[-1], ('2', 'This button is outdated'))
+
+        self.assertEqual((self.game.state, self.game.turn, bytes(self.game.used_cards)),
+                         (state, turn, used_cards))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from loveletter.cards import Guard, Maid, Princess
+from loveletter.endgame import Solver
+from loveletter.engine import GameState, Start, SelectCard, SelectVictim, GuessCard
+from loveletter.users import User
+
+
+class TestEndgame(unittest.TestCase):
+    def test_known_card(self):
+        state = self.setup_state(random.Random(0), 2, deck_size=3)
+        dealer = state.dealer
+        opponent = [user for user in state.users if user is not dealer][0]
+
+        dealer.card, dealer.new_card = Guard(), Maid()
+        moves = Solver().solve(state, {opponent.user_id: Princess.value})
+
+        self.assertEqual(moves[0], (1.0, Guard.name, opponent.name, Princess.name))
+        self.assertLess(moves[-1][0], 1.0)
+
+    def test_bounded_table(self):
+        rng = random.Random(179)
+        large = Solver()
+
+        for _ in range(20):
+            state = self.setup_state(rng, rng.randint(2, 4), deck_size=2)
+            small = Solver(max_entries=50)
+            large.table.clear()
+
+            moves = small.solve(state)
+
+            self.assertEqual(moves, large.solve(state))
+            self.assertLessEqual(len(small.table), 50)
+            self.assertTrue(all(0 <= chance <= 1 for chance, *_ in moves))
+            self.assertIn(moves[0][1], state.list_playable_cards())
+
+        # different orders of cards lead to the same positions
+        self.assertGreater(large.table.hits, 0)
+
+    def test_play_endgames(self):
+        rng = random.Random(0)
+        solver = Solver()
+
+        for _ in range(20):
+            state = self.setup_state(rng, rng.randint(2, 4))
+
+            while state.state != 'game_over':
+                if state.state == 'select_card':
+                    if solver.applicable(state):
+                        _, card, victim, guess = solver.solve(state)[0]
+                    else:
+                        card = rng.choice(state.list_playable_cards())
+
+                    state.apply(SelectCard(card))
+                elif state.state == 'select_victim':
+                    victims = state.list_possible_victims()
+                    state.apply(SelectVictim(victim if victim in victims else victims[0]))
+                elif state.state == 'guess_card':
+                    state.apply(GuessCard(guess or Princess.name))
+
+                victim = guess = None
+
+    @staticmethod
+    def setup_state(rng, num_players, deck_size=None):
+        state = GameState(rng)
+
+        for user_id in range(num_players):
+            state.users.add(User('player{}'.format(user_id), user_id, state))
+
+        state.apply(Start())
+
+        # the rest of the deck is dropped, as if it was played
+        while deck_size is not None and len(state.deck) > deck_size:
+            state.used_cards.append(state.deck.pop())
+
+        return state
+
+
+if __name__ == '__main__':
+    unittest.main()
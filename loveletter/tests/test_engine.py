@@ -0,0 +1,161 @@
+import random
+import subprocess
+import sys
+import unittest
+from collections import Counter
+
+from loveletter.cards import CARDS, Guard, Countess, King, Prince
+from loveletter.engine import (
+    GameState,
+    Start,
+    Restart,
+    SelectCard,
+    SelectVictim,
+    GuessCard,
+)
+from loveletter.events import (
+    CardRequested,
+    CountessForced,
+    VictimRequested,
+    GuessRequested,
+    PlayerKilled,
+    GameOver,
+)
+from loveletter.users import User
+
+
+class TestEngine(unittest.TestCase):
+    def test_no_telebot(self):
+        code = "import sys, loveletter.engine; sys.exit('telebot' in sys.modules)"
+        self.assertEqual(subprocess.call([sys.executable, '-c', code]), 0)
+
+    def test_play_random_games(self):
+        rng = random.Random(179)
+
+        for _ in range(200):
+            state = self.setup_state(rng, rng.randint(2, 8))
+            self.play_random_game(state, rng)
+
+            self.assertEqual(state.state, 'game_over')
+            self.assertTrue(len(state.users) == 1 or not state.deck)
+
+    def test_restart(self):
+        rng = random.Random(0)
+        state = self.setup_state(rng, 4)
+
+        self.play_random_game(state, rng)
+        events = state.apply(Restart())
+
+        self.assertEqual(state.state, 'select_card')
+        self.assertFalse(state.users.loosers)
+        self.assertEqual(len(state.users), 4)
+        self.assertIsInstance(events[-1], CardRequested)
+
+    def test_shared_cards(self):
+        state = self.setup_state(random.Random(0), 4)
+
+        self.assertIs(Guard(), CARDS[Guard.value])
+        self.assertIsInstance(state.deck, bytearray)
+        self.assertEqual(len(state.deck) + len(state.users) + 2, 16)
+
+        with self.assertRaises(AttributeError):
+            Guard().owner = state.dealer
+
+        with self.assertRaises(AttributeError):
+            state.dealer.score = 1
+
+        self.play_random_game(state, random.Random(0))
+        hands = [user.card.value for user in state.users]
+
+        missing = Counter(state.generate_deck())
+        missing.subtract(state.used_cards + state.deck + bytes(hands))
+
+        # the first card is missing, unless it was taken by the Prince
+        self.assertIn(+missing, (Counter(), Counter([state.first_card])))
+
+    def test_wrong_state(self):
+        state = self.setup_state(random.Random(0), 2)
+
+        with self.assertRaises(RuntimeError):
+            state.apply(Start())
+
+        with self.assertRaises(RuntimeError):
+            state.apply(GuessCard('Princess'))
+
+    def test_countess_forced(self):
+        state = self.setup_state(random.Random(0), 2)
+
+        state.dealer.card = Countess()
+        state.dealer.new_card = King()
+
+        events = state.apply(SelectCard(King.name))
+
+        self.assertEqual(state.list_playable_cards(), [Countess.name])
+        self.assertEqual(events, [CountessForced(state.dealer)])
+        self.assertEqual(state.state, 'select_card')
+
+    def test_guard(self):
+        state = self.setup_state(random.Random(0), 2)
+        dealer = state.dealer
+        victim = [user for user in state.users if user != dealer][0]
+
+        state.deck.extend(state.generate_deck())
+        dealer.new_card = Guard()
+        victim.card = Prince()
+
+        events = state.apply(SelectCard(Guard.name))
+        self.assertIsInstance(events[0], VictimRequested)
+
+        events = state.apply(SelectVictim(victim.name))
+        self.assertIsInstance(events[0], GuessRequested)
+
+        events = state.apply(GuessCard(Prince.name))
+        self.assertTrue(events[0].hit)
+        self.assertIn(PlayerKilled(victim), events)
+        self.assertIsInstance(events[-1], GameOver)
+        self.assertEqual(events[-1].winner, dealer)
+
+    def test_wrong_guess(self):
+        state = self.setup_state(random.Random(0), 2)
+        dealer = state.dealer
+        victim = [user for user in state.users if user != dealer][0]
+
+        dealer.new_card = Guard()
+        victim.card = Guard()
+        state.apply(SelectCard(Guard.name))
+        state.apply(SelectVictim(victim.name))
+
+        # the Guard can not be guessed, as well as anything else but cards
+        self.assertNotIn(Guard.name, state.list_possible_guesses())
+        for guess in (Guard.name, 'Joker'):
+            with self.assertRaises(ValueError):
+                state.apply(GuessCard(guess))
+
+        self.assertEqual(state.state, 'guess_card')
+
+    @staticmethod
+    def setup_state(rng, num_players):
+        state = GameState(rng)
+
+        for user_id in range(num_players):
+            state.users.add(User('player{}'.format(user_id), user_id, state))
+
+        state.apply(Start())
+
+        return state
+
+    @staticmethod
+    def play_random_game(state, rng):
+        while state.state != 'game_over':
+            if state.state == 'select_card':
+                state.apply(SelectCard(rng.choice(state.list_playable_cards())))
+            elif state.state == 'select_victim':
+                state.apply(SelectVictim(rng.choice(state.list_possible_victims())))
+            elif state.state == 'guess_card':
+                state.apply(GuessCard(rng.choice(state.card_types[:-1]).name))
+
+        return state
+
+
+if __name__ == '__main__':
+    unittest.main()
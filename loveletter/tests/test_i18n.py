@@ -0,0 +1,44 @@
+import unittest
+
+from loveletter.game import Game
+from loveletter.i18n import translator
+from loveletter.users import User
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, reply_markup=None):
+        self.sent.append((chat_id, text))
+
+
+class TestI18n(unittest.TestCase):
+    def test_translator(self):
+        self.assertEqual(translator.resolve('ru'), 'ru_RU')
+        self.assertEqual(translator.resolve('en-US'), 'en')
+        self.assertEqual(translator.resolve('xx'), translator.default)
+
+        guard = translator.gettext('ru_RU')('Guard')
+
+        self.assertNotEqual(guard, 'Guard')
+        self.assertEqual(translator.parse('ru_RU', guard), 'Guard')
+        self.assertEqual(translator.parse('ru_RU', 'alice'), 'alice')
+
+    def test_public_message(self):
+        bot = FakeBot()
+        game = Game(bot)
+        game.users.add(User('alice', 1, game, 'en'))
+        game.users.add(User('bob', 2, game, 'ru_RU'))
+
+        game.public_message(lambda _: _("@{}'s turn").format('alice'))
+
+        self.assertEqual(bot.sent, [
+            (1, translator.gettext('en')("@{}'s turn").format('alice')),
+            (2, translator.gettext('ru_RU')("@{}'s turn").format('alice')),
+        ])
+        self.assertNotEqual(bot.sent[0][1], bot.sent[1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
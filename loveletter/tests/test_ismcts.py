@@ -0,0 +1,153 @@
+import random
+import threading
+import unittest
+from itertools import chain
+
+from telebot import types
+
+from loveletter import ismcts
+from loveletter.bot import GameBot
+from loveletter.cards import Guard, Maid, Princess
+from loveletter.engine import GameState, Start, SelectCard, SelectVictim, GuessCard
+from loveletter.game import Game
+from loveletter.policies import ISMCTSPolicy, RandomPolicy
+from loveletter.users import User
+
+
+class TestISMCTS(unittest.TestCase):
+    def test_legal_moves(self):
+        rng = random.Random(179)
+
+        for num_players in range(2, 7):
+            state = GameState(rng)
+
+            for user_id in range(num_players):
+                state.users.add(User('player{}'.format(user_id), user_id, state))
+
+            state.apply(Start())
+
+            while state.state != 'game_over':
+                card, victim, guess, count = ismcts.search(state, iterations=50, rng=rng)
+
+                self.assertEqual(count, 50)
+                self.assertIn(card, state.list_playable_cards())
+                state.apply(SelectCard(card))
+
+                if state.state == 'select_victim':
+                    self.assertIn(victim, state.list_possible_victims())
+                    state.apply(SelectVictim(victim))
+
+                if state.state == 'guess_card':
+                    state.apply(GuessCard(guess))
+
+    def test_no_budget(self):
+        state = GameState(random.Random(0))
+
+        for user_id in range(3):
+            state.users.add(User('player{}'.format(user_id), user_id, state))
+
+        state.apply(Start())
+
+        # the move is chosen by a few playouts, even if there is no time at all
+        card, _, _, count = ismcts.search(state, budget=0, rng=random.Random(0))
+
+        self.assertGreaterEqual(count, 1)
+        self.assertIn(card, state.list_playable_cards())
+
+    def test_known_card(self):
+        state = GameState(random.Random(0))
+        alice, bob = User('alice', 1, state), User('bob', 2, state)
+        state.users.add(alice)
+        state.users.add(bob)
+        state.apply(Start())
+
+        state.dealer.card, state.dealer.new_card = Guard(), Maid()
+        opponent = bob if state.dealer is alice else alice
+
+        # the only winning move is to guess the known Princess
+        self.assertEqual(
+            ismcts.search(state, iterations=2000, rng=random.Random(0),
+                          known={opponent.user_id: Princess.value})[:3],
+            (Guard.name, opponent.name, Princess.name)
+        )
+
+    def test_ai_players(self):
+        bot = GameBot('123:fake', ai_budget=0.01)
+        sent = []
+        bot.send_message = lambda chat_id, text, **kwargs: sent.append(chat_id)
+        bot.get_me = lambda: types.User(1, True, 'bot', username='loveletter_gamebot')
+
+        for text in ('/create', '/addbot', '/addbot', '/start'):
+            bot.process_new_messages([self.new_message(10, 'alice', text)])
+            bot.actors.join(10)
+
+        game = bot.users[10].game
+        players = list(game.users) + game.users.loosers
+
+        self.assertEqual(sorted(user.name for user in players), ['alice', 'bot1', 'bot2'])
+        # the budget belongs to the bot, the class default is not changed
+        self.assertEqual({user.policy.budget for user in players if user.policy}, {0.01})
+        self.assertEqual(ISMCTSPolicy.budget, 0.2)
+        restored = Game(bot, game.game_id)
+        restored.load(game.dump())
+        self.assertEqual({user.policy.budget for user in chain(restored.users,
+                                                              restored.users.loosers)
+                          if user.policy}, {0.01})
+        self.assertTrue(game.state == 'game_over' or game.dealer.user_id == 10)
+        self.assertEqual(set(sent), {10})
+
+    def test_ai_moves_without_lock(self):
+        bot = GameBot('123:fake')
+        bot.send_message = lambda chat_id, text, **kwargs: None
+        bot.get_me = lambda: types.User(1, True, 'bot', username='loveletter_gamebot')
+        locked = []
+
+        class Probe(RandomPolicy):
+            def act(self, state, rng):
+                # e.g. snapshot is not blocked, while the AI player thinks over his move
+                thread = threading.Thread(target=self.snapshot, daemon=True)
+                thread.start()
+                thread.join(5)
+                locked.append(not thread.is_alive())
+
+                return super().act(state, rng)
+
+            @staticmethod
+            def snapshot():
+                with bot.state_lock.exclusive():
+                    pass
+
+        for text in ('/create', '/addbot', '/addbot'):
+            bot.process_new_messages([self.new_message(10, 'alice', text)])
+            bot.actors.join(10)
+
+        game = bot.users[10].game
+        for user in game.users:
+            if user.policy is not None:
+                user.policy = Probe()
+
+        bot.process_new_messages([self.new_message(10, 'alice', '/start')])
+        bot.actors.join(10)
+
+        # alice makes random moves, AI players answer by their own tasks
+        rng = random.Random(0)
+        while game.state != 'game_over' and len(locked) < 3:
+            action = RandomPolicy().act(game, rng)
+            bot.process_new_messages([self.new_message(10, 'alice', action[0])])
+            self.assertTrue(bot.actors.join(10))
+
+        self.assertTrue(locked)
+        self.assertTrue(all(locked))
+        self.assertTrue(game.state == 'game_over' or game.dealer.user_id == 10)
+
+    @staticmethod
+    def new_message(user_id, name, text):
+        user = types.User(id=user_id, is_bot=False, first_name=name, username=name)
+        chat = types.Chat(id=user_id, type='private')
+
+        return types.Message(message_id=0, from_user=user, date=None, chat=chat,
+                             content_type='text', options={'text': text}, json_string='')
+
+
+if __name__ == '__main__':
+    unittest.main()
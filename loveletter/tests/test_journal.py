@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import unittest
+
+from telebot import types
+
+from loveletter.bot import GameBot
+from loveletter.journal import Journal
+
+
+class TestJournal(unittest.TestCase):
+    def test_records(self):
+        with tempfile.TemporaryDirectory() as path:
+            journal = Journal(path)
+            journal.open()
+
+            for num in range(100):
+                journal.append(['card', num, 'Guard'])
+
+            journal.sync()
+            segment = journal.rotate()
+            journal.write_snapshot(segment, {'games': [], 'users': []})
+            journal.append(['leave', 1])
+            journal.close()
+
+            # record torn by crash
+            segment_path = os.path.join(path, 'journal.{}'.format(segment))
+            with open(segment_path, 'a', encoding='utf-8') as file:
+                file.write('["card",1,"Gu')
+
+            snapshot, records = Journal(path).load()
+
+            self.assertEqual(snapshot, {'games': [], 'users': [], 'segment': segment})
+            self.assertEqual(records, [['leave', 1]])
+            self.assertEqual(Journal(path).segments(), [segment])
+
+    def test_restore_games(self):
+        with tempfile.TemporaryDirectory() as path:
+            journal = Journal(path, snapshot_every=20)
+            bot = self.setup_bot(journal)
+
+            for first_id in (10, 20):
+                names = ['player{}'.format(first_id + num) for num in range(4)]
+                messages = [self.new_message(first_id, names[0], '/create')]
+                messages += [self.new_message(first_id + num, names[num], '/join @' + names[0])
+                             for num in range(1, 4)]
+                messages.append(self.new_message(first_id, names[0], '/start'))
+
+                bot.process_new_messages(messages)
+
+            self.assertTrue(bot.actors.join(10))
+
+            for _ in range(6):
+                for first_id in (10, 20):
+                    self.make_move(bot, bot.users[first_id].game)
+
+            bot.process_new_messages([self.new_message(23, 'player23', '/leave')])
+            self.assertTrue(bot.actors.join(10))
+
+            state = json.loads(json.dumps(bot.dump_state()))
+            self.assertTrue(os.path.exists(os.path.join(path, 'snapshot')))
+
+            journal.close()
+
+            restored = self.setup_bot(Journal(path))
+            restored.journal.close()
+
+            self.assertEqual(json.loads(json.dumps(restored.dump_state())), state)
+            self.assertEqual(restored.routes[11], 10)
+
+            game = restored.users[10].game
+            self.assertIs(restored.name2user['player11'].game, game)
+            self.assertIs(game.dealer, game.users.find_by_name(game.dealer.name))
+
+    def make_move(self, bot, game):
+        if game.state == 'game_over':
+            return
+
+        dealer = game.dealer
+        texts = {
+            'select_card': lambda: game.list_playable_cards()[0],
+            'select_victim': lambda: game.list_possible_victims()[0],
+            'guess_card': lambda: 'Princess',
+        }
+
+        bot.process_new_messages([
+            self.new_message(dealer.user_id, dealer.name, texts[game.state]())
+        ])
+        self.assertTrue(bot.actors.join(10))
+
+    @staticmethod
+    def setup_bot(journal):
+        bot = GameBot('123:fake', journal=journal)
+        bot.send_message = lambda chat_id, text, **kwargs: None
+        bot.get_me = lambda: types.User(1, True, 'bot', username='loveletter_gamebot')
+
+        return bot
+
+    @staticmethod
+    def new_message(user_id, name, text):
+        user = types.User(id=user_id, is_bot=False, first_name=name, username=name)
+        chat = types.Chat(id=user_id, type='private')
+
+        return types.Message(message_id=0, from_user=user, date=None, chat=chat,
+                             content_type='text', options={'text': text}, json_string='')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import json
+import unittest
+
+from loveletter import markups
+from loveletter.markups import (
+    CARD,
+    GUESS,
+    REMOVE_KEYBOARD,
+    decode_move,
+    encode_move,
+    inline_keyboard,
+    move_keyboard,
+)
+
+
+class TestMarkups(unittest.TestCase):
+    def test_inline_keyboard(self):
+        markup = inline_keyboard([('Guard', '1:2:c1'), ('Baron', '1:2:c3')], row_width=2)
+
+        self.assertEqual(json.loads(markup), {'inline_keyboard': [[
+            {'text': 'Guard', 'callback_data': '1:2:c1'},
+            {'text': 'Baron', 'callback_data': '1:2:c3'},
+        ]]})
+        self.assertEqual(len(json.loads(inline_keyboard([('a', '1'), ('b', '2')], 1))
+                             ['inline_keyboard']), 2)
+        self.assertEqual(json.loads(REMOVE_KEYBOARD), {'remove_keyboard': True})
+
+    def test_move_keyboard(self):
+        moves = (('Guard', GUESS, 1), ('"Baron"', GUESS, 3))
+
+        for game_id, turn in ((1, 2), (-5, 0), (123456789, 17)):
+            self.assertEqual(move_keyboard(game_id, turn, moves, row_width=1), inline_keyboard(
+                [(text, encode_move(game_id, turn, code, argument))
+                 for text, code, argument in moves], row_width=1))
+
+        # the keyboard is serialized once, other turns reuse it
+        hits = markups._keyboard_parts.cache_info().hits
+        move_keyboard(7, 8, moves, row_width=1)
+        self.assertEqual(markups._keyboard_parts.cache_info().hits, hits + 1)
+
+    def test_moves(self):
+        data = encode_move(123456789, 17, CARD, 8)
+
+        self.assertEqual(data, '123456789:17:c8')
+        self.assertEqual(decode_move(data), (123456789, 17, CARD, 8))
+        self.assertEqual(decode_move('-5:0:v1'), (-5, 0, 'v', 1))
+
+        for data in ('', 'hello', '1:2', '1:2:c', '1:x:c1', '1:2:3:c1', None):
+            self.assertIsNone(decode_move(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import threading
+import unittest
+from itertools import chain
+
+from loveletter.bot import GameBot
+from loveletter.matchmaking import Matchmaker
+from loveletter.transport import FakeTransport, text_message
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMatchmaker(unittest.TestCase):
+    def setUp(self):
+        self.tables = []
+        self.formed = threading.Event()
+        self.clock = FakeClock()
+        self.matchmaker = Matchmaker(self.on_table, timeout=60, clock=self.clock, threaded=False)
+
+    def on_table(self, tickets, ai):
+        self.tables.append(([ticket.user_id for ticket in tickets], ai))
+        self.formed.set()
+
+    def test_buckets(self):
+        self.assertEqual(self.matchmaker.enqueue(1, 'a', 'en', 3), 1)
+        self.assertEqual(self.matchmaker.enqueue(2, 'b', 'ru_RU', 3), 1)
+        self.assertEqual(self.matchmaker.enqueue(3, 'c', 'en', 2), 1)
+        self.assertEqual(self.matchmaker.enqueue(4, 'd', 'en', 3), 2)
+        self.assertEqual(self.matchmaker.enqueue(5, 'e', 'en', 3), 0)
+
+        self.assertEqual(self.tables, [([1, 4, 5], 0)])
+        self.assertEqual(len(self.matchmaker), 2)
+        self.assertNotIn(1, self.matchmaker)
+
+    def test_cancel(self):
+        self.matchmaker.enqueue(1, 'a', 'en', 2)
+        self.assertTrue(self.matchmaker.cancel(1))
+        self.assertFalse(self.matchmaker.cancel(1))
+
+        # queued again with another size
+        self.matchmaker.enqueue(2, 'b', 'en', 2)
+        self.matchmaker.enqueue(2, 'b', 'en', 3)
+        self.matchmaker.enqueue(3, 'c', 'en', 2)
+
+        self.clock.now += 60
+        self.assertEqual(self.matchmaker.advance(), 2)
+        self.assertEqual(sorted(self.tables), [([2], 2), ([3], 1)])
+        self.assertEqual(len(self.matchmaker), 0)
+
+    def test_timeout(self):
+        self.matchmaker.enqueue(1, 'a', 'en', 4)
+        self.clock.now += 10
+        self.matchmaker.enqueue(2, 'b', 'en', 4)
+
+        # the table waits for its oldest player
+        self.clock.now += 49
+        self.assertEqual(self.matchmaker.advance(), 0)
+
+        self.clock.now += 1
+        self.assertEqual(self.matchmaker.advance(), 1)
+        self.assertEqual(self.tables, [([1, 2], 2)])
+        self.assertEqual(self.matchmaker.advance(), 0)
+
+    def test_thread(self):
+        matchmaker = Matchmaker(self.on_table, timeout=0.05)
+
+        try:
+            matchmaker.enqueue(1, 'a', 'en', 3)
+            self.assertTrue(self.formed.wait(10))
+        finally:
+            matchmaker.stop()
+
+        self.assertEqual(self.tables, [([1], 2)])
+
+
+class TestQueue(unittest.TestCase):
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.clock = FakeClock()
+        self.matchmaker = Matchmaker(timeout=60, clock=self.clock, threaded=False)
+        self.bot = GameBot('123:fake', transport=self.transport, matchmaker=self.matchmaker,
+                           clock=self.clock)
+
+    def tearDown(self):
+        self.bot.actors.stop()
+
+    def wait(self, seconds):
+        self.clock.now += seconds
+        tables = self.matchmaker.advance()
+        self.bot.actors.join()
+
+        return tables
+
+    def test_full_table(self):
+        self.transport.deliver([text_message(10, 'alice', '/queue 2'),
+                                text_message(11, 'bob', '/queue 3'),
+                                text_message(12, 'carol', '/queue 2')])
+
+        game = self.bot.users[10].game
+        self.assertIs(self.bot.users[12].game, game)
+        self.assertEqual(game.state, 'select_card')
+        self.assertIn(11, self.matchmaker)
+        self.assertEqual(self.bot.route(text_message(12, 'carol', 'hi')), game.game_id)
+
+        # bob leaves the queue and nobody takes his table
+        self.transport.deliver([text_message(11, 'bob', '/leave')])
+        self.assertEqual(self.wait(60), 0)
+        self.assertNotIn(11, self.bot.users)
+
+    def test_ai_fill(self):
+        self.transport.deliver([text_message(10, 'alice', '/create'),
+                                text_message(10, 'alice', '/queue 3'),
+                                text_message(11, 'bob', '/queue 3')])
+
+        self.assertNotIn(11, self.bot.users)
+        self.assertIn('already playing', self.transport.texts(10)[-1])
+        self.assertIn('60 seconds', self.transport.texts(11)[-1])
+
+        self.assertEqual(self.wait(59), 0)
+        self.assertNotIn(11, self.bot.users)
+
+        self.assertEqual(self.wait(1), 1)
+        game = self.bot.users[11].game
+        players = chain(game.users, game.users.loosers)
+        self.assertEqual(sorted(user.name for user in players), ['bob', 'bot1', 'bot2'])
+        self.assertNotEqual(game.state, 'not_started')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from urllib.request import urlopen
+
+from loveletter.bot import GameBot
+from loveletter.metrics import Histogram, MetricsServer, Registry
+from loveletter.transport import FakeTransport, text_message
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram(self):
+        registry = Registry()
+        histogram = registry.register(Histogram('latency', 'Latency', ['kind'], buckets=(0.1, 1.0)))
+
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, 'a')
+
+        lines = registry.render().splitlines()
+
+        self.assertIn('# TYPE latency histogram', lines)
+        self.assertIn('latency_bucket{kind="a",le="0.1"} 1', lines)
+        self.assertIn('latency_bucket{kind="a",le="1.0"} 2', lines)
+        self.assertIn('latency_bucket{kind="a",le="+Inf"} 3', lines)
+        self.assertIn('latency_count{kind="a"} 3', lines)
+
+    def test_bot_metrics(self):
+        transport = FakeTransport()
+        bot = GameBot('123:fake', transport=transport)
+
+        transport.deliver([text_message(10, 'alice', '/create')])
+        transport.deliver([text_message(11, 'bob', '/join @alice')])
+
+        server = MetricsServer(bot.metrics, port=0)
+        server.start()
+
+        with urlopen('http://127.0.0.1:{}/metrics'.format(server.server_address[1])) as response:
+            lines = response.read().decode('utf-8').splitlines()
+
+        server.shutdown()
+        server.server_close()
+        bot.actors.stop()
+
+        self.assertIn('loveletter_updates_total{handler="create_game"} 1', lines)
+        self.assertIn('loveletter_handler_seconds_count{handler="join_user"} 1', lines)
+        self.assertIn('loveletter_games{state="not_started"} 1', lines)
+        self.assertIn('loveletter_players 2', lines)
+        self.assertIn('loveletter_messages_sent_total {}'.format(len(transport.calls)), lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
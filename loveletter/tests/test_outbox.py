@@ -0,0 +1,76 @@
+import random
+import unittest
+
+from loveletter.game import Game
+from loveletter.outbox import Outbox, MAX_MESSAGE_LENGTH
+from loveletter.users import User
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        self.sent.append((chat_id, text, reply_markup))
+
+
+class TestOutbox(unittest.TestCase):
+    def test_coalesce(self):
+        bot = FakeBot()
+        outbox = Outbox(bot)
+
+        with outbox:
+            outbox.send(1, 'a')
+            outbox.send(2, 'b', 'keyboard')
+            with outbox:
+                outbox.send(1, 'c', 'remove')
+            outbox.send(1, 'd')
+
+            self.assertEqual(bot.sent, [])
+
+        self.assertEqual(bot.sent, [(1, 'a\nc\nd', 'remove'), (2, 'b', 'keyboard')])
+
+    def test_send_immediately(self):
+        bot = FakeBot()
+        Outbox(bot).send(1, 'a')
+
+        self.assertEqual(bot.sent, [(1, 'a', None)])
+
+    def test_split_long_messages(self):
+        bot = FakeBot()
+        outbox = Outbox(bot)
+
+        with outbox:
+            for _ in range(5):
+                outbox.send(1, 'x' * (MAX_MESSAGE_LENGTH // 3), 'keyboard')
+
+        self.assertEqual([markup for _, _, markup in bot.sent], [None, None, 'keyboard'])
+        self.assertTrue(all(len(text) <= MAX_MESSAGE_LENGTH for _, text, _ in bot.sent))
+
+    def test_one_message_per_player_per_move(self):
+        bot = FakeBot()
+        game = Game(bot)
+        game.rng = random.Random(0)
+
+        for user_id in range(6):
+            game.users.add(User('player{}'.format(user_id), user_id, game))
+
+        game.start()
+        self.assertEqual(sorted(chat_id for chat_id, _, _ in bot.sent), list(range(6)))
+
+        while game.state != 'game_over':
+            bot.sent = []
+
+            if game.state == 'select_card':
+                game.select_card(game.rng.choice(game.list_playable_cards()))
+            elif game.state == 'select_victim':
+                game.select_victim(game.rng.choice(game.list_possible_victims()))
+            else:
+                game.guess_card(game.rng.choice(game.card_types[:-1]).name)
+
+            chat_ids = [chat_id for chat_id, _, _ in bot.sent]
+            self.assertEqual(len(chat_ids), len(set(chat_ids)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import time
+import unittest
+
+import telebot
+from telebot import apihelper, types
+
+from loveletter.bot import GameBot
+from loveletter.sender import SendQueue, TokenBucket
+from loveletter.tests.fake_bot_api import FakeBotApi
+
+
+class TestSender(unittest.TestCase):
+    def setUp(self):
+        self.api_url = apihelper.API_URL
+
+    def tearDown(self):
+        apihelper.API_URL = self.api_url
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=2, capacity=2, now=0)
+
+        for _ in range(2):
+            self.assertEqual(bucket.delay(0), 0)
+            bucket.consume(0)
+
+        self.assertAlmostEqual(bucket.delay(0), 0.5)
+        self.assertAlmostEqual(bucket.delay(0.25), 0.25)
+        self.assertEqual(bucket.delay(0.5), 0)
+        self.assertFalse(bucket.is_full(0.5))
+        self.assertTrue(bucket.is_full(10))
+
+    def test_order_and_retry_after(self):
+        with FakeBotApi(flood={1: 1}, retry_after=1) as server:
+            apihelper.API_URL = server.url
+            bot = telebot.TeleBot('123:fake')
+            queue = SendQueue(bot.send_message, workers=4, chat_rate=100, chat_burst=10,
+                              global_rate=1000, global_burst=100)
+
+            started = time.monotonic()
+
+            for num in range(10):
+                for chat_id in (1, 2, 3):
+                    queue.put(chat_id, str(num))
+
+            self.assertTrue(queue.join(10))
+            queue.stop()
+
+            for chat_id in (1, 2, 3):
+                self.assertEqual(server.texts(chat_id), [str(num) for num in range(10)])
+
+            first_delivery = min(moment for moment, chat_id, _ in server.messages if chat_id == 1)
+            self.assertGreaterEqual(first_delivery - started, 1)
+            self.assertEqual((queue.sent, queue.failed), (30, 0))
+
+    def test_chat_rate_limit(self):
+        with FakeBotApi() as server:
+            apihelper.API_URL = server.url
+            bot = telebot.TeleBot('123:fake')
+            queue = SendQueue(bot.send_message, workers=4, chat_rate=10, chat_burst=1)
+
+            started = time.monotonic()
+
+            for num in range(5):
+                queue.put(1, str(num))
+
+            self.assertTrue(queue.join(10))
+            self.assertGreaterEqual(time.monotonic() - started, 0.4)
+            self.assertEqual(server.texts(1), [str(num) for num in range(5)])
+
+    def test_dropped_on_api_error(self):
+        def send(chat_id, text):
+            raise apihelper.ApiException('Forbidden', 'sendMessage', None)
+
+        queue = SendQueue(send, workers=1)
+        queue.put(1, 'hello')
+
+        self.assertTrue(queue.join(5))
+        self.assertEqual((queue.sent, queue.failed), (0, 1))
+
+    def test_failed_callback(self):
+        sent = []
+
+        def fail(delivered):
+            raise ValueError(delivered)
+
+        queue = SendQueue(lambda chat_id, text: sent.append(text), workers=1)
+        queue.put(1, 'hello', callback=fail)
+        queue.put(1, 'world')
+
+        # the next message of the chat is sent anyway
+        self.assertTrue(queue.join(5))
+        self.assertEqual(sent, ['hello', 'world'])
+        self.assertEqual((queue.sent, queue.failed), (2, 0))
+        queue.stop()
+
+    def test_game_bot_sends_in_background(self):
+        with FakeBotApi() as server:
+            apihelper.API_URL = server.url
+            bot = GameBot('123:fake')
+
+            user = types.User(id=5, is_bot=False, first_name='alice', username='alice')
+            chat = types.Chat(id=5, type='private')
+            message = types.Message(message_id=1, from_user=user, date=None, chat=chat,
+                                    content_type='text', options={'text': '/create'},
+                                    json_string='')
+
+            bot.create_game(message)
+
+            self.assertTrue(bot.sender.join(10))
+            self.assertEqual(len(server.texts(5)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
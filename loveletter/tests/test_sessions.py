@@ -0,0 +1,128 @@
+import json
+import tempfile
+import unittest
+
+from telebot import types
+
+from loveletter.bot import GameBot
+from loveletter.sessions import SessionRegistry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeGame:
+    def __init__(self, state):
+        self.state = state
+
+
+class TestSessions(unittest.TestCase):
+    def test_collect(self):
+        clock = FakeClock()
+        registry = SessionRegistry(ttl=100, finished_ttl=10, max_games=3, clock=clock)
+
+        finished, abandoned, lobby, running, playing = (
+            FakeGame('game_over'), FakeGame('select_card'), FakeGame('not_started'),
+            FakeGame('select_card'), FakeGame('select_card'),
+        )
+
+        for game in (abandoned, finished, lobby, running):
+            registry.touch(game)
+
+        clock.now = 50
+        registry.touch(running)
+        registry.touch(playing)
+
+        # abandoned game is the least recently used one, finished game is too old
+        self.assertEqual(registry.collect({finished, abandoned, lobby, running, playing}),
+                         [(abandoned, 'evict'), (finished, 'evict')])
+
+        clock.now = 120
+        self.assertEqual(registry.collect({lobby, running, playing}),
+                         [(lobby, 'evict')])
+        self.assertEqual(registry.stats(), {'live': 2, 'spilled': 0, 'evicted': 3})
+
+    def test_bot_evicts_and_spills(self):
+        with tempfile.TemporaryDirectory() as path:
+            clock = FakeClock()
+            bot = self.setup_bot(SessionRegistry(ttl=1000, finished_ttl=10, spill_after=100,
+                                                 spill_path=path, clock=clock))
+
+            self.process(bot, [
+                self.new_message(10, 'alice', '/create'),
+                self.new_message(11, 'bob', '/join @alice'),
+                self.new_message(10, 'alice', '/start'),
+                self.new_message(20, 'cinderella', '/create'),
+            ])
+
+            game = bot.users[10].game
+            state = json.dumps(game.dump())
+
+            clock.now = 200
+            self.process(bot, [self.new_message(20, 'cinderella', '/players')])
+            bot.sweep()
+
+            # running game is moved to disk, its players are still routed to it
+            self.assertNotIn(10, bot.users)
+            self.assertNotIn('bob', bot.name2user)
+            self.assertEqual(bot.route(self.new_message(11, 'bob', '/cards')), 10)
+            self.assertEqual(bot.session_stats(),
+                             {'live': 1, 'spilled': 1, 'evicted': 0, 'players': 1})
+
+            self.process(bot, [self.new_message(11, 'bob', '/cards')])
+
+            game = bot.users[11].game
+            self.assertIs(bot.users[10].game, game)
+            self.assertEqual(json.dumps(game.dump()), state)
+
+            clock.now = 1500
+            bot.sweep()
+
+            self.assertEqual(bot.users, {})
+            self.assertEqual(bot.name2user, {})
+            self.assertEqual(bot.routes, {})
+            self.assertEqual(bot.name_routes, {})
+            self.assertEqual(bot.session_stats(),
+                             {'live': 0, 'spilled': 0, 'evicted': 2, 'players': 0})
+
+    def test_rename(self):
+        bot = self.setup_bot(SessionRegistry())
+
+        self.process(bot, [
+            self.new_message(10, 'alice', '/create'),
+            self.new_message(10, 'alisa', '/players'),
+        ])
+        self.process(bot, [self.new_message(11, 'bob', '/join @alisa')])
+
+        self.assertNotIn('alice', bot.name2user)
+        self.assertIs(bot.users[11].game, bot.users[10].game)
+
+    @staticmethod
+    def process(bot, messages):
+        bot.process_new_messages(messages)
+        bot.actors.join(10)
+
+    @staticmethod
+    def setup_bot(sessions):
+        bot = GameBot('123:fake', sessions=sessions)
+        bot.send_message = lambda chat_id, text, **kwargs: None
+        bot.get_me = lambda: types.User(1, True, 'bot', username='loveletter_gamebot')
+
+        return bot
+
+    @staticmethod
+    def new_message(user_id, name, text):
+        user = types.User(id=user_id, is_bot=False, first_name=name, username=name)
+        chat = types.Chat(id=user_id, type='private')
+
+        return types.Message(message_id=0, from_user=user, date=None, chat=chat,
+                             content_type='text', options={'text': text}, json_string='')
+
+
+if __name__ == '__main__':
+    unittest.main()
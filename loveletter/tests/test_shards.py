@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+
+from loveletter.bot import GameBot, create_parser
+from loveletter.journal import Journal
+from loveletter.shards import ShardIndex, ShardedBot
+from loveletter.transport import FakeTransport, text_message
+
+
+class TestShards(unittest.TestCase):
+    def test_index(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, 'index.sqlite')
+            first, second = ShardIndex(path), ShardIndex(path)
+
+            first.routes[10] = 10
+            first.name_routes['alice'] = 10
+            second.routes[11] = 10
+
+            self.assertEqual(second.routes[10], 10)
+            self.assertIn('alice', second.name_routes)
+            self.assertEqual(first.routes.get(11), 10)
+            self.assertIsNone(first.routes.get(12))
+
+            del second.routes[10]
+            self.assertNotIn(10, first.routes)
+            self.assertEqual(len(first.routes), 1)
+
+            first.close()
+            second.close()
+
+    def test_sharded_bot(self):
+        with tempfile.TemporaryDirectory() as path:
+            args = create_parser().parse_args(['--journal', path, '--shards', '2',
+                                               '--shard-index', os.path.join(path, 'index')])
+            bot = ShardedBot('123:fake', args, args.shards, transport=FakeTransport)
+
+            # games of alice (10) and carol (13) are in different shards
+            bot.process_new_messages([text_message(10, 'alice', '/create'),
+                                      text_message(13, 'carol', '/create')])
+            bot.process_new_messages([text_message(11, 'bob', '/join @alice'),
+                                      text_message(14, 'dave', '/join @carol'),
+                                      text_message(15, 'eve', '/join @carol')])
+            bot.process_new_messages([text_message(10, 'alice', '/start')])
+
+            self.assertEqual(bot.route(text_message(15, 'eve', 'Guard')), 13)
+            bot.stop()
+
+            games = []
+            for shard in range(2):
+                journal = Journal(os.path.join(path, 'shard{}'.format(shard)))
+                restored = GameBot('123:fake', transport=FakeTransport(), journal=journal)
+                restored.actors.stop()
+                journal.close()
+
+                games.append({user_id: user.game for user_id, user in restored.users.items()})
+
+        self.assertEqual(sorted(games[0]), [10, 11])
+        self.assertEqual(games[0][10].state, 'select_card')
+        self.assertEqual(sorted(games[1]), [13, 14, 15])
+        self.assertEqual(len(games[1][15].users), 3)
+
+    def test_failed_join(self):
+        with tempfile.TemporaryDirectory() as path:
+            index = ShardIndex(os.path.join(path, 'index'))
+            returned = []
+            transports = [FakeTransport(), FakeTransport()]
+            shards = [GameBot('123:fake', transport=transport, index=index,
+                              ingress=returned.extend) for transport in transports]
+
+            # alice's started game is in the shard 0, carol's game is in the shard 1
+            transports[0].deliver([text_message(10, 'alice', '/create'),
+                                   text_message(11, 'bob', '/join @alice'),
+                                   text_message(10, 'alice', '/start')])
+            transports[1].deliver([text_message(13, 'carol', '/create')])
+
+            # the ingress predicts, that carol goes to alice's game
+            message = text_message(13, 'carol', '/join @alice')
+            key, previous = shards[0].predict(message)
+            self.assertEqual((key, previous), (10, (13, 13)))
+
+            shards[0].process_routed_messages([(message, key, previous)])
+            shards[0].actors.join()
+
+            # the shard 0 restores the routes, so carol's messages go to her game again
+            self.assertEqual(index.routes[13], 13)
+            self.assertEqual(index.name_routes['carol'], 13)
+            self.assertEqual(shards[0].route(text_message(13, 'carol', '/start')), 13)
+            self.assertEqual(returned, [])
+
+            for bot in shards:
+                bot.actors.stop()
+            index.close()
+
+    def test_returned(self):
+        returned = []
+        transport = FakeTransport()
+        bot = GameBot('123:fake', transport=transport, ingress=returned.extend)
+        transport.deliver([text_message(10, 'alice', '/create')])
+
+        # the ingress routes carol to alice's game, but carol's game is in another shard
+        bot.routes[13] = 10
+        message = text_message(13, 'carol', '/players')
+        transport.deliver([message])
+
+        self.assertEqual(returned, [message])
+        self.assertNotIn(13, bot.routes)
+        self.assertEqual(transport.texts(13), [])
+
+        # a failed /join in this shard restores the routes, the player stays in his game
+        bot.routes[13] = 13
+        bot.name_routes['carol'] = 13
+        transport.deliver([text_message(11, 'bob', '/join @alice'),
+                           text_message(10, 'alice', '/start'),
+                           text_message(13, 'carol', '/join @alice')])
+
+        self.assertEqual(bot.routes[13], 13)
+        self.assertEqual(bot.name_routes['carol'], 13)
+        self.assertEqual(len(returned), 1)
+        bot.actors.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
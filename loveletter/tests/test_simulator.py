@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+
+from loveletter.simulator import (
+    BatchSimulator,
+    standard_deck,
+    random_policy,
+    PRINCE,
+    PRINCESS,
+    COUNTESS,
+    KING,
+)
+
+
+class TestSimulator(unittest.TestCase):
+    def test_standard_deck(self):
+        deck = standard_deck()
+
+        self.assertEqual(len(deck), 16)
+        self.assertEqual(deck.dtype, np.int8)
+        self.assertEqual(np.bincount(deck).tolist(), [0, 5, 2, 2, 2, 2, 1, 1, 1])
+        self.assertEqual(len(standard_deck(double_deck=True)), 32)
+
+    def test_run_batch(self):
+        for num_players in range(2, 6):
+            sim = BatchSimulator(2000, num_players, seed=num_players)
+            winner = sim.run()
+
+            self.assertTrue(sim.done.all())
+            self.assertTrue(((winner >= 0) & (winner < num_players)).all())
+            self.assertTrue(sim.alive[np.arange(sim.num_games), winner].all())
+            self.check_cards_conservation(sim)
+
+    def test_double_deck(self):
+        sim = BatchSimulator(1000, 8, deck=standard_deck(double_deck=True), seed=0)
+        sim.run()
+
+        self.assertTrue(sim.done.all())
+        self.check_cards_conservation(sim)
+
+    def test_countess_rule(self):
+        def keep_countess(sim, idx, dealer, hand, new_card):
+            play_new, victim, guess = random_policy(sim, idx, dealer, hand, new_card)
+            play_new = np.where(hand == COUNTESS, True, play_new)
+            play_new = np.where(new_card == COUNTESS, False, play_new)
+            return play_new, victim, guess
+
+        sim = BatchSimulator(1, 2, deck=[1, COUNTESS, PRINCESS, KING, 1, 1], seed=0)
+        sim.deck[0] = [1, COUNTESS, PRINCESS, KING, 1, 1]
+        sim.hands[0] = [COUNTESS, PRINCESS]
+        sim.step(keep_countess)
+
+        self.assertEqual(sim.discards[0, COUNTESS], 1)
+        self.assertEqual(sim.hands[0, 0], KING)
+
+    def test_prince_on_princess(self):
+        def prince_on_next(sim, idx, dealer, hand, new_card):
+            return new_card == PRINCE, (dealer + 1) % sim.num_players, np.zeros_like(hand)
+
+        sim = BatchSimulator(1, 2, deck=[1, 1, PRINCESS, PRINCE, 1, 1], seed=0)
+        sim.deck[0] = [1, 1, PRINCESS, PRINCE, 1, 1]
+        sim.hands[0] = [1, PRINCESS]
+        sim.step(prince_on_next)
+
+        self.assertTrue(sim.done[0])
+        self.assertEqual(sim.winner[0], 0)
+        self.assertEqual(sim.discards[0, PRINCESS], 1)
+
+    @staticmethod
+    def check_cards_conservation(sim):
+        deck_size = sim.deck.shape[1]
+        total = (sim.discards.sum(axis=1) + (sim.hands > 0).sum(axis=1) +
+                 deck_size - sim.top + (sim.first_card > 0))
+
+        assert (total == deck_size).all()
+
+
+if __name__ == '__main__':
+    unittest.main()
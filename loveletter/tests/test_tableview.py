@@ -0,0 +1,112 @@
+import random
+import unittest
+
+from loveletter.bot import GameBot
+from loveletter.i18n import translator
+from loveletter.tableview import ViewUpdater
+from loveletter.transport import FakeTransport, text_message
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTableView(unittest.TestCase):
+    def test_debounce(self):
+        transport = FakeTransport()
+        clock = FakeClock()
+        updater = ViewUpdater(transport, delay=1.0, clock=clock)
+
+        for num in range(10):
+            updater.update(10, 'view {}'.format(num), 'game')
+        self.assertFalse(updater.flush(timeout=0.1))
+
+        clock.now = 1.0
+        updater.flush()
+
+        updater.update(10, 'view 10', 'game')
+        updater.update(10, 'view 11', 'game')
+        updater.update(10, 'view 11', 'game')
+        clock.now = 2.0
+        updater.flush()
+
+        # other game gets a new status message
+        updater.update(10, 'next game', 'other')
+        clock.now = 3.0
+        updater.stop()
+
+        self.assertEqual(transport.texts(10), ['view 9', 'next game'])
+        self.assertEqual(transport.edits, [(10, 1, 'view 11')])
+        self.assertEqual(transport.pinned, {10: 2})
+
+    def test_game(self):
+        calls = {}
+
+        for view_delay in (None, 1.0):
+            # the same deck in both games
+            random.seed(0)
+            transport = FakeTransport()
+            clock = FakeClock()
+            bot = GameBot('123:fake', transport=transport, view_delay=view_delay, clock=clock)
+            moves = self.play_game(transport, bot, random.Random(0), clock)
+
+            if bot.views is not None:
+                bot.views.stop()
+
+            calls[view_delay] = len(transport.calls) + len(transport.edits)
+
+        self.assertLess(calls[1.0], calls[None] * 0.8)
+        self.assertEqual(set(transport.pinned), {10, 11, 12, 13, 14})
+
+        # a status message is edited at most once per second
+        self.assertLessEqual(len(transport.edits), 5 * (moves // 4 + 1))
+
+        views = [text for text in transport.texts(10) if 'Players remained' in text]
+        views += [text for chat_id, _, text in transport.edits if chat_id == 10]
+
+        self.assertIn('Game is over', views[-1])
+
+    @staticmethod
+    def play_game(transport, bot, rng, clock):
+        transport.deliver([text_message(10, 'alice', '/create')])
+        transport.deliver([text_message(11, 'bob', '/join @alice'),
+                           text_message(12, 'carol', '/join @alice'),
+                           text_message(13, 'dave', '/join @alice'),
+                           text_message(14, 'eve', '/join @alice'),
+                           text_message(10, 'alice', '/start')])
+
+        game = bot.users[10].game
+        moves = 0
+
+        while game.state != 'game_over':
+            dealer = game.dealer
+            _ = translator.gettext(dealer.locale)
+
+            if game.state == 'select_card':
+                text = _(rng.choice(game.list_playable_cards()))
+            elif game.state == 'select_victim':
+                text = rng.choice(game.list_possible_victims())
+            else:
+                text = _(rng.choice(game.card_types[:-1]).name)
+
+            transport.deliver([text_message(dealer.user_id, dealer.name, text)])
+
+            moves += 1
+
+            # players make 4 moves per second, the views are debounced by a second
+            if bot.views is not None and moves % 4 == 0:
+                clock.now += 1.0
+                bot.views.flush()
+
+        clock.now += 1.0
+        bot.actors.stop()
+
+        return moves
+
+
+if __name__ == '__main__':
+    unittest.main()
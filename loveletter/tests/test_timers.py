@@ -0,0 +1,133 @@
+import math
+import random
+import threading
+import unittest
+
+from loveletter.bot import GameBot, create_parser
+from loveletter.timers import TimerWheel
+from loveletter.transport import FakeTransport, text_message
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimerWheel(unittest.TestCase):
+    def test_deadlines(self):
+        clock = FakeClock()
+        wheel = TimerWheel(tick=1.0, slots=4, levels=3, clock=clock, threaded=False)
+        rng = random.Random(0)
+        fired = {}
+
+        # delays longer than the wheels cover (4 ** 3 ticks) go around the top wheel
+        delays = [rng.uniform(0, 200) for _ in range(1000)]
+        timers = [wheel.schedule(delay, lambda num: fired.__setitem__(num, clock.now), num)
+                  for num, delay in enumerate(delays)]
+
+        cancelled = set(rng.sample(range(len(timers)), 100))
+        for num in cancelled:
+            self.assertTrue(wheel.cancel(timers[num]))
+        self.assertEqual(len(wheel), 900)
+
+        # the wheel is moved by hand
+        while len(wheel):
+            clock.now += 1
+            wheel.advance()
+
+        self.assertEqual(set(fired), set(range(len(timers))) - cancelled)
+        for num, expires in fired.items():
+            self.assertEqual(expires, math.ceil(delays[num]))
+        self.assertEqual(wheel.fired, 900)
+        self.assertFalse(wheel.cancel(timers[0]))
+
+    def test_thread(self):
+        wheel = TimerWheel(tick=0.01)
+        fired = []
+        done = threading.Event()
+
+        wheel.schedule(0.05, lambda: (fired.append('late'), done.set()))
+        wheel.schedule(0.02, fired.append, 'early')
+        wheel.cancel(wheel.schedule(0.03, fired.append, 'cancelled'))
+
+        # ticks go in order, so the cancelled timer would be called before the late one
+        self.assertTrue(done.wait(10))
+        wheel.stop()
+
+        self.assertEqual(fired, ['early', 'late'])
+        self.assertEqual(wheel.fired, 2)
+
+
+class TestTurnTimeouts(unittest.TestCase):
+    def play(self, afk):
+        transport = FakeTransport()
+        clock = FakeClock()
+        timers = TimerWheel(clock=clock, threaded=False)
+        timeouts = {'select_card': 30, 'select_victim': 10, 'guess_card': 10}
+        bot = GameBot('123:fake', transport=transport, turn_timeouts=timeouts, afk=afk,
+                      timers=timers, clock=clock)
+
+        transport.deliver([text_message(10, 'alice', '/create')])
+        transport.deliver([text_message(11, 'bob', '/join @alice'),
+                           text_message(12, 'carol', '/join @alice'),
+                           text_message(10, 'alice', '/start')])
+
+        return bot, clock, bot.users[10].game
+
+    @staticmethod
+    def wait(bot, clock, seconds):
+        clock.now += seconds
+        bot.timers.advance()
+        bot.actors.join()
+
+    def test_auto(self):
+        bot, clock, game = self.play('auto')
+        turn = game.turn
+
+        self.wait(bot, clock, 29)
+        self.assertEqual(game.turn, turn)
+        self.assertEqual(bot.turn_timeouts_total.get('auto'), 0)
+
+        # the whole move is made at once, the next dealer gets his own deadline
+        self.wait(bot, clock, 1)
+        self.assertTrue(game.turn == turn + 1 or game.state == 'game_over')
+        self.assertEqual(bot.turn_timeouts_total.get('auto'), 1)
+
+        if game.state != 'game_over':
+            self.wait(bot, clock, 30)
+            self.assertTrue(game.turn == turn + 2 or game.state == 'game_over')
+            self.assertEqual(bot.turn_timeouts_total.get('auto'), 2)
+
+        bot.actors.stop()
+
+    def test_kick(self):
+        bot, clock, game = self.play('kick')
+
+        self.wait(bot, clock, 30)
+        self.assertEqual(len(game.users.loosers), 1)
+
+        # two players are kicked one after another
+        self.wait(bot, clock, 30)
+        self.assertEqual(game.state, 'game_over')
+        self.assertEqual(len(game.users.loosers), 2)
+        self.assertEqual(bot.turn_timeouts_total.get('kick'), 2)
+
+        bot.actors.stop()
+
+    def test_off(self):
+        # timeouts are turned off by default, so the bot never moves for players
+        args = create_parser().parse_args([])
+        bot = GameBot('123:fake', transport=FakeTransport(),
+                      turn_timeouts={'select_card': args.card_timeout,
+                                     'select_victim': args.victim_timeout,
+                                     'guess_card': args.guess_timeout})
+
+        self.assertEqual(bot.turn_timeouts, {})
+        self.assertIsNone(bot.timers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from loveletter.policies import load_policy, RandomPolicy, CautiousPolicy
+from loveletter.tournament import play_game, play_shard, run_tournament, wilson_interval
+
+
+class TestTournament(unittest.TestCase):
+    def test_load_policy(self):
+        self.assertIsInstance(load_policy('random'), RandomPolicy)
+        self.assertIsInstance(load_policy('loveletter.policies:CautiousPolicy'), CautiousPolicy)
+
+        with self.assertRaises(ValueError):
+            load_policy('unknown')
+
+    def test_play_game(self):
+        rng = random.Random(0)
+        policies = [RandomPolicy(), CautiousPolicy(), CautiousPolicy()]
+
+        for _ in range(100):
+            self.assertIn(play_game(policies, rng), range(3))
+            self.assertIn(play_game(policies, rng, double_deck=True), range(3))
+
+    def test_shard_is_reproducible(self):
+        lineup = ['random', 'cautious']
+
+        self.assertEqual(play_shard(lineup, 50, seed=7), play_shard(lineup, 50, seed=7))
+        self.assertEqual(sum(play_shard(lineup, 50, seed=7)), 50)
+
+    def test_run_tournament(self):
+        report = run_tournament(['random', 'cautious'], 400, workers=2, seed=1, shards=4)
+        same = run_tournament(['random', 'cautious'], 400, workers=1, seed=1, shards=4)
+
+        self.assertEqual(report, same)
+        self.assertEqual(sum(result['wins'] for result in report), 400)
+
+        for result in report:
+            self.assertLessEqual(result['ci_low'], result['win_rate'])
+            self.assertLessEqual(result['win_rate'], result['ci_high'])
+
+    def test_wilson_interval(self):
+        low, high = wilson_interval(50, 100)
+
+        self.assertAlmostEqual(low, 0.4038, places=3)
+        self.assertAlmostEqual(high, 0.5962, places=3)
+        self.assertEqual(wilson_interval(0, 0), (0.0, 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import random
+import tempfile
+import time
+import unittest
+
+from loveletter import tracing
+from loveletter.bot import GameBot
+from loveletter.tracing import Tracer
+from loveletter.transport import FakeTransport, text_message
+
+
+def names(span):
+    yield span['name']
+
+    for child in span['children']:
+        yield from names(child)
+
+
+class TestTracing(unittest.TestCase):
+    def test_bot_traces(self):
+        with tempfile.TemporaryDirectory() as path:
+            path = os.path.join(path, 'traces.jsonl')
+            transport = FakeTransport()
+            bot = GameBot('123:fake', transport=transport, tracer=Tracer(path, slow=0))
+
+            transport.deliver([text_message(10, 'alice', '/create')])
+            transport.deliver([text_message(11, 'bob', '/join @alice')])
+            transport.deliver([text_message(10, 'alice', '/start')])
+            bot.actors.stop()
+
+            with open(path, encoding='utf-8') as file:
+                traces = [json.loads(line) for line in file]
+
+        self.assertEqual([trace['root']['attrs']['command'] for trace in traces],
+                         ['/create', '/join', '/start'])
+
+        root = traces[-1]['root']
+        spans = list(names(root))
+
+        self.assertEqual(root['name'], 'update')
+        self.assertEqual(root['children'][0]['name'], 'queued')
+        self.assertIn('start_game', spans)
+        self.assertIn('Game.act', spans)
+        self.assertIn('GameState._start_turn', spans)
+        self.assertEqual(spans.count('send_message'), 2)
+        self.assertGreaterEqual(root['duration_ms'], root['children'][1]['duration_ms'])
+
+    def test_deferred_spans(self):
+        with tempfile.TemporaryDirectory() as path:
+            tracer = Tracer(os.path.join(path, 'traces.jsonl'), slow=0.01)
+
+            with tracer.trace('update'):
+                fast = tracing.defer('send_message', chat_id=1)
+                slow = tracing.defer('send_message', chat_id=2)
+
+            fast(delivered=True)
+            self.assertEqual(tracer.traces, 0)
+
+            # trace is slow only because of the late delivery
+            time.sleep(0.02)
+            slow(delivered=False)
+
+            self.assertEqual((tracer.traces, tracer.dumped), (1, 1))
+
+    def test_sampling(self):
+        tracer = Tracer(None, sample_rate=0.25, slow=float('inf'), rng=random.Random(0))
+
+        for _ in range(1000):
+            with tracer.trace('update') as root, tracing.span('child') as child:
+                self.assertEqual(root is None, child is None)
+
+        self.assertIsNone(tracing.defer('send_message'))
+        self.assertTrue(200 < tracer.traces < 300)
+        self.assertEqual(tracer.dumped, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from loveletter.bot import GameBot
+from loveletter.loadgen import run_load
+from loveletter.transport import FakeTransport, text_message
+
+
+class TestTransport(unittest.TestCase):
+    def test_fake_transport(self):
+        transport = FakeTransport()
+        bot = GameBot('123:fake', transport=transport)
+
+        transport.deliver([text_message(10, 'alice', '/create')])
+        transport.deliver([text_message(11, 'bob', '/join @alice'),
+                           text_message(10, 'alice', '/start')])
+
+        # invitation contains the bot's username
+        self.assertIn('@loveletter_gamebot', transport.texts(10)[1])
+        self.assertEqual(bot.users[10].game.state, 'select_card')
+        self.assertEqual(transport.counts[11], len(transport.texts(11)))
+        self.assertIsNone(bot.sender)
+
+        bot.actors.stop()
+
+    def test_dispatch(self):
+        transport = FakeTransport()
+        bot = GameBot('123:fake', transport=transport)
+
+        transport.deliver([text_message(10, 'alice', '/create@loveletter_gamebot'),
+                           text_message(11, 'bob', '/join @alice')])
+        transport.deliver([text_message(11, 'bob', '/unknown hello')])
+
+        self.assertEqual(bot.users[11].game, bot.users[10].game)
+        # unknown commands are passed to the other players as chat
+        self.assertEqual(transport.texts(10)[-1], '@bob: /unknown hello')
+        self.assertEqual(bot.metrics.updates.get('create_game'), 1)
+        self.assertEqual(bot.metrics.updates.get('text_handler'), 1)
+
+        bot.actors.stop()
+
+    def test_addressed_commands(self):
+        transport = FakeTransport()
+        bot = GameBot('123:fake', transport=transport)
+
+        transport.deliver([text_message(10, 'alice', '/create')])
+
+        # /join addressed to the bot goes to the actor of alice's game
+        join = text_message(11, 'bob', '/join@loveletter_gamebot @alice')
+        self.assertEqual(bot.predict(join), (10, (None, None)))
+        self.assertEqual(bot.actor_key(join), 10)
+        self.assertEqual(bot.predict(text_message(12, 'carol', '/create@loveletter_gamebot')),
+                         (12, (None, None)))
+
+        transport.deliver([join])
+        self.assertIs(bot.users[11].game, bot.users[10].game)
+
+        bot.actors.stop()
+
+    def test_load(self):
+        report = run_load(num_games=50, num_players=3, workers=2, batch_size=16)
+
+        self.assertEqual(report['updates'], report['latency']['count'])
+        self.assertEqual(report['latency_by_type']['create']['count'], 50)
+        self.assertEqual(report['latency_by_type']['join']['count'], 100)
+        self.assertGreater(report['messages_sent'], report['updates'])
+        self.assertGreater(report['updates_per_second'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from loveletter.bot import GameBot
+from loveletter.webhook import WebhookServer
+
+
+class TestWebhook(unittest.TestCase):
+    def setUp(self):
+        self.bot = GameBot('123:fake', workers=4)
+        self.bot.send_message = lambda chat_id, text, **kwargs: None
+        self.bot.get_me = lambda: type('Me', (), {'username': 'loveletter_gamebot'})
+
+        self.server = WebhookServer(self.bot, port=0, path='/secret')
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_updates_are_handled(self):
+        num_users = 50
+
+        with ThreadPoolExecutor(8) as executor:
+            statuses = list(executor.map(
+                lambda user_id: self.post('/secret', self.new_update(user_id, '/create')),
+                range(num_users)
+            ))
+
+        self.assertEqual(statuses, [200] * num_users)
+        self.assertTrue(self.wait(lambda: len(self.bot.users) == num_users))
+
+    def test_wrong_requests(self):
+        self.assertEqual(self.post('/other', self.new_update(1, '/create')), 404)
+        self.assertEqual(self.post('/secret', {'message': {}}), 400)
+
+    def post(self, path, update):
+        request = urllib.request.Request(self.url + path, data=json.dumps(update).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    @staticmethod
+    def new_update(user_id, text):
+        user = {'id': user_id, 'is_bot': False, 'first_name': 'user{}'.format(user_id),
+                'username': 'user{}'.format(user_id)}
+
+        return {
+            'update_id': user_id,
+            'message': {
+                'message_id': user_id,
+                'from': user,
+                'chat': {'id': user_id, 'type': 'private'},
+                'date': 0,
+                'text': text,
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text)}],
+            },
+        }
+
+    @staticmethod
+    def wait(condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.01)
+        return condition()
+
+
+if __name__ == '__main__':
+    unittest.main()
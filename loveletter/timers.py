@@ -0,0 +1,257 @@
+"""
+Module contains the hierarchical timer wheel, that keeps deadlines
+of many games in one thread.
+
+Time is divided into ticks. The lowest wheel has a slot for each
+of the next ticks, every higher wheel has a slot for a whole turn
+of the wheel below it. A timer is put into the lowest wheel, which
+covers its deadline, and moves down, when the wheel above it turns
+to its slot, so it is moved at most once per wheel. Scheduling
+and cancelling are O(1), and a tick costs the same however many
+timers are pending. The thread sleeps, while there are no timers.
+A wheel without thread is moved by hand (see TimerWheel.advance).
+"""
+
+import logging
+import math
+import threading
+import time
+
+
+class Timer:
+    """
+    Pending call of the wheel, returned by TimerWheel.schedule
+
+    :attr expires:
+        int, tick of the deadline
+    :attr callback:
+        function, that is called at the deadline
+    :attr args:
+        tuple, arguments of the callback
+    """
+
+    __slots__ = ('expires', 'callback', 'args', 'slot')
+
+    def __init__(self, expires, callback, args):
+        self.expires = expires
+        self.callback = callback
+        self.args = args
+        # set of timers, where the timer is kept, None if it is fired or cancelled
+        self.slot = None
+
+
+class TimerWheel:
+    """
+    Background thread, that calls functions after their delays
+
+    :attr tick:
+        float, resolution of the timers in seconds
+    :attr fired:
+        int, number of called timers
+    """
+
+    def __init__(self, tick=1.0, slots=64, levels=4, clock=time.monotonic, threaded=True):
+        """
+        Creates empty wheel, its thread is started by the first timer
+
+        :param tick:
+            float, resolution of the timers in seconds
+        :param slots:
+            int, number of slots in every wheel
+        :param levels:
+            int, number of wheels, longer delays than tick * slots ** levels
+            are moved through the top wheel several times
+        :param clock:
+            function, that returns current time in seconds
+        :param threaded:
+            bool, if False the wheel has no thread, timers are called by advance()
+        """
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.clock = clock
+        self.threaded = threaded
+        self.fired = 0
+
+        self._wheels = [[set() for _ in range(slots)] for _ in range(levels)]
+        self._spans = [slots ** level for level in range(levels + 1)]
+        self._origin = clock()
+        self._current = 0
+        self._count = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def schedule(self, delay, callback, *args):
+        """
+        Calls callback(*args) in the wheel's thread after the delay
+
+        :param delay:
+            float, seconds (rounded up to the tick)
+        :return:
+            Timer, that can be cancelled
+        """
+        with self._condition:
+            now = (self.clock() - self._origin) / self.tick
+
+            # the wheels are empty, so idle ticks are skipped at once
+            if not self._count:
+                self._current = max(self._current, int(now))
+
+            expires = math.ceil(now + delay / self.tick)
+            timer = Timer(max(expires, self._current + 1), callback, args)
+
+            self._place(timer)
+            self._count += 1
+
+            if self._thread is None and self.threaded:
+                self._thread = threading.Thread(target=self._work, name='TimerWheel',
+                                                daemon=True)
+                self._thread.start()
+
+            self._condition.notify()
+
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancels the timer, if it is not fired yet
+
+        :return:
+            bool, True if the timer is cancelled
+        """
+        with self._condition:
+            if timer.slot is None:
+                return False
+
+            timer.slot.discard(timer)
+            timer.slot = None
+            self._count -= 1
+
+            return True
+
+    def __len__(self):
+        with self._condition:
+            return self._count
+
+    def stop(self):
+        """
+        Stops the thread, pending timers are never called
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+            thread = self._thread
+
+        if thread is not None:
+            thread.join()
+
+    def advance(self):
+        """
+        Moves the wheel to the current time of its clock
+        and calls due timers in the caller's thread
+
+        :return:
+            int, number of called timers
+        """
+        due = []
+
+        with self._condition:
+            while self._count and self._origin + (self._current + 1) * self.tick <= self.clock():
+                due += self._advance()
+
+        self._fire(due)
+
+        return len(due)
+
+    def _place(self, timer):
+        """
+        Puts the timer into the lowest wheel, that covers its deadline.
+        Must be called under the lock
+        """
+        delta = timer.expires - self._current
+        spans = self._spans
+
+        for level in range(self.levels):
+            if delta < spans[level + 1]:
+                break
+        else:
+            # too far, the timer waits in the top wheel's most distant slot
+            level = self.levels - 1
+            delta = spans[level + 1] - 1
+
+        index = (self._current + delta) // spans[level] % self.slots
+        timer.slot = self._wheels[level][index]
+        timer.slot.add(timer)
+
+    def _advance(self):
+        """
+        Moves the wheels by one tick and returns timers, which are due.
+        Must be called under the lock
+        """
+        self._current += 1
+        current, spans = self._current, self._spans
+
+        # higher wheels go first, so their timers reach the lowest wheel in time
+        for level in range(self.levels - 1, 0, -1):
+            if current % spans[level]:
+                continue
+
+            slot = self._wheels[level][current // spans[level] % self.slots]
+            timers = list(slot)
+            slot.clear()
+
+            for timer in timers:
+                self._place(timer)
+
+        slot = self._wheels[0][current % self.slots]
+        due = [timer for timer in slot if timer.expires <= current]
+
+        for timer in due:
+            slot.discard(timer)
+            timer.slot = None
+
+        self._count -= len(due)
+
+        return due
+
+    def _due(self):
+        """
+        Waits for the next tick with timers. Must be called under the lock
+        """
+        while not self._stopped:
+            if not self._count:
+                self._condition.wait()
+                continue
+
+            delay = self._origin + (self._current + 1) * self.tick - self.clock()
+
+            if delay > 0:
+                self._condition.wait(delay)
+                continue
+
+            due = self._advance()
+
+            if due:
+                return due
+
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                due = self._due()
+
+            if due is None:
+                return
+
+            self._fire(due)
+
+    def _fire(self, due):
+        for timer in due:
+            try:
+                timer.callback(*timer.args)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception('Timer failed')
+
+            self.fired += 1
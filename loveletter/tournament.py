@@ -0,0 +1,194 @@
+"""
+Tournament runner, that plays a lot of games between players policies
+(see loveletter.policies) and compares their win rates.
+
+Games are split into shards, every shard is played in a separate
+process with its own random stream spawned from the tournament seed,
+so results depend only on the seed and number of shards, but not on
+the number of workers
+"""
+
+import json
+import logging
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from loveletter.engine import GameState, Start
+from loveletter.events import CountessForced
+from loveletter.policies import load_policy
+from loveletter.users import User
+
+
+def play_game(policies, rng, double_deck=False):
+    """
+    Plays one game between policies, seats are shuffled by the game
+
+    :param policies:
+        list of Policy, players of the game
+    :param rng:
+        random.Random, source of randomness
+    :param double_deck:
+        bool, if True, the second deck is used
+    :return:
+        int, index of the winner in the policies list
+    """
+    state = GameState(rng)
+    state.double_deck = double_deck
+
+    for num in range(len(policies)):
+        state.users.add(User('player{}'.format(num), num, state))
+
+    events = state.apply(Start())
+
+    while state.state != 'game_over':
+        policy = policies[state.dealer.user_id]
+        events = state.apply(policy.act(state, rng))
+
+        if isinstance(events[-1], CountessForced):
+            raise RuntimeError('Policy {} tried to keep the Countess'.format(policy.name))
+
+    return events[-1].winner.user_id
+
+
+def play_shard(lineup, num_games, seed, double_deck=False):
+    """
+    Plays a part of the tournament, this function is run in worker processes
+
+    :param lineup:
+        list of str, policies specs (see loveletter.policies.load_policy)
+    :param num_games:
+        int, number of games to play
+    :param seed:
+        int, seed of the shard's random stream
+    :param double_deck:
+        bool, if True, the second deck is used
+    :return:
+        list of int, number of wins of every player in the lineup
+    """
+    policies = [load_policy(spec) for spec in lineup]
+    rng = random.Random(seed)
+    wins = [0] * len(lineup)
+
+    for _ in range(num_games):
+        wins[play_game(policies, rng, double_deck)] += 1
+
+    return wins
+
+
+def wilson_interval(wins, games, z=1.96):
+    """
+    Computes Wilson score confidence interval for the win rate
+
+    :param wins:
+        int, number of wins
+    :param games:
+        int, number of games
+    :param z:
+        float, quantile of the normal distribution (1.96 for 95%)
+    :return:
+        tuple (low, high)
+    """
+    if games == 0:
+        return 0.0, 1.0
+
+    rate = wins / games
+    denominator = 1 + z ** 2 / games
+    center = (rate + z ** 2 / (2 * games)) / denominator
+    half_width = z * math.sqrt(rate * (1 - rate) / games + z ** 2 / (4 * games ** 2)) / denominator
+
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def run_tournament(lineup, num_games, workers=None, seed=None, shards=64, double_deck=False):
+    """
+    Plays the tournament on the process pool
+
+    :param lineup:
+        list of str, policies specs, one for each player at the table
+    :param num_games:
+        int, total number of games
+    :param workers:
+        int, number of processes (number of cpus if None)
+    :param seed:
+        int, seed of the tournament
+    :param shards:
+        int, number of independent parts of the tournament
+    :param double_deck:
+        bool, if True, the second deck is used
+    :return:
+        list of dicts with results of every player in the lineup
+    """
+    if len(lineup) < 2:
+        raise ValueError('Tournament needs at least 2 players')
+
+    for spec in lineup:
+        load_policy(spec)
+
+    shards = max(1, min(shards, num_games))
+    sizes = [num_games // shards + (num < num_games % shards) for num in range(shards)]
+    seeds = [int(child.generate_state(1, dtype=np.uint64)[0])
+             for child in np.random.SeedSequence(seed).spawn(shards)]
+
+    logging.info('Playing %d games in %d shards', num_games, shards)
+
+    with ProcessPoolExecutor(workers) as executor:
+        results = list(executor.map(play_shard, repeat(lineup), sizes, seeds,
+                                    repeat(double_deck)))
+
+    wins = np.sum(results, axis=0)
+
+    report = []
+    for spec, player_wins in zip(lineup, wins.tolist()):
+        low, high = wilson_interval(player_wins, num_games)
+        report.append({
+            'policy': spec,
+            'wins': player_wins,
+            'games': num_games,
+            'win_rate': player_wins / num_games,
+            'ci_low': low,
+            'ci_high': high,
+        })
+
+    return report
+
+
+def add_parser(subparsers):
+    """
+    Adds 'tournament' command to the command line parser
+
+    :param subparsers:
+        argparse subparsers action
+    """
+    parser = subparsers.add_parser('tournament', help='play games between bot policies')
+    parser.add_argument('players', nargs='+',
+                        help='policy of each player: random, cautious or module:Class')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--shards', type=int, default=64)
+    parser.add_argument('--double-deck', action='store_true')
+    parser.add_argument('--output', type=str, default=None, help='json file for the results')
+
+
+def main(args):
+    """
+    Runs tournament with parsed command line arguments
+
+    :param args:
+        argparse.Namespace, see add_parser
+    """
+    report = run_tournament(args.players, args.games, workers=args.workers, seed=args.seed,
+                            shards=args.shards, double_deck=args.double_deck)
+
+    for num, result in enumerate(report):
+        print('#{} {:20s} {:7.2%}  [{:.2%}, {:.2%}]'.format(num, result['policy'],
+                                                          result['win_rate'],
+                                                          result['ci_low'], result['ci_high']))
+
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
@@ -0,0 +1,370 @@
+"""
+Module contains optional tracing of updates.
+
+Every sampled update gets a tree of spans: the bot's handlers,
+methods of the game (actions, rules of the cards, rendering, AI moves)
+and outgoing messages from the send_message call to their delivery
+by the send queue. Traces, that took longer than the threshold
+(counting the delivery of their messages), are appended to a JSONL file,
+one trace per line.
+
+The current span is kept in a thread-local stack, so instrumented methods
+cost one attribute lookup, when the update is not sampled.
+"""
+
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from loveletter.cards import Card
+from loveletter.engine import GameState
+from loveletter.game import Game
+from loveletter.outbox import Outbox
+from loveletter.policies import Policy
+
+_local = threading.local()
+
+# methods of the game, which are instrumented by instrument()
+GAME_METHODS = (
+    (GameState, ('apply', '_start_turn', '_play_card', '_is_game_over')),
+    (Game, ('start', 'restart', 'select_card', 'select_victim', 'guess_card', 'kick_dealer',
+            'act', 'render')),
+    (Outbox, ('flush',)),
+)
+
+
+class Span:
+    """
+    Timed part of the trace
+
+    :attr name:
+        str, name of the span
+    :attr attrs:
+        dict, attributes of the span
+    :attr start:
+        float, time.perf_counter() at the start
+    :attr end:
+        float, time.perf_counter() at the end, None if span is not finished
+    :attr children:
+        list of Span
+    """
+
+    def __init__(self, name, attrs, start=None):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.children = []
+
+    def to_dict(self, origin):
+        """
+        Returns the tree of spans, times are in milliseconds since origin
+
+        :param origin:
+            float, time.perf_counter() of the trace's start
+        """
+        end = self.start if self.end is None else self.end
+
+        return {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1e3, 3),
+            'duration_ms': round((end - self.start) * 1e3, 3),
+            'attrs': self.attrs,
+            'children': [child.to_dict(origin) for child in self.children],
+        }
+
+
+class Trace:
+    """
+    Spans of one update. Trace is finished, when its root span is closed
+    and all its deferred spans (e.g. deliveries of messages) are ended
+
+    :attr root:
+        Span, the outermost span
+    :attr pending:
+        int, number of spans, which are not ended yet
+    :attr spans:
+        int, number of recorded spans
+    :attr dropped:
+        int, number of spans not recorded because of the limit
+    """
+
+    def __init__(self, tracer, root):
+        self.tracer = tracer
+        self.root = root
+        self.end = root.start
+        self.pending = 1
+        self.spans = 1
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, parent, span):
+        """
+        Adds span to the parent, if the limit of spans is not reached
+
+        :return:
+            bool, True if span is added
+        """
+        with self._lock:
+            if self.spans >= self.tracer.max_spans:
+                self.dropped += 1
+                return False
+
+            self.spans += 1
+            parent.children.append(span)
+
+            return True
+
+    def defer(self):
+        """
+        Prevents the trace from finishing until release() is called
+        """
+        with self._lock:
+            self.pending += 1
+
+    def release(self, span):
+        """
+        Ends the span, finishes the trace if it was the last one
+        """
+        with self._lock:
+            span.end = time.perf_counter()
+            self.end = max(self.end, span.end)
+            self.pending -= 1
+            finished = not self.pending
+
+        if finished:
+            self.tracer.finish(self)
+
+    @property
+    def duration(self):
+        """
+        float, seconds from the start to the end of the last span
+        """
+        return self.end - self.root.start
+
+
+class Tracer:
+    """
+    Samples updates and dumps their slow traces
+
+    :attr path:
+        str, JSONL file for slow traces
+    :attr sample_rate:
+        float, probability that an update is traced
+    :attr slow:
+        float, minimal duration of the dumped trace in seconds
+    :attr max_spans:
+        int, maximal number of spans in one trace
+    :attr traces:
+        int, number of finished traces
+    :attr dumped:
+        int, number of traces written to the file
+    """
+
+    def __init__(self, path, sample_rate=1.0, slow=1.0, max_spans=1000, rng=None):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow = slow
+        self.max_spans = max_spans
+        self.rng = rng or random.Random()
+        self.traces = 0
+        self.dumped = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name, start=None, **attrs):
+        """
+        Context manager, that traces the block, if it is sampled.
+        Traces are not nested, inside another trace it is a usual span
+
+        :param name:
+            str, name of the root span
+        :param start:
+            float, time.perf_counter() when the update was received
+            (the time before the block is recorded as 'queued' span)
+        :param attrs:
+            attributes of the root span
+        """
+        if getattr(_local, 'trace', None) is not None:
+            with span(name, **attrs) as current:
+                yield current
+            return
+
+        if self.rng.random() >= self.sample_rate:
+            yield None
+            return
+
+        now = time.perf_counter()
+        root = Span(name, attrs, now if start is None else start)
+        trace = Trace(self, root)
+
+        if start is not None:
+            queued = Span('queued', {}, start)
+            queued.end = now
+            trace.add(root, queued)
+
+        _local.trace, _local.stack = trace, [root]
+
+        try:
+            yield root
+        except Exception as exception:
+            root.attrs['error'] = type(exception).__name__
+            raise
+        finally:
+            _local.trace = _local.stack = None
+            trace.release(root)
+
+    def finish(self, trace):
+        """
+        Writes the finished trace to the file, if it is slow
+        """
+        with self._lock:
+            self.traces += 1
+
+            if trace.duration < self.slow:
+                return
+
+            self.dumped += 1
+            record = {
+                'time': time.time() - (time.perf_counter() - trace.root.start),
+                'duration_ms': round(trace.duration * 1e3, 3),
+                'spans': trace.spans,
+                'dropped': trace.dropped,
+                'root': trace.root.to_dict(trace.root.start),
+            }
+
+            try:
+                with open(self.path, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps(record, default=str) + '\n')
+            except OSError as exception:
+                logging.error("Trace is not saved: %s", exception)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Context manager, that records the block as a child
+    of the current span, if the update is traced
+
+    :param name:
+        str, name of the span
+    :param attrs:
+        attributes of the span
+    """
+    trace = getattr(_local, 'trace', None)
+
+    if trace is None:
+        yield None
+        return
+
+    stack = _local.stack
+    current = Span(name, attrs)
+
+    if not trace.add(stack[-1], current):
+        yield None
+        return
+
+    stack.append(current)
+
+    try:
+        yield current
+    except Exception as exception:
+        current.attrs['error'] = type(exception).__name__
+        raise
+    finally:
+        current.end = time.perf_counter()
+        stack.pop()
+
+
+def defer(name, **attrs):
+    """
+    Starts span, which is ended later, possibly in another thread
+    (e.g. when the message is delivered by the send queue).
+    The trace is not finished until the span is ended
+
+    :return:
+        function(**attrs), that ends the span and adds attributes to it,
+        or None if the update is not traced
+    """
+    trace = getattr(_local, 'trace', None)
+
+    if trace is None:
+        return None
+
+    current = Span(name, attrs)
+
+    if not trace.add(_local.stack[-1], current):
+        return None
+
+    trace.defer()
+
+    def end(**result):
+        current.attrs.update(result)
+        trace.release(current)
+
+    return end
+
+
+def traced(func, name=None):
+    """
+    Wraps function, so its calls are recorded as spans
+
+    :param func:
+        function to be wrapped
+    :param name:
+        str, name of the spans (qualified name of the function if None)
+    :return:
+        function
+    """
+    name = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, 'trace', None) is None:
+            return func(*args, **kwargs)
+
+        with span(name):
+            return func(*args, **kwargs)
+
+    wrapper.traced = True
+
+    return wrapper
+
+
+def subclasses(cls):
+    """
+    Returns the class and all its subclasses
+    """
+    result = [cls]
+
+    for subclass in cls.__subclasses__():
+        result.extend(subclasses(subclass))
+
+    return result
+
+
+def instrument():
+    """
+    Wraps methods of the game, rules of the cards and moves of AI policies,
+    so they are recorded in traces. It is done once per process
+    """
+    methods = list(GAME_METHODS)
+    methods.extend((cls, ('play',)) for cls in subclasses(Card))
+    methods.extend((cls, ('act',)) for cls in subclasses(Policy))
+
+    for cls, names in methods:
+        for name in names:
+            func = cls.__dict__.get(name)
+
+            # inherited methods are wrapped in their own class
+            if func is not None and not getattr(func, 'traced', False):
+                setattr(cls, name, traced(func))
+
+    # actions are dispatched by the table of functions, not by the methods
+    for action, handler in GameState._handlers.items():  # pylint: disable=protected-access
+        if not getattr(handler, 'traced', False):
+            GameState._handlers[action] = traced(handler)  # pylint: disable=protected-access
@@ -0,0 +1,241 @@
+"""
+Module contains transports, which carry outgoing calls of the bot.
+
+TelegramTransport calls the real Bot API through telebot,
+messages go through the rate limited send queue (see loveletter.sender).
+FakeTransport keeps everything in memory and delivers updates
+to the bot itself, so games can be played by scripts without network,
+e.g. in tests and load tests (see loveletter.loadgen).
+"""
+
+import threading
+from collections import Counter
+
+import telebot
+from telebot import types
+
+
+class TelegramTransport:
+    """
+    Transport of the real Bot API
+
+    :static attr queued:
+        bool, messages are sent by the send queue in background
+    """
+
+    queued = True
+
+    def __init__(self):
+        self.bot = None
+        self._me = None
+
+    def attach(self, bot):
+        """
+        Binds transport to the bot
+
+        :param bot:
+            GameBot
+        """
+        self.bot = bot
+
+    def send_message(self, chat_id, text, **kwargs):
+        """
+        Sends message, arguments are the same as in telebot.TeleBot.send_message
+        """
+        return telebot.TeleBot.send_message(self.bot, chat_id, text, **kwargs)
+
+    def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        """
+        Edits message, arguments are the same as in telebot.TeleBot.edit_message_text
+        """
+        return telebot.TeleBot.edit_message_text(self.bot, text, chat_id, message_id, **kwargs)
+
+    def pin_chat_message(self, chat_id, message_id, **kwargs):
+        """
+        Pins message, arguments are the same as in telebot.TeleBot.pin_chat_message
+        """
+        return telebot.TeleBot.pin_chat_message(self.bot, chat_id, message_id, **kwargs)
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        """
+        Answers tap of inline button, arguments are the same
+        as in telebot.TeleBot.answer_callback_query
+        """
+        return telebot.TeleBot.answer_callback_query(self.bot, callback_query_id, text, **kwargs)
+
+    def get_me(self):
+        """
+        Returns the bot's own user, it is requested only once
+        """
+        if self._me is None:
+            self._me = telebot.TeleBot.get_me(self.bot)
+
+        return self._me
+
+
+class FakeTransport:
+    """
+    In-memory transport, which records outgoing messages
+
+    :static attr queued:
+        bool, messages are recorded right away, without the send queue
+    :attr calls:
+        list of tuples (chat_id, text, kwargs), recorded messages
+        (only if keep is True)
+    :attr counts:
+        collections.Counter, number of messages sent to each chat
+    :attr edits:
+        list of tuples (chat_id, message_id, text), recorded edits
+        (only if keep is True)
+    :attr pinned:
+        dict of {chat_id: message_id}, pinned messages
+    :attr answers:
+        list of tuples (callback_query_id, text), answered taps
+    """
+
+    queued = False
+
+    def __init__(self, keep=True, username='loveletter_gamebot'):
+        """
+        :param keep:
+            bool, if False, only numbers of messages are kept
+        :param username:
+            str, username of the bot
+        """
+        self.bot = None
+        self.keep = keep
+        self.me = types.User(1, True, 'bot', username=username)
+        self.calls = []
+        self.counts = Counter()
+        self.edits = []
+        self.pinned = {}
+        self.answers = []
+        self._lock = threading.Lock()
+
+    def attach(self, bot):
+        """
+        Binds transport to the bot
+
+        :param bot:
+            GameBot
+        """
+        self.bot = bot
+
+    def send_message(self, chat_id, text, **kwargs):
+        """
+        Records message, arguments are the same as in telebot.TeleBot.send_message
+
+        :return:
+            telebot.types.Message, the sent message (id is the number of the message in the chat)
+        """
+        with self._lock:
+            self.counts[chat_id] += 1
+
+            if self.keep:
+                self.calls.append((chat_id, text, kwargs))
+
+            message_id = self.counts[chat_id]
+
+        return types.Message(message_id=message_id, from_user=self.me, date=None,
+                             chat=types.Chat(id=chat_id, type='private'), content_type='text',
+                             options={'text': text}, json_string='')
+
+    def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        """
+        Records edit, arguments are the same as in telebot.TeleBot.edit_message_text
+        """
+        # pylint: disable=unused-argument
+        with self._lock:
+            if self.keep:
+                self.edits.append((chat_id, message_id, text))
+
+    def pin_chat_message(self, chat_id, message_id, **kwargs):
+        """
+        Records pinned message
+        """
+        # pylint: disable=unused-argument
+        with self._lock:
+            self.pinned[chat_id] = message_id
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        """
+        Records answer of the tap
+        """
+        # pylint: disable=unused-argument
+        with self._lock:
+            if self.keep:
+                self.answers.append((callback_query_id, text))
+
+    def get_me(self):
+        """
+        Returns the bot's own user
+        """
+        return self.me
+
+    def texts(self, chat_id):
+        """
+        Returns texts of messages sent to the chat
+
+        :param chat_id:
+            int
+        :return:
+            list of str
+        """
+        with self._lock:
+            return [text for recipient, text, _ in self.calls if recipient == chat_id]
+
+    def deliver(self, messages, wait=True):
+        """
+        Passes incoming messages and taps of inline buttons to the bot
+
+        :param messages:
+            list of telebot.types.Message or telebot.types.CallbackQuery
+        :param wait:
+            bool, if True, returns when all messages are handled,
+            otherwise they are handled by the bot's actors in background
+        """
+        # taps are routed the same way as messages (see GameBot.process_new_callback_query)
+        self.bot.process_new_messages(messages)
+
+        if wait:
+            self.bot.actors.join()
+
+
+def text_message(user_id, name, text, message_id=0):
+    """
+    Creates private text message of the user, as telegram sends it
+
+    :param user_id:
+        int, id of the user (and the chat)
+    :param name:
+        str, username
+    :param text:
+        str, text of the message
+    :return:
+        telebot.types.Message
+    """
+    user = types.User(id=user_id, is_bot=False, first_name=name, username=name)
+    chat = types.Chat(id=user_id, type='private')
+
+    return types.Message(message_id=message_id, from_user=user, date=None, chat=chat,
+                         content_type='text', options={'text': text}, json_string='')
+
+
+def callback_query(user_id, name, data, query_id='0'):
+    """
+    Creates tap of the user on inline button, as telegram sends it
+
+    :param user_id:
+        int, id of the user
+    :param name:
+        str, username
+    :param data:
+        str, callback_data of the button
+    :param query_id:
+        str, id of the tap
+    :return:
+        telebot.types.CallbackQuery
+    """
+    user = types.User(id=user_id, is_bot=False, first_name=name, username=name)
+
+    return types.CallbackQuery(id=query_id, from_user=user, data=data, chat_instance=str(user_id))
@@ -8,9 +8,8 @@ User and Users (see their docstrings for more)
 
 import random
 from collections import deque
-import gettext
 
-gettext.install('loveletter', localedir='./loveletter/locale', codeset='UTF-8')
+from loveletter.cards import CARDS
 
 
 class User:
@@ -22,18 +21,24 @@ class User:
     :attr user_id:
         inner telegram id, used for writing
         private messages to user
-    :attr bot:
-        link to the bot which handles game where
-        this user is playing
+    :attr game:
+        game where this user is playing
     :attr card:
         currently card on the user's hand
     :attr new_card:
         card that was taken to hand on the move
     :attr defence:
         is this user protected by 'Maid' card
+    :attr locale:
+        str, language of messages for this user (default one if None)
+    :attr policy:
+        Policy, that makes moves of the AI player, None for humans
+        (see loveletter.policies)
     """
 
-    def __init__(self, name, user_id, bot, game):
+    __slots__ = ('name', 'user_id', 'game', 'card', 'new_card', 'defence', 'locale', 'policy')
+
+    def __init__(self, name, user_id, game, locale=None, policy=None):
         """
         Creates a new user
         As soon as user can be created only
@@ -45,18 +50,22 @@ class User:
         :param user_id:
             inner telegram id, used for writing
             private messages to user
-        :param bot:
-            link to the bot which handles game where
-            this user is playing
+        :param game:
+            game where this user is playing
+        :param locale:
+            str, language of messages for this user
+        :param policy:
+            Policy of the AI player, None for humans
         """
 
         self.name = name
         self.user_id = user_id
-        self.bot = bot
         self.game = game
         self.card = None
         self.new_card = None
         self.defence = False
+        self.locale = locale
+        self.policy = policy
 
     def take_card(self, deck):
         """
@@ -65,13 +74,10 @@ class User:
         (at start of the game or after he drops all his cards)
 
         :param deck:
-            list of Cards, deck from where the card is taken
+            bytearray of card values, deck from where the card is taken
         """
 
-        self.card = deck[-1]
-        self.card.owner = self
-        del deck[-1]
-        self.bot.send_message(self.user_id, _("Your card is '{}'").format(self.card.name))
+        self.card = CARDS[deck.pop()]
 
     def take_new_card(self, deck):
         """
@@ -80,14 +86,10 @@ class User:
         on this turn
 
         :param deck:
-            list of Cards, deck from where the card is taken
+            bytearray of card values, deck from where the card is taken
         """
 
-        self.new_card = deck[-1]
-        self.new_card.owner = self
-        del deck[-1]
-        self.bot.send_message(self.user_id,
-                              _("You have taken the '{}' card").format(self.new_card.name))
+        self.new_card = CARDS[deck.pop()]
 
     def __eq__(self, other):
         if isinstance(other, User):
@@ -111,6 +113,8 @@ class Users:
         players who was kicked from the game
     """
 
+    __slots__ = ('queue', 'loosers')
+
     def __init__(self):
         """
         Creates empty users queue
@@ -128,11 +132,14 @@ class Users:
         """
         self.queue.append(user)
 
-    def shuffle(self):
+    def shuffle(self, rng=random):
         """
         Randomly shuffles all users in queue
+
+        :param rng:
+            random.Random or random module, source of randomness
         """
-        random.shuffle(self.queue)
+        rng.shuffle(self.queue)
 
     def get_dealer(self):
         """
@@ -152,7 +159,6 @@ class Users:
             User, who loose the game
         """
 
-        user.bot.send_message(user.user_id, _("You've lost!"))
         self.queue.remove(user)
         self.loosers.append(user)
 
@@ -196,9 +202,12 @@ class Users:
 
         return None
 
-    def reset(self):
+    def reset(self, rng=random):
         """
         Resets all lost users back to queue
+
+        :param rng:
+            random.Random or random module, source of randomness
         """
 
         self.queue.extend(self.loosers)
@@ -208,7 +217,7 @@ class Users:
 
         self.loosers = []
 
-        self.shuffle()
+        self.shuffle(rng)
 
     def __contains__(self, user):
         return user in self.queue
@@ -0,0 +1,76 @@
+"""
+Module contains a lightweight http server, that receives
+updates from telegram by webhook instead of long polling.
+
+Server only parses updates and passes them to the bot,
+handlers are run by the bot's own worker threads.
+"""
+
+import logging
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from telebot import types
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    Handles POST requests with telegram updates
+    """
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Accepts one update, answers immediately
+        and passes update to the bot
+        """
+        if self.path != self.server.path:
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+
+        try:
+            update = types.Update.de_json(self.rfile.read(length).decode('utf-8'))
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+        self.server.bot.process_new_updates([update])
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        logging.debug(format, *args)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    Http server, that feeds received updates to the bot
+
+    :attr bot:
+        GameBot, that handles updates
+    :attr path:
+        str, secret url path, where telegram posts updates,
+        requests to other paths are rejected
+    """
+
+    daemon_threads = True
+
+    def __init__(self, bot, host='127.0.0.1', port=8443, path='/'):
+        """
+        Creates a server, call serve_forever() to start it
+
+        :param bot:
+            GameBot, that handles updates
+        :param host:
+            str, address to listen
+        :param port:
+            int, port to listen (0 to choose any free port)
+        :param path:
+            str, url path, where telegram posts updates
+        """
+        super().__init__((host, port), WebhookHandler)
+
+        self.bot = bot
+        self.path = path
@@ -7,6 +7,7 @@ setup(name="loveletter",
       version="0.0.3",
       author="Konstantin Kozlovtsev",
       packages=find_packages(),
+      package_data={'loveletter': ['locale/*/LC_MESSAGES/*.mo']},
       long_description=long_description,
       long_description_content_type="text/markdown",
       url="https://github.com/kst179/LoveLetter",